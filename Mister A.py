@@ -1,15 +1,29 @@
 import tkinter as tk
 from PIL import Image, ImageTk
-import random
-import socket
-import networkx as nx
-import matplotlib.pyplot as plt
-import time
 import re
+import math
 from tkinter import messagebox  
-import threading
 import json
+import os
+import tempfile
 from tkinter import filedialog
+from concurrent.futures import ThreadPoolExecutor
+from engine import SimulationEngine, PacketForwarder
+from topology import Topology, LINK_PROFILES, OPTIONAL_DEVICE_FIELDS, link_attributes, read_topology
+from snapshot import write_snapshot, read_snapshot
+from addressing import AddressPlan, mask_to_prefix
+from forwarding import ForwardingPlane
+from switching import SwitchFabric
+from protocols import PROTOCOLS
+from queueing import QueueingNetwork, DISCIPLINES, DROP_POLICIES, DEFAULT_BUFFER
+from tcp import TcpSimulator, ALGORITHMS
+from sweeps import RttSweep, DEFAULT_SAMPLES
+from impairments import Impairments, ImpairmentProfile, LOSS_MODELS, JITTER_DISTRIBUTIONS, PING_INTERVAL
+from routing import RouteCache, LatencyModel, PING_PACKET_SIZE, INITIAL_TTL
+from traffic import TrafficGenerator, PATTERNS, end_hosts
+from spatial import SpatialIndex
+from layout import LayoutEngine
+from plots import PlotRenderer, topology_plot, latency_plot, render_topology, render_latency
 
 
 def is_valid_ip(ip):
@@ -26,13 +40,41 @@ def is_valid_mac(mac):
     return re.match(pattern, mac) is not None
 
 def is_valid_subnet(subnet):
-    """Validates a subnet mask pattern of 255.255.number.number."""
-    pattern = r"^255\.255\.(\d{1,3})\.(\d{1,3})$"
-    match = re.match(pattern, subnet)
-    if not match:
+    """Validates a subnet mask with contiguous leading ones, /0 to /32 (e.g. 255.255.240.0)."""
+    if not is_valid_ip(subnet):
         return False
-    # Ensure the last two numbers are within 0-255
-    return all(0 <= int(group) <= 255 for group in match.groups())
+    try:
+        mask_to_prefix(subnet)
+    except ValueError:
+        return False
+    return True
+
+
+# Hit area around a device's icon centre: the icon itself and the label drawn 40px below it
+LABEL_OFFSET = 40
+DEVICE_HIT_BOX = (-25, -25, 25, 48)
+ICON_HIT_BOX = (-25, -25, 25, 25)
+HIT_TOLERANCE = 6  # Pixels a click may miss a device or link by
+SHIFT_MASK = 0x0001  # event.state bit for the Shift key
+DRAG_FRAME_MS = 16  # Motion events during a drag are merged into one canvas update per frame
+
+# Level of detail by zoom: labels from LABEL_ZOOM up, icons from ICON_ZOOM up and dots below
+# that, or one circle per CLUSTER_CELL screen pixels once more than CLUSTER_THRESHOLD devices
+# would be drawn as dots
+MIN_ZOOM, MAX_ZOOM = 0.02, 4.0
+ZOOM_STEP = 1.2
+LABEL_ZOOM = 0.6
+ICON_ZOOM = 0.3
+CLUSTER_THRESHOLD = 2000
+CLUSTER_CELL = 40
+MAX_BUNDLES = 1500  # Heaviest cluster-to-cluster lines drawn when zoomed out
+DOT_RADIUS = 3
+LOD_STATES = {  # Level -> canvas state of the icons, labels, dots and links
+    "full": ("normal", "normal", "hidden", "normal"),
+    "icons": ("normal", "hidden", "hidden", "normal"),
+    "points": ("hidden", "hidden", "normal", "normal"),
+    "clusters": ("hidden", "hidden", "hidden", "hidden"),
+}
 
 
 # Validate and save function
@@ -46,10 +88,120 @@ def validate_and_save(ip, mac, subnet, popup, save_action):
     if not is_valid_subnet(subnet):
         messagebox.showerror("Invalid Input", f"Subnet Mask '{subnet}' is not valid.")
         return
-    save_action()  # Save the changes if validation passes
+    if save_action() is False:
+        return  # The save action already explained what is wrong
     popup.destroy()
 
 
+class PacketAnimator:
+    """Moves every in-flight packet from one root.after timer, in a single canvas pass per frame.
+
+    Packets are drawn as individual sprites until there are more than `max_sprites` of them;
+    after that each busy link gets one arrow whose width grows with the traffic on it.
+    """
+
+    def __init__(self, root, canvas, device_center, fps=60, hop_duration=1.0, max_sprites=300):
+        self.root = root
+        self.canvas = canvas
+        self.device_center = device_center  # device_id -> (x, y), or None if the device is gone
+        self.frame_ms = max(1, int(1000 / fps))
+        self.hop_duration = hop_duration  # Wall-clock seconds a packet takes to cross one link
+        self.max_sprites = max_sprites
+        self.in_flight = []  # [hops, hop index, progress 0-1, sprite item or None, on_done]
+        self.flow_arrows = {}  # (start, end) -> (line item, packet count)
+        self._sprite = None
+        self._timer = None
+
+    @property
+    def sprite(self):
+        """The packet image, loaded once and reused for every packet."""
+        if self._sprite is None:
+            # Load the message icon (ensure the file is in the same directory or provide the full path)
+            self._sprite = ImageTk.PhotoImage(Image.open("message.png").resize((15, 15)))
+        return self._sprite
+
+    def add(self, hops, on_done=None):
+        """Queues a packet that will travel the given (start, end) hops, then calls on_done."""
+        if not hops:
+            if on_done:
+                on_done()
+            return
+        self.in_flight.append([list(hops), 0, 0.0, None, on_done])
+        if self._timer is None:
+            self._timer = self.root.after(self.frame_ms, self._frame)
+
+    def _frame(self):
+        self._timer = None
+        step = self.frame_ms / 1000 / self.hop_duration
+        centers = {}  # Device positions are looked up once per frame, not once per packet
+
+        def center(device_id):
+            if device_id not in centers:
+                centers[device_id] = self.device_center(device_id)
+            return centers[device_id]
+
+        aggregate = len(self.in_flight) > self.max_sprites
+        link_counts = {}
+        still_flying = []
+        finished = []
+        for packet in self.in_flight:
+            hops, index, progress, item, on_done = packet
+            progress += step
+            while progress >= 1.0 and index < len(hops):
+                index, progress = index + 1, progress - 1.0
+            # Skip hops whose devices were deleted in the meantime
+            while index < len(hops) and (center(hops[index][0]) is None or center(hops[index][1]) is None):
+                index, progress = index + 1, 0.0
+            if index >= len(hops):
+                if item is not None:
+                    self.canvas.delete(item)
+                finished.append(on_done)
+                continue
+
+            packet[1], packet[2] = index, progress
+            start, end = hops[index]
+            if aggregate:
+                if item is not None:
+                    self.canvas.delete(item)
+                    packet[3] = None
+                link_counts[start, end] = link_counts.get((start, end), 0) + 1
+            else:
+                (x1, y1), (x2, y2) = center(start), center(end)
+                x = x1 + (x2 - x1) * progress
+                y = y1 + (y2 - y1) * progress
+                if item is None:
+                    packet[3] = self.canvas.create_image(x, y, image=self.sprite)
+                else:
+                    self.canvas.coords(item, x, y)
+            still_flying.append(packet)
+
+        self.in_flight = still_flying
+        self._draw_flow_arrows(link_counts, center)
+        if self.in_flight:
+            self._timer = self.root.after(self.frame_ms, self._frame)
+        for on_done in finished:
+            if on_done:
+                on_done()
+
+    def _draw_flow_arrows(self, link_counts, center):
+        # Drop arrows for links that went quiet, then add or refresh the busy ones
+        for key in list(self.flow_arrows):
+            if key not in link_counts:
+                self.canvas.delete(self.flow_arrows.pop(key)[0])
+        for (start, end), count in link_counts.items():
+            (x1, y1), (x2, y2) = center(start), center(end)
+            width = min(2 + count.bit_length(), 12)
+            arrow = self.flow_arrows.get((start, end))
+            if arrow is None:
+                item = self.canvas.create_line(x1, y1, x2, y2, arrow=tk.LAST, fill="orange", width=width)
+                self.flow_arrows[start, end] = (item, count)
+            else:
+                item, previous = arrow
+                self.canvas.coords(item, x1, y1, x2, y2)
+                if previous != count:
+                    self.canvas.itemconfig(item, width=width)
+                    self.flow_arrows[start, end] = (item, count)
+
 
 class NetworkDesignApp:
 
@@ -58,58 +210,116 @@ class NetworkDesignApp:
         config = {
             "devices": {
                 device_id: {
+                    "kind": self.topology.devices[device_id]["kind"],
                     "label": self.canvas.itemcget(data["label"], "text"),
-                    "icon_coords": self.canvas.coords(data["icon"]),
+                    "icon_coords": list(self.to_world(*self.canvas.coords(data["icon"]))),
                     "ip": data["ip"],
                     "mac": data["mac"],
-                    "subnet": data["subnet"]
+                    "subnet": data["subnet"],
+                    **{key: self.topology.devices[device_id][key]
+                       for key in OPTIONAL_DEVICE_FIELDS if key in self.topology.devices[device_id]}
                 }
                 for device_id, data in self.devices.items()
             },
             "connections": [
-                (self.get_line_devices(line)) for line in self.canvas.find_all() if self.canvas.type(line) == "line"
+                {"from": link.a, "to": link.b, **link.attrs} for link in self.topology.links.values()
             ]
         }
 
-        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("JSON Files", "*.json"), ("Binary Snapshots", "*.mas")]
+        )
         if file_path:
-            with open(file_path, "w") as f:
-                json.dump(config, f, indent=4)
+            if file_path.endswith(".mas"):
+                write_snapshot(config, file_path)  # Compact binary alternative for large designs
+            else:
+                with open(file_path, "w") as f:
+                    json.dump(config, f, indent=4)
             messagebox.showinfo("Save Configuration", "Configuration saved successfully!")
 
 
     def load_configuration(self):
-        """Load the canvas state (devices and connections) from a JSON file."""
-        file_path = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
+        """Load the canvas state (devices and connections) from a JSON file or binary snapshot."""
+        file_path = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json"), ("Binary Snapshots", "*.mas")])
         if file_path:
-            with open(file_path, "r") as f:
-                config = json.load(f)
+            # Stream and validate everything into the model first, the canvas comes afterwards
+            try:
+                if file_path.endswith(".mas"):
+                    topology, problems = read_snapshot(file_path)
+                else:
+                    topology, problems = read_topology(file_path, progress=self.show_load_progress)
+            except (OSError, ValueError) as error:
+                self.root.title("Network Design Tool")
+                messagebox.showerror("Load Configuration", f"Could not load the configuration:\n{error}")
+                return
 
             # Clear current canvas
             self.canvas.delete("all")
             self.devices = {}
+            self.device_counters = {}
+            self.topology.replace(topology)
+            self.build_canvas()
+            self.root.title("Network Design Tool")
 
-            # Add devices
-            for device_id, data in config["devices"].items():
-                label = data["label"]
-                coords = data["icon_coords"]
-                self.add_device(coords[0], coords[1], label.split(" ")[0])
-                self.devices[device_id].update({
-                    "ip": data["ip"],
-                    "mac": data["mac"],
-                    "subnet": data["subnet"]
-                })
-
-            # Add connections
-            for start_device, end_device in config["connections"]:
-                if start_device in self.devices and end_device in self.devices:
-                    start_coords = self.get_device_center(start_device)
-                    end_coords = self.get_device_center(end_device)
-                    self.draw_connection(start_coords, end_coords, start_device, end_device)
-
-            messagebox.showinfo("Load Configuration", "Configuration loaded successfully!")
+            message = "Configuration loaded successfully!"
+            if problems:
+                message += f"\n\n{len(problems)} entries were skipped:\n" + "\n".join(problems[:10])
+                if len(problems) > 10:
+                    message += f"\n... and {len(problems) - 10} more"
+            conflicts = self.addresses.conflicts  # Duplicate IPs or MACs in the file are kept, but flagged
+            if conflicts:
+                message += f"\n\n{len(conflicts)} duplicate addresses:\n" + "\n".join(conflicts[:10])
+            messagebox.showinfo("Load Configuration", message)
+
+    def show_load_progress(self, devices, connections):
+        self.root.title(f"Network Design Tool - Loading... {devices} devices, {connections} connections")
+        self.root.update_idletasks()
+
+    def build_canvas(self):
+        """Draws every device and link of the model in one pass (used after loading)."""
+        canvas = self.canvas
+        for device_id, data in self.topology.devices.items():
+            x, y = self.to_canvas(*(data.get("icon_coords") or (0.0, 0.0)))
+            kind = data["kind"] if data.get("kind") in self.device_images else "Computer"
+            icon, text = self.draw_device(device_id, kind, data["label"], x, y)
+            self.devices[device_id] = {
+                "icon": icon,
+                "label": text,  # This must point to the text object ID
+                "ip": data["ip"],
+                "mac": data["mac"],
+                "subnet": data["subnet"],
+            }
+            self.note_device_id(device_id)
+
+        # Canvas line ids become the link ids, so the link table is re-keyed once all lines exist
+        links = list(self.topology.links.values())
+        lines = []
+        for link in links:
+            start_coords = self.get_device_center(link.a)
+            end_coords = self.get_device_center(link.b)
+            lines.append(canvas.create_line(
+                start_coords, end_coords, fill=self.connection_color(link.attrs.get("connection")),
+                width=self.link_width(), state=LOD_STATES[self.lod][3], tags=("link",)
+            ))
+        for link in links:
+            self.topology.remove_link(link.id)
+        for link, line in zip(links, lines):
+            self.topology.add_link(link.a, link.b, link_id=line, **link.attrs)
+        self.update_level_of_detail()
+
+    def note_device_id(self, device_id):
+        """Keeps the per-kind counters ahead of ids like Router_7 so new devices never clash."""
+        kind, _, number = device_id.rpartition("_")
+        if number.isdigit():
+            self.device_counters[kind] = max(self.device_counters.get(kind, 0), int(number))
+
+    def next_device_id(self, kind):
+        number = self.device_counters.get(kind, 0) + 1
+        while f"{kind}_{number}" in self.devices:
+            number += 1
+        self.device_counters[kind] = number
+        return number
 
-    
     def __init__(self, root):
         self.root = root
         self.root.title("Mister A Networking")
@@ -155,6 +365,13 @@ class NetworkDesignApp:
 
         # Initialize device list and variables
         self.devices = {}
+        self.device_counters = {}  # Device kind -> highest number handed out, e.g. "Router" -> 3
+        self.topology = Topology()  # Link table and adjacency sets, kept in sync with the canvas
+        self.routes = RouteCache(self.topology)  # Memoized shortest-path trees, invalidated on edits
+        self.latency = LatencyModel(self.topology, self.routes)
+        self.addresses = AddressPlan(self.topology)  # IP pools and MACs, reserved and released with the model
+        self.forwarding = ForwardingPlane(self.topology, self.routes)  # Router tables for IP forwarding
+        self.layouts = LayoutEngine(self.topology)  # Plot positions, cached until the topology changes
         self.selected_device = None
         self.connecting = False
         self.start_coords = None
@@ -165,6 +382,46 @@ class NetworkDesignApp:
         self.connect_mode = False
         self.delete_mode = False  # New: Toggle delete mode
 
+        # Hit-testing without scanning the canvas: canvas items back to devices (line ids are
+        # already link ids), and grid indexes of device boxes and link segments in canvas units
+        self.item_owner = {}
+        self.device_index = SpatialIndex()
+        self.link_index = SpatialIndex()
+        self.selected_devices = set()  # Rubber-band selection
+        self.band = None  # (start x, start y, rectangle item) while a rubber band is being dragged
+        self.drag = None  # Devices being dragged, see start_drag
+        self.topology.subscribe(self.on_canvas_topology_change)
+
+        # Zoom and pan: canvas = world * zoom + offset. Indexes and saves use world units
+        self.zoom = 1.0
+        self.view_offset = (0.0, 0.0)
+        self.lod = "full"
+        self.dots = {}  # device id -> dot item, created the first time the view zooms out that far
+        self.view_epoch = 0  # Bumped by every zoom step
+        self.device_epoch = {}  # device id -> view epoch its label and dot were last placed for
+        self.view_refresh_pending = False
+        self.layout_version = 0  # Bumped whenever a device moves
+        self.cluster_cache = {}  # Cell size -> ((topology version, layout version), summary)
+
+        # Headless simulation core; the canvas only subscribes to it for animation
+        self.engine = SimulationEngine()
+        self.queues = QueueingNetwork(self.engine, self.topology)  # Output queue per link direction
+        self.impairments = Impairments(self.topology, engine=self.engine)  # Loss, jitter and link outages
+        self.forwarder = PacketForwarder(
+            self.engine, hop_delay=lambda start, end, packet: self.topology.hop_delay(start, end, packet.size),
+            queues=self.queues, drop=self.impairments.drop, jitter=self.impairments.jitter
+        )
+        self.switching = SwitchFabric(self.topology, self.engine)  # MAC learning and ARP on the switches
+        self.routing_protocol = None  # RIP or OSPF running between the routers, None for static routes
+        self.pending_hops = {}  # packet id -> hops recorded by the engine, waiting to be animated
+        self.engine.subscribe(self.on_simulation_event)
+        self.simulation_pool = ThreadPoolExecutor(max_workers=1)  # Bounded pool for long batch runs
+        self.plot_renderer = PlotRenderer()  # Draws plots to files in a separate process
+        self.animator = PacketAnimator(
+            root, self.canvas,
+            lambda device_id: self.get_device_center(device_id) if device_id in self.devices else None
+        )
+
         # Load device icons
         self.device_images = {
         "Router": ImageTk.PhotoImage(Image.open("router.png").resize((40, 40))),
@@ -239,11 +496,35 @@ class NetworkDesignApp:
         self.connection_menu.add_command(label="Fiber Optic", command=lambda: self.set_connection_type("Fiber Optic"))
         self.connection_menu.add_command(label="Wireless", command=lambda: self.set_connection_type("Wireless"))
 
+        self.layout_menu = tk.Menu(root, tearoff=0)
+        self.layout_menu.add_command(label="Force-Directed", command=lambda: self.plot_topology("force"))
+        self.layout_menu.add_command(label="Hierarchical", command=lambda: self.plot_topology("hierarchical"))
+        self.layout_menu.add_command(label="Radial", command=lambda: self.plot_topology("radial"))
+        self.layout_menu.add_command(label="As Drawn", command=lambda: self.plot_topology("canvas"))
+
         # Bind canvas events
         self.canvas.bind("<B1-Motion>", self.on_device_drag)
         self.canvas.bind("<Button-1>", self.on_left_click)
         self.canvas.bind("<ButtonRelease-1>", self.on_device_release)
         self.canvas.bind("<Double-1>", self.on_double_click)
+        self.canvas.bind("<Shift-Button-1>", self.start_band)
+        self.canvas.bind("<Shift-B1-Motion>", self.drag_band)
+        self.canvas.bind("<Shift-ButtonRelease-1>", self.end_band)
+        self.root.bind("<Delete>", lambda event: self.delete_selection())
+
+        # Mouse wheel zooms around the pointer, middle-drag pans, Home fits everything in view
+        self.canvas.bind("<MouseWheel>", self.on_zoom)
+        self.canvas.bind("<Button-4>", self.on_zoom)
+        self.canvas.bind("<Button-5>", self.on_zoom)
+        self.canvas.bind("<ButtonPress-2>", lambda event: self.canvas.scan_mark(event.x, event.y))
+        self.canvas.bind("<B2-Motion>", lambda event: self.canvas.scan_dragto(event.x, event.y, gain=1))
+        self.canvas.bind("<ButtonRelease-2>", lambda event: self.schedule_view_refresh())
+        self.root.bind("<Home>", lambda event: self.fit_view())
+
+        # One set of bindings on the shared "device" tag serves every device (icon and text)
+        self.canvas.tag_bind("device", "<Button-1>", lambda event: self.on_device_click(event, self.current_device()))
+        self.canvas.tag_bind("device", "<B1-Motion>", lambda event: self.on_device_drag(event, self.current_device()))
+        self.canvas.tag_bind("device", "<ButtonRelease-1>", lambda event: self.on_device_release(event, self.current_device()))
 
 
     def some_function(self):
@@ -259,18 +540,36 @@ class NetworkDesignApp:
         visualize_label = tk.Label(left_frame, text="Options", bg="white", font=("Arial", 14, "bold"))
         visualize_label.pack(pady=10)
 
-        topology_button = tk.Button(
+        self.topology_button = tk.Button(
             left_frame, text="Visualize Topology", bg="#008080", fg="white",
-            font=("Arial", 10, "bold"), command=self.plot_topology
+            font=("Arial", 10, "bold"), command=self.show_layout_menu
         )
-        topology_button.pack(pady=10, fill=tk.X)
+        self.topology_button.pack(pady=10, fill=tk.X)
 
         latency_button = tk.Button(
             left_frame, text="Show Latency", bg="#008080", fg="white",
-            font=("Arial", 10, "bold"), command=self.plot_latency_graph
+            font=("Arial", 10, "bold"), command=self.show_latency_menu
         )
         latency_button.pack(pady=10, fill=tk.X)
 
+        traffic_button = tk.Button(
+            left_frame, text="Generate Traffic", bg="#008080", fg="white",
+            font=("Arial", 10, "bold"), command=self.show_traffic_menu
+        )
+        traffic_button.pack(pady=10, fill=tk.X)
+
+        protocol_button = tk.Button(
+            left_frame, text="Routing Protocol", bg="#008080", fg="white",
+            font=("Arial", 10, "bold"), command=self.show_protocol_menu
+        )
+        protocol_button.pack(pady=10, fill=tk.X)
+
+        impairment_button = tk.Button(
+            left_frame, text="Impairments", bg="#008080", fg="white",
+            font=("Arial", 10, "bold"), command=self.show_impairment_menu
+        )
+        impairment_button.pack(pady=10, fill=tk.X)
+
         # Add the Save and Load Configuration buttons here
         save_button = tk.Button(
             left_frame, text="Save Configuration", bg="#BA55D3", fg="white",
@@ -355,6 +654,11 @@ class NetworkDesignApp:
             ("Smartphone", self.prepare_to_add_smartphone)
         ], "400x400")  # Set the size for End User popup
 
+    def show_layout_menu(self):
+        x = self.topology_button.winfo_rootx() + self.topology_button.winfo_width()
+        y = self.topology_button.winfo_rooty()
+        self.layout_menu.post(x, y)
+
     def show_connection_menu(self):
         x = self.connection_button.winfo_rootx()
         y = self.connection_button.winfo_rooty() + self.connection_button.winfo_height()
@@ -466,95 +770,515 @@ class NetworkDesignApp:
         self.placing_device = True
         self.root.config(cursor="crosshair")
 
-    def generate_ip_address(self):
-        while True:
-            ip = f"192.168.1.{random.randint(1, 254)}"
-            if is_valid_ip(ip):
-                return ip
-
-    def generate_mac_address(self):
-        while True:
-            mac = ':'.join(['{:02x}'.format(random.randint(0, 255)) for _ in range(6)])
-            if is_valid_mac(mac):
-                return mac
-            
     def add_device(self, x, y, label):
-        count = sum(1 for device_id in self.devices if device_id.startswith(label))
+        try:
+            ip_address, subnet_mask, mac_address = self.addresses.allocate()
+        except RuntimeError as error:
+            messagebox.showerror("Add Device", str(error))
+            return
+        count = self.next_device_id(label) - 1
         device_name = f"{label} {count + 1}"
 
-        ip_address = self.generate_ip_address()
-        mac_address = self.generate_mac_address()
-        subnet_mask = "255.255.255.0"  # Default subnet mask
-
         device_id = f"{label}_{count + 1}"
 
         # Create the device as a single entity with a common tag
-        icon = self.canvas.create_image(x, y, image=self.device_images[label], tags=device_id)
-        text = self.canvas.create_text(x, y + 40, text=device_name, font=("Arial", 10), tags=device_id)
+        icon, text = self.draw_device(device_id, label, device_name, x, y)
         self.devices[device_id] = {
             "icon": icon,
             "label": text,  # This must point to the text object ID
-            "lines": [],
             "ip": ip_address,
             "mac": mac_address,
             "subnet": subnet_mask,
         }
+        self.topology.add_device(
+            device_id, kind=label, label=device_name,
+            ip=ip_address, mac=mac_address, subnet=subnet_mask
+        )
 
-        # Add event bindings to the tag (affects both icon and text)
-        self.canvas.tag_bind(device_id, "<Button-1>", lambda event, dev_id=device_id: self.on_device_click(event, dev_id))
-        self.canvas.tag_bind(device_id, "<B1-Motion>", lambda event, dev_id=device_id: self.on_device_drag(event, dev_id))
-        self.canvas.tag_bind(device_id, "<ButtonRelease-1>", lambda event, dev_id=device_id: self.on_device_release(event, dev_id))
+    def current_device(self):
+        """Returns the id of the device under the mouse pointer, if any."""
+        current = self.canvas.find_withtag("current")
+        return self.item_owner.get(current[0]) if current else None
 
+    def draw_device(self, device_id, kind, text, x, y):
+        """Creates a device's icon and label (and dot, once dots are in use) at canvas (x, y)."""
+        icon_state, label_state, dot_state, _ = LOD_STATES[self.lod]
+        icon = self.canvas.create_image(
+            x, y, image=self.device_images[kind], tags=(device_id, "device", "icon"), state=icon_state
+        )
+        label = self.canvas.create_text(
+            x, y + LABEL_OFFSET, text=text, font=("Arial", 10), tags=(device_id, "device", "label"), state=label_state
+        )
+        self.item_owner[icon] = device_id
+        self.item_owner[label] = device_id
+        if self.dots:
+            self.draw_dot(device_id, kind, x, y, dot_state)
+        self.index_device(device_id, x, y)
+        self.device_epoch[device_id] = self.view_epoch
+        return icon, label
+
+    def draw_dot(self, device_id, kind, x, y, state):
+        color = "#191970" if kind in ("Router", "Switch") else "#008080"
+        dot = self.canvas.create_oval(
+            x - DOT_RADIUS, y - DOT_RADIUS, x + DOT_RADIUS, y + DOT_RADIUS, fill=color, outline="",
+            tags=(device_id, "device", "dot"), state=state
+        )
+        self.dots[device_id] = dot
+        self.item_owner[dot] = device_id
+
+    def index_device(self, device_id, x, y):
+        """Records a device's centre, given in canvas coordinates, e.g. after it is drawn or moved."""
+        x, y = self.to_world(x, y)
+        self.device_index.set_box(device_id, x, y, x, y)
+        self.layout_version += 1
+
+    def world_position(self, device_id):
+        """A device's centre in world units, from the index rather than the canvas."""
+        return self.device_index.shape(device_id)[1:3]
+
+    # Zoom, pan and level of detail
+
+    def to_world(self, x, y):
+        """Canvas coordinates to world units."""
+        offset_x, offset_y = self.view_offset
+        return (x - offset_x) / self.zoom, (y - offset_y) / self.zoom
+
+    def to_canvas(self, x, y):
+        offset_x, offset_y = self.view_offset
+        return x * self.zoom + offset_x, y * self.zoom + offset_y
+
+    def event_point(self, event):
+        """Canvas coordinates of a mouse event, allowing for the canvas being panned."""
+        return self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+
+    def viewport(self, margin=0.0):
+        """The world rectangle in view, grown by `margin` view sizes on every side."""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        left, top = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        x0, y0 = self.to_world(left - width * margin, top - height * margin)
+        x1, y1 = self.to_world(left + width * (1 + margin), top + height * (1 + margin))
+        return x0, y0, x1, y1
+
+    def on_zoom(self, event):
+        # X11 reports the wheel as buttons 4 and 5, Windows and macOS as a signed delta
+        factor = 1 / ZOOM_STEP if event.num == 5 or event.delta < 0 else ZOOM_STEP
+        self.zoom_at(*self.event_point(event), factor)
+
+    def zoom_at(self, x, y, factor):
+        """Zooms by `factor` keeping canvas point (x, y) where it is on screen."""
+        factor = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM) / self.zoom
+        if factor == 1:
+            return
+        self.finish_drag()  # A drag carries on from the new scale with the next motion event
+        # One C-level pass over every item; icons, text and line widths keep their size
+        self.canvas.scale("all", x, y, factor, factor)
+        offset_x, offset_y = self.view_offset
+        self.view_offset = (offset_x * factor + x * (1 - factor), offset_y * factor + y * (1 - factor))
+        self.zoom *= factor
+        self.view_epoch += 1
+        self.select_devices(self.selected_devices)  # Outlines go back to their on-screen size
+        self.update_level_of_detail()
+
+    def fit_view(self):
+        """Zooms and scrolls so that every device is in view."""
+        if not self.devices:
+            return
+        points = [self.world_position(device_id) for device_id in self.devices]
+        x0, x1 = min(x for x, _ in points), max(x for x, _ in points)
+        y0, y1 = min(y for _, y in points), max(y for _, y in points)
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        zoom = min((width - 100) / max(x1 - x0, 1), (height - 100) / max(y1 - y0, 1), 1.0)
+        self.zoom_at(0, 0, zoom / self.zoom)
+        # Scroll the centre of the devices to the centre of the view
+        centre_x, centre_y = self.to_canvas((x0 + x1) / 2, (y0 + y1) / 2)
+        shift_x = self.canvas.canvasx(width / 2) - centre_x
+        shift_y = self.canvas.canvasy(height / 2) - centre_y
+        self.canvas.scan_mark(0, 0)
+        self.canvas.scan_dragto(int(shift_x), int(shift_y), gain=1)
+        self.update_level_of_detail()
+
+    def hit_box(self):
+        """Screen-pixel box around a device centre that counts as the device, None for clusters."""
+        return {"full": DEVICE_HIT_BOX, "icons": ICON_HIT_BOX, "clusters": None}.get(
+            self.lod, (-DOT_RADIUS, -DOT_RADIUS, DOT_RADIUS, DOT_RADIUS))
+
+    def link_width(self):
+        return 1 if self.lod == "points" else 2
+
+    def update_level_of_detail(self):
+        """Picks icons, dots or clusters for the current zoom and redraws what is in view."""
+        self.view_refresh_pending = False
+        clusters = None
+        if self.zoom >= LABEL_ZOOM:
+            level = "full"
+        elif self.zoom >= ICON_ZOOM:
+            level = "icons"
+        elif len(self.devices) <= CLUSTER_THRESHOLD:
+            level = "points"
+        else:
+            clusters = self.visible_clusters()
+            level = "clusters" if sum(count for _, _, count in clusters[0].values()) > CLUSTER_THRESHOLD else "points"
+        changed, self.lod = level != self.lod, level
+        if level == "points" and len(self.dots) < len(self.devices):
+            # Dots are only made once the view first zooms out this far
+            for device_id in self.devices:
+                if device_id not in self.dots:
+                    x, y = self.to_canvas(*self.world_position(device_id))
+                    self.draw_dot(device_id, self.topology.devices[device_id].get("kind"), x, y, LOD_STATES[level][2])
+        if changed:
+            # One call per tag switches every item of a kind at once
+            for tag, state in zip(("icon", "label", "dot", "link"), LOD_STATES[level]):
+                self.canvas.itemconfigure(tag, state=state)
+            self.canvas.itemconfigure("link", width=self.link_width())
+        self.canvas.delete("cluster")
+        if level == "clusters":
+            self.draw_clusters(*clusters)
+        else:
+            self.refresh_visible()
+
+    def schedule_view_refresh(self):
+        """Coalesces redraw requests (pans, edits while zoomed out) into one per idle moment."""
+        if not self.view_refresh_pending:
+            self.view_refresh_pending = True
+            self.root.after(0, self.update_level_of_detail)
+
+    def refresh_visible(self):
+        """Puts labels and dots of the devices in view back to their on-screen size after zooming.
+
+        Scaling the canvas moves a label's offset from its icon and shrinks dots along with
+        everything else; only devices near the viewport are fixed, the rest when they scroll in.
+        """
+        epoch = self.view_epoch
+        for device_id, x, y, _, _ in self.device_index.entries_in_region(*self.viewport(margin=0.5)):
+            if self.device_epoch.get(device_id) == epoch:
+                continue
+            self.device_epoch[device_id] = epoch
+            x, y = self.to_canvas(x, y)
+            self.canvas.coords(self.devices[device_id]["label"], x, y + LABEL_OFFSET)
+            dot = self.dots.get(device_id)
+            if dot is not None:
+                self.canvas.coords(dot, x - DOT_RADIUS, y - DOT_RADIUS, x + DOT_RADIUS, y + DOT_RADIUS)
+
+    def cluster_summary(self, size):
+        """Devices and links grouped into square cells `size` world units across, for every device.
+
+        Returns ({cell: (x, y, count)} with x, y the cell's centroid, and [(count, cell, cell)] for
+        the links between cells, busiest first). Cell sizes are powers of two, so each one is
+        worked out once and reused while zooming, until the topology or a position changes.
+        """
+        version = (self.topology.version, self.layout_version)
+        cached = self.cluster_cache.get(size)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        sums = {}
+        cell_of = {}
+        for device_id, x, y, _, _ in self.device_index.entries():
+            cell = (math.floor(x / size), math.floor(y / size))
+            total = sums.get(cell)
+            if total is None:
+                sums[cell] = [x, y, 1]
+            else:
+                total[0] += x
+                total[1] += y
+                total[2] += 1
+            cell_of[device_id] = cell
+        cells = {cell: (x / count, y / count, count) for cell, (x, y, count) in sums.items()}
+
+        counts = {}
+        for link in self.topology.links.values():
+            a, b = cell_of.get(link.a), cell_of.get(link.b)
+            if a is not None and b is not None and a != b:
+                pair = (a, b) if a < b else (b, a)
+                counts[pair] = counts.get(pair, 0) + 1
+        bundles = sorted(((count, a, b) for (a, b), count in counts.items()), reverse=True)
+        self.cluster_cache[size] = (version, (cells, bundles))
+        return cells, bundles
+
+    def visible_clusters(self):
+        """The cluster cells near the viewport, and every link bundle, at the current zoom."""
+        size = 2.0 ** math.ceil(math.log2(CLUSTER_CELL / self.zoom))
+        cells, bundles = self.cluster_summary(size)
+        x0, y0, x1, y1 = self.viewport(margin=0.5)
+        left, top, right, bottom = math.floor(x0 / size), math.floor(y0 / size), math.floor(x1 / size), math.floor(y1 / size)
+        visible = {
+            cell: summary for cell, summary in cells.items() if left <= cell[0] <= right and top <= cell[1] <= bottom
+        }
+        return visible, cells, bundles
+
+    def draw_clusters(self, visible, cells, bundles):
+        """Draws the cells in view as circles and the busiest MAX_BUNDLES links among them as one line per pair of cells."""
+        drawn = 0
+        for count, a, b in bundles:
+            if a not in visible and b not in visible:
+                continue
+            (x0, y0, _), (x1, y1, _) = cells[a], cells[b]
+            self.canvas.create_line(
+                *self.to_canvas(x0, y0), *self.to_canvas(x1, y1), fill="gray60", width=min(1 + math.log2(count), 6),
+                tags=("cluster",)
+            )
+            drawn += 1
+            if drawn == MAX_BUNDLES:
+                break
+        for x, y, count in visible.values():
+            x, y = self.to_canvas(x, y)
+            radius = min(3 + 2 * math.sqrt(count), CLUSTER_CELL / 2)
+            self.canvas.create_oval(
+                x - radius, y - radius, x + radius, y + radius, fill="#191970", outline="", tags=("cluster",)
+            )
+            if count > 1:
+                self.canvas.create_text(x, y, text=str(count), fill="white", font=("Arial", 8), tags=("cluster",))
+
+    def on_canvas_topology_change(self, event, subject):
+        """Keeps the hit-test indexes in step with links and devices coming and going."""
+        if event == "link_added":
+            if subject.a in self.device_index and subject.b in self.device_index:
+                (x0, y0), (x1, y1) = self.world_position(subject.a), self.world_position(subject.b)
+                self.link_index.set_segment(subject.id, x0, y0, x1, y1)
+        elif event == "link_removed":
+            self.link_index.remove(subject.id)
+        elif event == "device_removed":
+            self.device_index.remove(subject)
+            self.selected_devices.discard(subject)
+            self.device_epoch.pop(subject, None)
+            device_data = self.devices.get(subject)
+            if device_data is not None:
+                self.item_owner.pop(device_data["icon"], None)
+                self.item_owner.pop(device_data["label"], None)
+            self.item_owner.pop(self.dots.pop(subject, None), None)
+        elif event == "cleared":
+            self.device_index.clear()
+            self.link_index.clear()
+            self.item_owner.clear()
+            self.selected_devices.clear()
+            self.dots.clear()
+            self.device_epoch.clear()
+            self.cluster_cache.clear()
+        if self.lod == "clusters" and event in ("device_added", "device_removed", "link_added", "link_removed"):
+            self.schedule_view_refresh()
+
+    def device_at(self, x, y):
+        """The device drawn at canvas point (x, y), or None."""
+        box = self.hit_box()
+        if box is None:
+            return None
+        left, top, right, bottom = box
+        zoom = self.zoom
+        x, y = self.to_world(x, y)
+        # The hit box is fixed in screen pixels, so it is looked up around the click in world units
+        candidates = self.device_index.in_region(
+            x - (right + HIT_TOLERANCE) / zoom, y - (bottom + HIT_TOLERANCE) / zoom,
+            x - (left - HIT_TOLERANCE) / zoom, y - (top - HIT_TOLERANCE) / zoom
+        )
+        best, best_distance = None, None
+        for device_id in candidates:
+            centre_x, centre_y = self.world_position(device_id)
+            dx, dy = (x - centre_x) * zoom, (y - centre_y) * zoom
+            distance = math.hypot(max(left - dx, 0, dx - right), max(top - dy, 0, dy - bottom))
+            if distance <= HIT_TOLERANCE and (best is None or distance < best_distance):
+                best, best_distance = device_id, distance
+        return best
+
+    def link_at(self, x, y):
+        """The link (canvas line id) passing through canvas point (x, y), or None."""
+        if self.lod == "clusters":
+            return None
+        return self.link_index.nearest(*self.to_world(x, y), HIT_TOLERANCE / self.zoom)
+
+    def devices_in_region(self, x0, y0, x1, y1):
+        """Devices drawn overlapping the canvas rectangle between two corners."""
+        left, top, right, bottom = self.hit_box() or (0, 0, 0, 0)
+        (x0, y0), (x1, y1) = self.to_world(min(x0, x1), min(y0, y1)), self.to_world(max(x0, x1), max(y0, y1))
+        zoom = self.zoom
+        return self.device_index.in_region(x0 - right / zoom, y0 - bottom / zoom, x1 - left / zoom, y1 - top / zoom)
 
     def on_left_click(self, event):
+        x, y = self.event_point(event)
         if self.delete_mode:
-            self.delete_at(event.x, event.y)
+            self.delete_at(x, y)
         elif self.connect_mode:
-            closest = self.canvas.find_closest(event.x, event.y)
-            for device_id, device_data in self.devices.items():
-                if closest[0] in (device_data["icon"], device_data["label"]):
-                    if not self.connecting:
-                        self.start_coords = self.get_device_center(device_id)
-                        self.start_device = device_id
-                        self.connecting = True
-                    else:
-                        end_coords = self.get_device_center(device_id)
-                        self.draw_connection(self.start_coords, end_coords, self.start_device, device_id)
-                        self.connecting = False
-                    return
+            device_id = self.device_at(x, y)
+            if device_id is not None:
+                if not self.connecting:
+                    self.start_coords = self.get_device_center(device_id)
+                    self.start_device = device_id
+                    self.connecting = True
+                elif device_id == self.start_device:
+                    self.connecting = False  # Clicking the first device again cancels; links need two ends
+                else:
+                    end_coords = self.get_device_center(device_id)
+                    self.draw_connection(self.start_coords, end_coords, self.start_device, device_id)
+                    self.connecting = False
         elif self.placing_device:
-            self.add_device(event.x, event.y, self.device_to_place)
+            self.add_device(x, y, self.device_to_place)
             self.placing_device = False
             self.root.config(cursor="")
         else:
-            closest = self.canvas.find_closest(event.x, event.y)
-            for device_id, device_data in self.devices.items():
-                if closest[0] in (device_data["icon"], device_data["label"]):
-                    self.selected_device = device_id
-                    break
+            device_id = self.device_at(x, y)
+            if device_id is not None:
+                self.selected_device = device_id
+            if device_id not in self.selected_devices:
+                self.select_devices(())
 
     def on_double_click(self, event):
-        closest = self.canvas.find_closest(event.x, event.y)
-        for device_id, device_data in self.devices.items():
-            if closest[0] in (device_data["icon"], device_data["label"]):
-                self.show_device_info(device_data)
-                break
+        x, y = self.event_point(event)
+        device_id = self.device_at(x, y)
+        if device_id is not None:
+            self.show_device_info(device_id)
+            return
+        line = self.link_at(x, y)
+        if line is not None:
+            self.show_link_info(line)
 
     def on_device_click(self, event, device_id):
+        if event.state & SHIFT_MASK:
+            return  # Shift-drag draws a selection rectangle instead
         self.selected_device = device_id
 
-    def on_device_drag(self, event, device_id):
-        if self.selected_device == device_id:
-            dx = event.x - self.get_device_center(device_id)[0]
-            dy = event.y - self.get_device_center(device_id)[1]
-            self.canvas.move(device_id, dx, dy)  # Moves all elements with the tag
-            for line in self.devices[device_id]["lines"]:
-                self.update_connection(line)
+    def on_device_drag(self, event, device_id=None):
+        if device_id is not None and self.selected_device == device_id and self.band is None:
+            if self.drag is None:
+                self.start_drag(device_id)
+            # Only the latest pointer position counts; the canvas catches up once per frame
+            self.drag["target"] = self.to_world(*self.event_point(event))
+            if self.drag["timer"] is None:
+                self.drag["timer"] = self.root.after(DRAG_FRAME_MS, self.drag_frame)
+
+    def start_drag(self, device_id):
+        """Gets a device, or the whole multi-selection it belongs to, ready to move as one group.
+
+        The group's items, and the links inside it, get a shared "dragging" tag so that each frame
+        is a single canvas move. Links with one end outside the group are the only ones redrawn,
+        from positions cached here rather than read back from the canvas.
+        """
+        group = {device_id}
+        if device_id in self.selected_devices:
+            group.update(member for member in self.selected_devices if member in self.devices)
+        links = self.topology.links
+        inner, outer = set(), []
+        for member in group:
+            for line in self.topology.adjacency[member]:
+                link = links[line]
+                if link.other(member) in group:
+                    inner.add(line)
+                else:
+                    outer.append((line, link.a, link.b))
+        for member in group:
+            self.canvas.addtag_withtag("dragging", member)
+            self.canvas.addtag_withtag("dragging", f"selected_{member}")
+        for line in inner:
+            self.canvas.addtag_withtag("dragging", line)
+        positions = {}
+        for _, a, b in outer:
+            for end in (a, b):
+                if end not in positions:
+                    positions[end] = self.world_position(end)
+        self.drag = {
+            "anchor": self.world_position(device_id),  # Where the dragged device started, in world units
+            "target": None,  # Latest pointer position in world units
+            "moved": (0.0, 0.0),  # World offset applied to the canvas so far
+            "group": group,
+            "inner": inner,
+            "outer": outer,
+            "positions": positions,
+            "timer": None,
+        }
+
+    def drag_frame(self):
+        """Applies the pointer movement merged since the last frame."""
+        drag = self.drag
+        if drag is None:
+            return
+        drag["timer"] = None
+        anchor_x, anchor_y = drag["anchor"]
+        target_x, target_y = drag["target"]
+        dx, dy = target_x - anchor_x, target_y - anchor_y
+        moved_x, moved_y = drag["moved"]
+        if dx == moved_x and dy == moved_y:
+            return
+        zoom = self.zoom
+        self.canvas.move("dragging", (dx - moved_x) * zoom, (dy - moved_y) * zoom)
+        drag["moved"] = (dx, dy)
+        group, positions = drag["group"], drag["positions"]
+        for line, a, b in drag["outer"]:
+            (ax, ay), (bx, by) = positions[a], positions[b]
+            if a in group:
+                ax, ay = ax + dx, ay + dy
+            else:
+                bx, by = bx + dx, by + dy
+            self.canvas.coords(line, *self.to_canvas(ax, ay), *self.to_canvas(bx, by))
+
+    def finish_drag(self):
+        """Brings the indexes up to date with where the dragged devices ended up."""
+        drag = self.drag
+        if drag is None:
+            return
+        if drag["timer"] is not None:
+            self.root.after_cancel(drag["timer"])
+            drag["timer"] = None
+        if drag["target"] is not None:
+            self.drag_frame()
+        self.drag = None
+        self.canvas.dtag("dragging", "dragging")
+        dx, dy = drag["moved"]
+        if not dx and not dy:
+            return
+        group = [member for member in drag["group"] if member in self.devices]
+        for member in group:
+            x, y = self.world_position(member)
+            self.device_index.set_box(member, x + dx, y + dy, x + dx, y + dy)
+        self.layout_version += 1
+        for member in group:
+            for line in self.topology.adjacency[member]:
+                a, b = self.topology.link_endpoints(line)
+                self.link_index.set_segment(line, *self.world_position(a), *self.world_position(b))
+
+    def start_band(self, event):
+        """Shift-click starts a rubber-band rectangle for selecting several devices."""
+        self.selected_device = None
+        x, y = self.event_point(event)
+        item = self.canvas.create_rectangle(x, y, x, y, dash=(4, 2), outline="gray40")
+        self.band = (x, y, item)
+
+    def drag_band(self, event):
+        if self.band is not None:
+            x, y, item = self.band
+            self.canvas.coords(item, x, y, *self.event_point(event))
+
+    def end_band(self, event):
+        if self.band is None:
+            return
+        x, y, item = self.band
+        self.canvas.delete(item)
+        self.band = None
+        self.select_devices(self.devices_in_region(x, y, *self.event_point(event)))
+
+    def select_devices(self, device_ids):
+        """Replaces the multi-selection and outlines the selected devices."""
+        self.canvas.delete("selection")
+        self.selected_devices = set(device_ids)
+        left, top, right, bottom = self.hit_box() or ICON_HIT_BOX
+        for device_id in self.selected_devices:
+            x, y = self.to_canvas(*self.world_position(device_id))
+            self.canvas.create_rectangle(
+                x + left, y + top, x + right, y + bottom, dash=(2, 2), outline="#1E90FF",
+                tags=("selection", f"selected_{device_id}")
+            )
 
-    def on_device_release(self, event, device_id):
+    def delete_selection(self):
+        """Deletes every device in the multi-selection (the Delete key)."""
+        selected = [device_id for device_id in self.selected_devices if device_id in self.devices]
+        self.select_devices(())
+        for device_id in selected:
+            self.delete_device(device_id, report=False)
+        if selected:
+            self.report_convergence()
+
+    def on_device_release(self, event, device_id=None):
+        self.finish_drag()
         self.selected_device = None
 
-    def show_device_info(self, device_data):
+    def show_device_info(self, device_id):
+        device_data = self.devices[device_id]
         popup = tk.Toplevel(self.root)
         popup.title("Device Info")
         popup.geometry("300x250")
@@ -611,210 +1335,501 @@ class NetworkDesignApp:
         )
         save_button.grid(row=4, column=0, columnspan=2)
 
+        if self.forwarding.is_router(device_id):
+            tk.Button(
+                popup, text="Routing Table", command=lambda: self.show_routing_table(device_id),
+                bg="blue" if not self.is_dark_mode else "#0FFF50",
+                fg="white" if not self.is_dark_mode else "black"
+            ).grid(row=5, column=0, columnspan=2, pady=5)
+        elif self.topology.devices[device_id].get("kind") == "Switch":
+            tk.Button(
+                popup, text="MAC Table", command=lambda: self.show_mac_table(device_id),
+                bg="blue" if not self.is_dark_mode else "#0FFF50",
+                fg="white" if not self.is_dark_mode else "black"
+            ).grid(row=5, column=0, columnspan=2, pady=5)
+
         def save_changes(device_data, name_entry, ip_entry, mac_entry, subnet_entry):
             new_name = name_entry.get()
             new_ip = ip_entry.get()
             new_mac = mac_entry.get()
             new_subnet = subnet_entry.get()
+            conflict = self.addresses.conflict(device_id, new_ip, new_mac)
+            if conflict:
+                messagebox.showerror("Duplicate Address", conflict)
+                return False
 
             # Update the device attributes
             device_data["ip"] = new_ip
             device_data["mac"] = new_mac
             device_data["subnet"] = new_subnet
+            self.topology.update_device(device_id, label=new_name, ip=new_ip, mac=new_mac, subnet=new_subnet)
 
             # Update the canvas text
             self.canvas.itemconfig(device_data["label"], text=new_name)
 
+    def show_routing_table(self, router):
+        """Lists the router's forwarding table, longest prefixes are matched first."""
+        table = self.forwarding.table(router)
+        lines = [f"{route.prefix:<18} {route.next_hop or 'connected':<12} {route.origin}" for route in table.routes()[:30]]
+        if len(table) > 30:
+            lines.append(f"... and {len(table) - 30} more routes")
+        self.show_message_popup(f"Routing Table - {router}", "\n".join(lines) or "No routes.")
+
+    def show_mac_table(self, switch):
+        """Lists the MAC addresses the switch has learned and the neighbor each port leads to."""
+        table = self.switching.mac_table(switch)
+        lines = []
+        for mac, port, age in table.items(self.switching.now()):
+            if len(lines) == 30:
+                lines.append(f"... and {len(table) - 30} more entries")
+                break
+            neighbor = self.topology.links[port].other(switch) if port in self.topology.links else "?"
+            lines.append(f"{mac}  port to {neighbor}  age {age:.1f}s")
+        lines.append(
+            f"\n{len(table)}/{table.capacity} entries, {table.evictions} evicted, "
+            f"broadcast domain of {len(self.switching.broadcast_domain(switch))} devices"
+        )
+        self.show_message_popup(f"MAC Table - {switch}", "\n".join(lines))
+
     def get_device_center(self, device_id):
         device_data = self.devices[device_id]
         coords = self.canvas.coords(device_data["icon"])
         return coords[0], coords[1]
 
-    def draw_connection(self, start_coords, end_coords, start_device, end_device):
-        color = {
+    def draw_connection(self, start_coords, end_coords, start_device, end_device, attrs=None):
+        # Each link keeps its own type, bandwidth, delay and loss; new ones use the current type
+        attrs = attrs or link_attributes(self.connection_type)
+        color = self.connection_color(attrs["connection"])
+
+        line = self.canvas.create_line(
+            start_coords, end_coords, fill=color, width=self.link_width(), state=LOD_STATES[self.lod][3], tags=("link",)
+        )
+        self.topology.add_link(start_device, end_device, link_id=line, **attrs)
+
+    def connection_color(self, connection_type):
+        return {
             "Ethernet": "black",
             "Fiber Optic": "blue",
             "Wireless": "green"
-        }.get(self.connection_type, "black")
+        }.get(connection_type, "black")
 
-        line = self.canvas.create_line(start_coords, end_coords, fill=color, width=2)
-        self.devices[start_device]["lines"].append(line)
-        self.devices[end_device]["lines"].append(line)
+    def show_link_info(self, line):
+        """Popup to edit the type, bandwidth, delay and loss of a single link."""
+        link = self.topology.links[line]
+        popup = tk.Toplevel(self.root)
+        popup.title("Link Info")
+        popup.geometry("300x370")
+
+        # Adjust popup theme based on the current mode
+        if self.is_dark_mode:
+            popup.configure(bg="#1e1e1e")
+            label_fg = "white"
+            entry_bg = "#333333"
+            entry_fg = "white"
+        else:
+            popup.configure(bg="white")
+            label_fg = "black"
+            entry_bg = "white"
+            entry_fg = "black"
+
+        tk.Label(popup, text=f"{link.a} <-> {link.b}", fg=label_fg, bg=popup.cget("bg")).grid(
+            row=0, column=0, columnspan=2, pady=5)
+
+        # Connection type
+        tk.Label(popup, text="Type:", fg=label_fg, bg=popup.cget("bg")).grid(row=1, column=0, sticky=tk.W)
+        type_var = tk.StringVar(value=link.attrs.get("connection", "Ethernet"))
+        tk.OptionMenu(popup, type_var, *LINK_PROFILES).grid(row=1, column=1)
+
+        # Bandwidth, delay and loss in user friendly units
+        fields = [
+            ("Bandwidth (Mbps):", link.attrs.get("bandwidth", 0) / 1e6),
+            ("Delay (ms):", link.attrs.get("delay", 0) * 1000),
+            ("Loss (%):", link.attrs.get("loss", 0) * 100),
+        ]
+        entries = []
+        for row, (text, value) in enumerate(fields, start=2):
+            tk.Label(popup, text=text, fg=label_fg, bg=popup.cget("bg")).grid(row=row, column=0, sticky=tk.W)
+            entry = tk.Entry(popup, bg=entry_bg, fg=entry_fg)
+            entry.grid(row=row, column=1)
+            entry.insert(0, f"{value:g}")
+            entries.append(entry)
+
+        # Output queue: scheduling, buffer size and drop policy
+        tk.Label(popup, text="Queue:", fg=label_fg, bg=popup.cget("bg")).grid(row=5, column=0, sticky=tk.W)
+        queue_var = tk.StringVar(value=link.attrs.get("queue", self.queues.discipline))
+        tk.OptionMenu(popup, queue_var, *DISCIPLINES).grid(row=5, column=1)
+        tk.Label(popup, text="Buffer (packets):", fg=label_fg, bg=popup.cget("bg")).grid(row=6, column=0, sticky=tk.W)
+        buffer_entry = tk.Entry(popup, bg=entry_bg, fg=entry_fg)
+        buffer_entry.grid(row=6, column=1)
+        buffer_entry.insert(0, str(link.attrs.get("buffer", DEFAULT_BUFFER)))
+        tk.Label(popup, text="Drop Policy:", fg=label_fg, bg=popup.cget("bg")).grid(row=7, column=0, sticky=tk.W)
+        aqm_var = tk.StringVar(value=link.attrs.get("aqm", self.queues.aqm))
+        tk.OptionMenu(popup, aqm_var, *DROP_POLICIES).grid(row=7, column=1)
+
+        # Scheduled outages in seconds of simulation time, e.g. "2-5, 10-12"
+        tk.Label(popup, text="Outages (s):", fg=label_fg, bg=popup.cget("bg")).grid(row=8, column=0, sticky=tk.W)
+        outage_entry = tk.Entry(popup, bg=entry_bg, fg=entry_fg)
+        outage_entry.grid(row=8, column=1)
+        outage_entry.insert(0, ", ".join(f"{down:g}-{up:g}" for down, up in link.attrs.get("outages") or ()))
+
+        def save_link():
+            try:
+                bandwidth, delay, loss = (float(entry.get()) for entry in entries)
+                buffer = int(buffer_entry.get())
+                outages = [[float(value) for value in span.split("-")]
+                           for span in outage_entry.get().replace(" ", "").split(",") if span]
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Bandwidth, delay, loss, buffer and outages must be numbers.")
+                return
+            if any(len(span) != 2 or span[0] >= span[1] for span in outages):
+                messagebox.showerror("Invalid Input", "Outages must look like 2-5, 10-12 (down-up in seconds).")
+                return
+            if bandwidth <= 0 or delay < 0 or not 0 <= loss <= 100 or buffer < 0:
+                messagebox.showerror(
+                    "Invalid Input",
+                    "Bandwidth must be positive, delay and buffer non-negative and loss 0-100%."
+                )
+                return
+            self.topology.update_link(
+                line, connection=type_var.get(), bandwidth=bandwidth * 1e6, delay=delay / 1000, loss=loss / 100,
+                queue=queue_var.get(), buffer=buffer, aqm=aqm_var.get(), outages=outages
+            )
+            self.canvas.itemconfig(line, fill=self.connection_color(type_var.get()))
+            popup.destroy()
+
+        tk.Button(
+            popup, text="Save", command=save_link,
+            bg="blue" if not self.is_dark_mode else "#0FFF50",
+            fg="white" if not self.is_dark_mode else "black"
+        ).grid(row=9, column=0, columnspan=2, pady=10)
 
     def update_connection(self, line):
-        coords = self.canvas.coords(line)
-        start_device, end_device = None, None
-        for device_id, device_data in self.devices.items():
-            if line in device_data["lines"]:
-                if not start_device:
-                    start_device = device_id
-                else:
-                    end_device = device_id
-                    break
+        start_device, end_device = self.topology.link_endpoints(line)
         if start_device and end_device:
             start_coords = self.get_device_center(start_device)
             end_coords = self.get_device_center(end_device)
             self.canvas.coords(line, start_coords[0], start_coords[1], end_coords[0], end_coords[1])
+            self.link_index.set_segment(line, *self.world_position(start_device), *self.world_position(end_device))
 
     def delete_at(self, x, y):
-        closest = self.canvas.find_closest(x, y)  # Find the closest object
-        item_type = self.canvas.type(closest[0])  # Get the type of the closest object
-
-        # Check if the clicked item is a line
-        if item_type == "line":
-            self.delete_line(closest[0])
+        # Devices win over the lines that end at their centre
+        device_id = self.device_at(x, y)
+        if device_id is not None:
+            self.delete_device(device_id)
             return
+        line = self.link_at(x, y)
+        if line is not None:
+            self.delete_line(line)
 
-        # If not a line, check for devices
-        for device_id, device_data in list(self.devices.items()):
-            if closest[0] in (device_data["icon"], device_data["label"]):
-                # Delete connected lines first
-                for line in device_data["lines"]:
-                    self.canvas.delete(line)
-                # Delete the device icon and label
-                self.canvas.delete(device_data["icon"])
-                self.canvas.delete(device_data["label"])
-                # Remove device from the devices dictionary
-                del self.devices[device_id]
-                return
+    def delete_device(self, device_id, report=True):
+        """Deletes a device, its connections and its canvas items."""
+        device_data = self.devices[device_id]
+        dot = self.dots.get(device_id)
+        # Delete connected lines first
+        for link in self.topology.remove_device(device_id):
+            self.canvas.delete(link.id)
+        # Delete the device icon and label (and dot)
+        self.canvas.delete(device_data["icon"])
+        self.canvas.delete(device_data["label"])
+        if dot is not None:
+            self.canvas.delete(dot)
+        # Remove device from the devices dictionary
+        del self.devices[device_id]
+        if report:
+            self.report_convergence()
 
     def delete_line(self, line_id):
         """Deletes a connection line and removes references from connected devices."""
-        for device_id, device_data in self.devices.items():
-            if line_id in device_data["lines"]:
-                device_data["lines"].remove(line_id)  # Remove line reference from device
+        self.topology.remove_link(line_id)  # Remove line reference from both devices
         self.canvas.delete(line_id)  # Remove the line from the canvas
+        self.report_convergence()
+
+    def show_protocol_menu(self):
+        """Popup to choose between static shortest paths and a dynamic routing protocol."""
+        popup = tk.Toplevel(self.root)
+        popup.title("Routing Protocol")
+        popup.geometry("300x150")
+
+        # Adjust popup theme based on the current mode
+        if self.is_dark_mode:
+            popup.configure(bg="#1e1e1e")
+            label_fg = "white"
+            button_bg = "#444444"
+            button_fg = "white"
+        else:
+            popup.configure(bg="white")
+            label_fg = "black"
+            button_bg = "#e0e0e0"
+            button_fg = "black"
+
+        current = next((key for key, cls in PROTOCOLS.items() if isinstance(self.routing_protocol, cls)), "static")
+        tk.Label(popup, text="Protocol:", fg=label_fg, bg=popup.cget("bg")).grid(row=0, column=0, padx=10, pady=5)
+        choice = tk.StringVar(value=current)
+        menu = tk.OptionMenu(popup, choice, "static", *PROTOCOLS)
+        menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
+        menu.grid(row=0, column=1, padx=10, pady=5)
+
+        def apply():
+            popup.destroy()
+            self.set_routing_protocol(choice.get())
+
+        tk.Button(popup, text="Apply", command=apply, bg=button_bg, fg=button_fg).grid(
+            row=1, column=0, columnspan=2, pady=10)
+
+    def show_impairment_menu(self):
+        """Popup for the loss and jitter applied to every link, and the seed that replays them."""
+        popup = tk.Toplevel(self.root)
+        popup.title("Impairments")
+        popup.geometry("320x330")
+
+        # Adjust popup theme based on the current mode
+        if self.is_dark_mode:
+            popup.configure(bg="#1e1e1e")
+            label_fg = "white"
+            entry_bg = "#333333"
+            entry_fg = "white"
+            button_bg = "#444444"
+            button_fg = "white"
+        else:
+            popup.configure(bg="white")
+            label_fg = "black"
+            entry_bg = "white"
+            entry_fg = "black"
+            button_bg = "#e0e0e0"
+            button_fg = "black"
+
+        current = self.impairments.profile.as_dict()
+        loss = current.get("loss", {})
+        jitter = current.get("jitter", {})
+
+        tk.Label(popup, text="Loss Model:", fg=label_fg, bg=popup.cget("bg")).grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+        model = tk.StringVar(value=loss.get("model", "none"))
+        model_menu = tk.OptionMenu(popup, model, *LOSS_MODELS)
+        model_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
+        model_menu.grid(row=0, column=1, padx=10, pady=5)
+
+        tk.Label(popup, text="Jitter:", fg=label_fg, bg=popup.cget("bg")).grid(row=4, column=0, padx=10, pady=5, sticky=tk.W)
+        distribution = tk.StringVar(value=jitter.get("distribution", "none"))
+        distribution_menu = tk.OptionMenu(popup, distribution, *JITTER_DISTRIBUTIONS)
+        distribution_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
+        distribution_menu.grid(row=4, column=1, padx=10, pady=5)
+
+        # Bernoulli uses the loss rate; Gilbert-Elliott uses the good->bad and bad->good probabilities
+        fields = [
+            (1, "Loss Rate (%):", loss.get("rate", 0) * 100),
+            (2, "Gilbert p (%):", loss.get("p", 0.01) * 100),
+            (3, "Gilbert r (%):", loss.get("r", 0.3) * 100),
+            (5, "Jitter (ms):", jitter.get("scale", 0) * 1000),
+            (6, "Seed:", "" if self.impairments.seed is None else self.impairments.seed),
+        ]
+        entries = []
+        for row, text, value in fields:
+            tk.Label(popup, text=text, fg=label_fg, bg=popup.cget("bg")).grid(row=row, column=0, padx=10, pady=5, sticky=tk.W)
+            entry = tk.Entry(popup, bg=entry_bg, fg=entry_fg)
+            entry.grid(row=row, column=1, padx=10, pady=5)
+            entry.insert(0, f"{value:g}" if isinstance(value, float) else str(value))
+            entries.append(entry)
+
+        def apply():
+            try:
+                rate, p, r, scale = (float(entry.get()) for entry in entries[:4])
+                seed = int(entries[4].get()) if entries[4].get().strip() else None
+                profile = ImpairmentProfile.from_dict({
+                    "loss": {"model": model.get(), "rate": rate / 100, "p": p / 100, "r": r / 100},
+                    "jitter": {"distribution": distribution.get(), "scale": scale / 1000},
+                })
+            except ValueError as error:
+                messagebox.showerror("Invalid Input", str(error) or "Impairment settings must be numbers.")
+                return
+            self.impairments.profile = profile
+            self.impairments.reseed(seed)
+            popup.destroy()
+
+        tk.Button(popup, text="Apply", command=apply, bg=button_bg, fg=button_fg).grid(
+            row=7, column=0, columnspan=2, pady=10)
+
+    def set_routing_protocol(self, name):
+        """Runs RIP or OSPF between the routers from a cold start, or goes back to static routes."""
+        if self.routing_protocol is not None:
+            self.routing_protocol.stop()
+        self.routing_protocol = None
+        if name in PROTOCOLS:
+            self.routing_protocol = PROTOCOLS[name](self.topology, self.engine)
+            self.routing_protocol.start(cold=True)
+        self.forwarding.protocol = self.routing_protocol
+        self.forwarding.on_topology_change("protocol", None)  # Drop tables built from the old routes
+        self.report_convergence()
+
+    def report_convergence(self):
+        """Lets the routing protocol settle after a change and shows what it took."""
+        if self.routing_protocol is None:
+            return
+        self.engine.run()
+        self.show_message_popup("Routing Convergence", self.routing_protocol.report().summary())
 
 #////////////////////////////////////////\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
     def export_to_networkx(self):
-        """Exports the network topology to a NetworkX graph."""
-        G = nx.Graph()
-        for device_id, device_data in self.devices.items():
-            # Add nodes with updated device label
-            G.add_node(
-                device_id,
-                label=device_data.get("label_text", self.canvas.itemcget(device_data["label"], "text")),
-                ip=device_data["ip"],
-                mac=device_data["mac"]
-            )
-        for device_id, device_data in self.devices.items():
-            for line in device_data["lines"]:
-                start_device, end_device = self.get_line_devices(line)
-                if start_device and end_device:
-                    G.add_edge(start_device, end_device, connection=self.connection_type)
-        return G
+        """Returns the live NetworkX graph of the topology, which is updated in place on every edit."""
+        return self.topology.graph
 
     
     def get_line_devices(self, line):
         """Finds the start and end devices connected by a line."""
-        for device_id, device_data in self.devices.items():
-            if line in device_data["lines"]:
-                if "start" not in locals():
-                    start = device_id
-                else:
-                    end = device_id
-                    return start, end
-        return None, None
+        return self.topology.link_endpoints(line)
     
-    def plot_topology(self):
-        """Plots the network topology."""
-        G = self.export_to_networkx()
+    def plot_topology(self, method="force"):
+        """Plots the network topology with one of the layouts in layout.LAYOUTS."""
+        # Positions are cached by the layout engine; "canvas" reuses where the devices are drawn
+        coords = {device_id: self.world_position(device_id) for device_id in self.devices}
+        job = self.layouts.prepare(method, coords)
+
+        def laid_out(positions):
+            if not self.layouts.finish(job, positions):
+                self.plot_topology(method)  # The topology was edited during the layout; lay it out again
+                return
+            self.render_plot("Network Topology", render_topology, topology_plot(self.topology, positions))
+
+        # Force-directed layout of a big topology takes seconds, so it runs on the worker
+        self.root.title("Network Design Tool - Laying out topology...")
+        self.wait_for_result(self.simulation_pool.submit(job.run), laid_out)
+
+    def render_plot(self, title, render, plot):
+        """Renders a plot to a PNG in the plot process and shows it once it is ready."""
+        handle, path = tempfile.mkstemp(suffix=".png")
+        os.close(handle)
+
+        def show(path):
+            try:
+                image = Image.open(path)
+                image.load()
+            finally:
+                os.remove(path)
+            self.show_plot(title, image, render, plot)
+
+        def discard(future):
+            # show() never runs for a failed render, so its PNG is removed here
+            if future.cancelled() or future.exception() is not None:
+                os.remove(path)
+
+        self.root.title("Network Design Tool - Rendering plot...")
+        future = self.plot_renderer.submit(render, path, plot, self.is_dark_mode)
+        future.add_done_callback(discard)
+        self.wait_for_result(future, show)
+
+    def show_plot(self, title, image, render, plot):
+        """Shows a rendered plot in its own window, with a button to save it as PNG, SVG or PDF."""
+        popup = tk.Toplevel(self.root)
+        popup.title(title)
+        popup.configure(bg="#1e1e1e" if self.is_dark_mode else "white")
+        photo = ImageTk.PhotoImage(image)
+        label = tk.Label(popup, image=photo, bg=popup.cget("bg"))
+        label.image = photo  # Keep a reference so Tk does not lose the image
+        label.pack()
+
+        def save_as():
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".png",
+                filetypes=[("PNG Files", "*.png"), ("SVG Files", "*.svg"), ("PDF Files", "*.pdf")]
+            )
+            if file_path:
+                self.root.title("Network Design Tool - Saving plot...")
+                self.wait_for_result(
+                    self.plot_renderer.submit(render, file_path, plot, self.is_dark_mode),
+                    lambda path: messagebox.showinfo(title, f"Saved {path}")
+                )
+
+        tk.Button(
+            popup, text="Save As...", command=save_as,
+            bg="#444444" if self.is_dark_mode else "#e0e0e0", fg="white" if self.is_dark_mode else "black"
+        ).pack(pady=5)
 
-        # Prepare node labels and positions
-        pos = nx.spring_layout(G)
-        labels = nx.get_node_attributes(G, 'label')
 
-        # Check the current theme mode
+    def show_latency_menu(self):
+        """Asks for the source device whose round trip times should be plotted."""
+        popup = tk.Toplevel(self.root)
+        popup.title("Show Latency")
+        popup.geometry("300x150")
+
+        # Adjust popup theme based on the current mode
         if self.is_dark_mode:
-            plt.style.use("dark_background")
-            node_color = 'skyblue'
-            font_color = 'white'
-            edge_color = 'lightgray'
-            title_color = 'white'
+            popup.configure(bg="#1e1e1e")
+            label_fg = "white"
+            button_bg = "#444444"
+            button_fg = "white"
         else:
-            plt.style.use("default")
-            node_color = 'blue'
-            font_color = 'black'
-            edge_color = 'black'
-            title_color = 'black'
-
-        # Plot the graph
-        plt.figure(figsize=(8, 6))
-        nx.draw(
-            G, pos, with_labels=True, labels=labels, 
-            node_color=node_color, node_size=2000, 
-            font_size=10, font_color=font_color, font_weight='bold'
-        )
-        nx.draw_networkx_edge_labels(
-            G, pos, edge_labels=nx.get_edge_attributes(G, 'connection'), 
-            font_size=8, font_color=edge_color
-        )
-        plt.title("Network Topology", fontsize=16, color=title_color)
-        plt.show()
+            popup.configure(bg="white")
+            label_fg = "black"
+            button_bg = "#e0e0e0"
+            button_fg = "black"
+
+        device_names = [data["label"] for data in self.topology.devices.values()]
+        if not device_names:
+            popup.destroy()
+            messagebox.showerror("Latency Error", "Add some devices first.")
+            return
+
+        tk.Label(popup, text="From Device:", fg=label_fg, bg=popup.cget("bg")).grid(row=0, column=0, padx=10, pady=5)
+        from_device = tk.StringVar(value=device_names[0])
+        from_menu = tk.OptionMenu(popup, from_device, *device_names)
+        from_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
+        from_menu.grid(row=0, column=1, padx=10, pady=5)
 
+        def trigger_plot():
+            from_id = self.topology.find_by_label(from_device.get())
+            popup.destroy()
+            self.plot_latency_graph(from_id)
 
-    def plot_latency_graph(self):
-        """Plots a mock latency graph for devices."""
-        device_names = [data["label"] for data in self.devices.values()]
-        latencies = [random.randint(1, 100) for _ in device_names]  # Mock data for latencies
+        tk.Button(popup, text="Show", command=trigger_plot, bg=button_bg, fg=button_fg).grid(
+            row=1, column=0, columnspan=2, pady=10)
 
-        # Check the current theme mode
-        if self.is_dark_mode:
-            plt.style.use("dark_background")
-            bar_color = 'limegreen'
-            text_color = 'white'
-        else:
-            plt.style.use("default")
-            bar_color = 'blue'
-            text_color = 'black'
-
-        # Plot the latency bar graph
-        plt.figure(figsize=(10, 6))
-        plt.bar(device_names, latencies, color=bar_color)
-        plt.xlabel("Devices", fontsize=12, color=text_color)
-        plt.ylabel("Latency (ms)", fontsize=12, color=text_color)
-        plt.title("Latency per Device", fontsize=16, color=text_color)
-        plt.xticks(rotation=45, ha="right", color=text_color)
-        plt.yticks(color=text_color)
-        plt.tight_layout()
-        plt.show()
+    def plot_latency_graph(self, source):
+        """Plots the modelled round trip time from source to every reachable device."""
+        rtts = self.latency.rtt_from(source)
+        if not rtts:
+            messagebox.showerror("Latency Error", "No devices are reachable from the selected source.")
+            return
+        self.render_plot("Latency", render_latency, latency_plot(self.topology, source, rtts))
 
 #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++#
     def simulate_interaction(self, from_device, to_device):
         if from_device in self.devices and to_device in self.devices:
-            # Create a NetworkX graph representation
-            G = self.export_to_networkx()
-
-            # Check if the devices are connected
-            if nx.has_path(G, from_device, to_device):
-                path = nx.shortest_path(G, from_device, to_device)
-
-                # Get the target device's IP
-                target_ip = self.devices[to_device]["ip"]
-
-                # Generate random ping statistics
-                response_times = [random.randint(1, 100) for _ in range(4)]  # Random times in ms
-                ttls = [random.randint(50, 128) for _ in range(4)]  # Random TTL values
-                min_time = min(response_times)
-                max_time = max(response_times)
-                avg_time = sum(response_times) // len(response_times)
+            # Get the target device's IP and forward the echo request to it hop by hop
+            target_ip = self.devices[to_device]["ip"]
+            delivery = self.forwarding.forward(from_device, target_ip, INITIAL_TTL)
+            if delivery.delivered:
+                # Request and reply frames teach the switches along the way where both ends are
+                self.switching.carry(delivery.path)
+                self.switching.carry(delivery.path[::-1])
+
+                # Four echoes, one a second, through the links' delays, loss, jitter and outages
+                rtts = self.impairments.ping(delivery.path, PING_PACKET_SIZE, 4)
+                self.engine.run(until=self.engine.now + 4 * PING_INTERVAL)
+                response_times = [rtt * 1000 for rtt in rtts if rtt is not None]
+                lost = len(rtts) - len(response_times)
 
                 # Create the ping message
                 message = f"Pinging {to_device} [{target_ip}] with 32 bytes of data:\n"
-                for time, ttl in zip(response_times, ttls):
-                    message += f"Reply from {target_ip}: bytes=32 time={time}ms TTL={ttl}\n"
+                for rtt in rtts:
+                    if rtt is None:
+                        message += "Request timed out.\n"
+                    else:
+                        message += f"Reply from {target_ip}: bytes=32 time={rtt * 1000:.2f}ms TTL={delivery.ttl}\n"
 
                 # Add Ping statistics
                 message += f"\nPing statistics for {target_ip}:\n"
-                message += f"    Packets: Sent = 4, Received = 4, Lost = 0 (0% loss),\n"
-                message += "Approximate round trip times in milli-seconds:\n"
-                message += f"    Minimum = {min_time}ms, Maximum = {max_time}ms, Average = {avg_time}ms"
+                message += f"    Packets: Sent = 4, Received = {len(response_times)}, Lost = {lost} ({lost * 25}% loss),\n"
+                if response_times:
+                    min_time = min(response_times)
+                    max_time = max(response_times)
+                    avg_time = sum(response_times) / len(response_times)
+                    message += "Approximate round trip times in milli-seconds:\n"
+                    message += f"    Minimum = {min_time:.2f}ms, Maximum = {max_time:.2f}ms, Average = {avg_time:.2f}ms"
 
                 # Display result in a styled popup
                 self.show_message_popup("Ping Result", message)
             else:
                 # Display error pop-up
-                messagebox.showerror("Ping Error", "Could not reach the host.")
+                messagebox.showerror("Ping Error", f"Could not reach the host.\n{delivery.reason}")
         else:
             messagebox.showerror("Ping Error", "Invalid device selection.")
 
@@ -822,7 +1837,7 @@ class NetworkDesignApp:
     def show_interaction_menu(self):
         popup = tk.Toplevel(self.root)
         popup.title("Interact Between Devices")
-        popup.geometry("300x200")
+        popup.geometry("300x320")
 
         # Adjust popup theme based on the current mode
         if self.is_dark_mode:
@@ -836,80 +1851,115 @@ class NetworkDesignApp:
             button_bg = "#e0e0e0"
             button_fg = "black"
 
-        def refresh_device_names():
-            return {device_id: self.canvas.itemcget(data["label"], "text") for device_id, data in self.devices.items()}
-
-        device_names = refresh_device_names()
+        device_names = [self.topology.devices[device_id]["label"] for device_id in self.devices]
 
         # Dropdown menu for 'from' device
         tk.Label(popup, text="From Device:", fg=label_fg, bg=popup.cget("bg")).grid(row=0, column=0, padx=10, pady=5)
-        from_device = tk.StringVar(value=list(device_names.values())[0])
-        from_menu = tk.OptionMenu(popup, from_device, *device_names.values())
+        from_device = tk.StringVar(value=device_names[0])
+        from_menu = tk.OptionMenu(popup, from_device, *device_names)
         from_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
         from_menu.grid(row=0, column=1, padx=10, pady=5)
 
         # Dropdown menu for 'to' device
         tk.Label(popup, text="To Device:", fg=label_fg, bg=popup.cget("bg")).grid(row=1, column=0, padx=10, pady=5)
-        to_device = tk.StringVar(value=list(device_names.values())[0])
-        to_menu = tk.OptionMenu(popup, to_device, *device_names.values())
+        to_device = tk.StringVar(value=device_names[0])
+        to_menu = tk.OptionMenu(popup, to_device, *device_names)
         to_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
         to_menu.grid(row=1, column=1, padx=10, pady=5)
 
+        # Optional IP or MAC address, which takes precedence over the 'to' dropdown
+        tk.Label(popup, text="Or To Address:", fg=label_fg, bg=popup.cget("bg")).grid(row=2, column=0, padx=10, pady=5)
+        address_entry = tk.Entry(popup)
+        address_entry.grid(row=2, column=1, padx=10, pady=5)
+
         def trigger_interaction():
-            from_id = next((k for k, v in device_names.items() if v == from_device.get()), None)
-            to_id = next((k for k, v in device_names.items() if v == to_device.get()), None)
+            try:
+                from_id = self.topology.resolve(from_device.get())
+                to_id = self.topology.resolve(address_entry.get().strip() or to_device.get())
+            except KeyError:
+                messagebox.showerror("Ping", f"No device has the address '{address_entry.get().strip()}'.")
+                return
             self.simulate_interaction(from_id, to_id)
             popup.destroy()
 
-        tk.Button(popup, text="Ping", command=trigger_interaction, bg=button_bg, fg=button_fg).grid(row=2, column=0, columnspan=2, pady=10)
+        tk.Button(popup, text="Ping", command=trigger_interaction, bg=button_bg, fg=button_fg).grid(row=3, column=0, columnspan=2, pady=10)
+
+        # Monte-Carlo RTT percentiles and loss between every pair of hosts
+        tk.Label(popup, text="Sweep Samples:", fg=label_fg, bg=popup.cget("bg")).grid(row=4, column=0, padx=10, pady=5)
+        samples_entry = tk.Entry(popup)
+        samples_entry.grid(row=4, column=1, padx=10, pady=5)
+        samples_entry.insert(0, str(DEFAULT_SAMPLES))
+
+        def trigger_sweep():
+            try:
+                samples = int(samples_entry.get())
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Samples must be a whole number.")
+                return
+            popup.destroy()
+            self.sweep_all_pairs(samples)
+
+        tk.Button(popup, text="Sweep All Pairs", command=trigger_sweep, bg=button_bg, fg=button_fg).grid(row=5, column=0, columnspan=2, pady=10)
+
+    def sweep_all_pairs(self, samples=DEFAULT_SAMPLES):
+        """Resolves every host pair's path here, samples them on the worker pool, then offers an export."""
+        hosts = end_hosts(self.topology)
+        if len(hosts) < 2:
+            messagebox.showinfo("RTT Sweep", "Add at least two hosts to sweep.")
+            return
+        sweep = RttSweep(self.topology, self.routes, self.impairments, hosts)
+
+        def show_matrix(matrix):
+            self.show_message_popup("RTT Sweep", matrix.summary())
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".csv", filetypes=[("CSV Files", "*.csv"), ("Parquet Files", "*.parquet")]
+            )
+            if file_path:
+                try:
+                    matrix.export(file_path)
+                except ImportError:
+                    messagebox.showerror("RTT Sweep", "Parquet export needs pyarrow; save as CSV instead.")
+
+        self.root.title("Network Design Tool - Sweeping RTTs...")
+        self.wait_for_result(self.simulation_pool.submit(sweep.run, samples, self.engine.now), show_matrix)
         
 #OOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOO#
 
 
+    def on_simulation_event(self, kind, now, info):
+        """Records packet hops emitted by the simulation engine so the canvas can replay them."""
+        if kind == "hop":
+            self.pending_hops.setdefault(info["packet"].id, []).append((info["start"], info["end"]))
+
     # Updated send_data_packet method
     def send_data_packet(self, from_device, to_device, data="Hello, Network!"):
-        def simulate_packet():
-            if from_device in self.devices and to_device in self.devices:
-                G = self.export_to_networkx()
-                if nx.has_path(G, from_device, to_device):
-                    path = nx.shortest_path(G, from_device, to_device)
-
-                    # Load the message icon (ensure the file is in the same directory or provide the full path)
-                    message_icon = ImageTk.PhotoImage(Image.open("message.png").resize((15, 15)))
-
-                    for i in range(len(path) - 1):
-                        start_coords = self.get_device_center(path[i])
-                        end_coords = self.get_device_center(path[i + 1])
-
-                        # Create an image to represent the packet
-                        packet = self.canvas.create_image(start_coords[0], start_coords[1], image=message_icon)
-
-                        # Animate the packet along the line
-                        for t in range(21):  # 21 steps for smoother animation
-                            x = start_coords[0] + (end_coords[0] - start_coords[0]) * t / 20
-                            y = start_coords[1] + (end_coords[1] - start_coords[1]) * t / 20
-                            self.canvas.coords(packet, x, y)
-                            time.sleep(0.05)  # Adjust for speed of animation
-                            self.root.update_idletasks()
-
-                        # Remove the packet from the canvas after reaching the endpoint
-                        self.canvas.delete(packet)
-
-                    message = (
-                        f"Data Packet Transmission:\n"
-                        f"From: {from_device}\n"
-                        f"To: {to_device}\n"
-                        f"Data: {data}\n"
-                        f"Status: Success"
-                    )
+        hops = []
+        if from_device in self.devices and to_device in self.devices:
+            path = self.routes.shortest_path(from_device, to_device)
+            if path:
+
+                # Run the transmission on the event engine; it completes instantly in virtual time
+                packet = self.forwarder.send(path, data, protocol="UDP")
+                self.engine.run()
+                hops = self.pending_hops.pop(packet.id, [])
+
+                if packet.delivered_at is not None:
+                    outcome = f"Latency: {packet.latency * 1000:.2f}ms\nStatus: Success"
                 else:
-                    message = f"Data Packet Transmission Failed:\nNo Path Between {from_device} and {to_device}"
+                    outcome = f"Status: Dropped between {packet.dropped_at[0]} and {packet.dropped_at[1]}"
+                message = (
+                    f"Data Packet Transmission:\n"
+                    f"From: {from_device}\n"
+                    f"To: {to_device}\n"
+                    f"Data: {data}\n"
+                    f"{outcome}"
+                )
             else:
-                message = f"Data Packet Transmission Failed:\nInvalid Devices: {from_device}, {to_device}"
-
-            self.root.after(0, self.show_message_popup, "Data Packet Transmission", message)
+                message = f"Data Packet Transmission Failed:\nNo Path Between {from_device} and {to_device}"
+        else:
+            message = f"Data Packet Transmission Failed:\nInvalid Devices: {from_device}, {to_device}"
 
-        threading.Thread(target=simulate_packet, daemon=True).start()
+        self.animator.add(hops, lambda: self.show_message_popup("Data Packet Transmission", message))
             
         # Helper to display popups (to avoid duplicating code)
     def show_message_popup(self, title, message):
@@ -948,7 +1998,7 @@ class NetworkDesignApp:
     def show_send_packet_menu(self):
         popup = tk.Toplevel(self.root)
         popup.title("Send Data Packet")
-        popup.geometry("300x300")  # Adjusted height to accommodate all elements
+        popup.geometry("300x380")  # Adjusted height to accommodate all elements
 
         # Adjust popup theme based on the current mode
         if self.is_dark_mode:
@@ -966,24 +2016,19 @@ class NetworkDesignApp:
             button_bg = "#e0e0e0"
             button_fg = "black"
 
-        def refresh_device_list():
-            """Refresh the dropdown menus with updated device names."""
-            return {device_id: data.get("label_text", self.canvas.itemcget(data["label"], "text")) 
-                    for device_id, data in self.devices.items()}
-
-        devices = refresh_device_list()
+        devices = [self.topology.devices[device_id]["label"] for device_id in self.devices]
 
         # Dropdown menu for 'from' device
         tk.Label(popup, text="From Device:", fg=label_fg, bg=popup.cget("bg")).grid(row=0, column=0, padx=10, pady=5)
-        from_device = tk.StringVar(value=list(devices.values())[0])
-        from_menu = tk.OptionMenu(popup, from_device, *devices.values())
+        from_device = tk.StringVar(value=devices[0])
+        from_menu = tk.OptionMenu(popup, from_device, *devices)
         from_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
         from_menu.grid(row=0, column=1, padx=10, pady=5)
 
         # Dropdown menu for 'to' device
         tk.Label(popup, text="To Device:", fg=label_fg, bg=popup.cget("bg")).grid(row=1, column=0, padx=10, pady=5)
-        to_device = tk.StringVar(value=list(devices.values())[0])
-        to_menu = tk.OptionMenu(popup, to_device, *devices.values())
+        to_device = tk.StringVar(value=devices[0])
+        to_menu = tk.OptionMenu(popup, to_device, *devices)
         to_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
         to_menu.grid(row=1, column=1, padx=10, pady=5)
 
@@ -993,14 +2038,33 @@ class NetworkDesignApp:
         data_entry.grid(row=2, column=1, padx=10, pady=5)
         data_entry.insert(0, "Hello, Network!")
 
+        # TCP only: a bulk transfer size instead of the data, and the congestion control to use
+        tk.Label(popup, text="TCP Transfer (KB):", fg=label_fg, bg=popup.cget("bg")).grid(row=3, column=0, padx=10, pady=5)
+        size_entry = tk.Entry(popup, bg=entry_bg, fg=entry_fg)
+        size_entry.grid(row=3, column=1, padx=10, pady=5)
+        tk.Label(popup, text="TCP Algorithm:", fg=label_fg, bg=popup.cget("bg")).grid(row=4, column=0, padx=10, pady=5)
+        algorithm = tk.StringVar(value=ALGORITHMS[0])
+        algorithm_menu = tk.OptionMenu(popup, algorithm, *ALGORITHMS)
+        algorithm_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
+        algorithm_menu.grid(row=4, column=1, padx=10, pady=5)
+
         def trigger_send_packet(protocol):
-            # Match selected names back to device IDs
-            from_device_id = next((device_id for device_id, name in devices.items() if name == from_device.get()), None)
-            to_device_id = next((device_id for device_id, name in devices.items() if name == to_device.get()), None)
+            # Match selected names back to device IDs through the label index
+            from_device_id = self.topology.find_by_label(from_device.get())
+            to_device_id = self.topology.find_by_label(to_device.get())
 
             if from_device_id and to_device_id:
                 if protocol == "TCP":
-                    self.send_data_packet_with_return(from_device_id, to_device_id, data_entry.get())
+                    try:
+                        size = int(float(size_entry.get()) * 1024) if size_entry.get().strip() else None
+                    except ValueError:
+                        size = -1
+                    if size is not None and size <= 0:
+                        messagebox.showerror("Invalid Input", "The transfer size must be a positive number of KB.")
+                        return
+                    self.send_data_packet_with_return(
+                        from_device_id, to_device_id, data_entry.get(), size, algorithm.get()
+                    )
                 else:
                     self.send_data_packet(from_device_id, to_device_id, data_entry.get())
             else:
@@ -1010,81 +2074,138 @@ class NetworkDesignApp:
         # Buttons for sending with TCP or UDP
         tcp_button = tk.Button(popup, text="Send via TCP", command=lambda: trigger_send_packet("TCP"),
                             bg=button_bg, fg=button_fg)
-        tcp_button.grid(row=3, column=0, pady=10, padx=5, sticky="ew")
+        tcp_button.grid(row=5, column=0, pady=10, padx=5, sticky="ew")
 
         udp_button = tk.Button(popup, text="Send via UDP", command=lambda: trigger_send_packet("UDP"),
                             bg=button_bg, fg=button_fg)
-        udp_button.grid(row=3, column=1, pady=10, padx=5, sticky="ew")
+        udp_button.grid(row=5, column=1, pady=10, padx=5, sticky="ew")
 
         # Close button
         tk.Button(popup, text="Close", command=popup.destroy, bg=button_bg, fg=button_fg).grid(
-            row=4, column=0, columnspan=2, pady=10)
-
-
-    def send_data_packet_with_return(self, from_device, to_device, data="Hello, Network!"):
-        def simulate_packet():
-            if from_device in self.devices and to_device in self.devices:
-                G = self.export_to_networkx()
-                if nx.has_path(G, from_device, to_device):
-                    path = nx.shortest_path(G, from_device, to_device)
-
-                    # Load the message icon (ensure the file is in the same directory or provide the full path)
-                    message_icon = ImageTk.PhotoImage(Image.open("message.png").resize((15, 15)))
-
-                    # Forward message from source to destination
-                    for i in range(len(path) - 1):
-                        start_coords = self.get_device_center(path[i])
-                        end_coords = self.get_device_center(path[i + 1])
-
-                        # Create an image to represent the packet
-                        packet = self.canvas.create_image(start_coords[0], start_coords[1], image=message_icon)
-
-                        # Animate the packet along the line
-                        for t in range(21):  # 21 steps for smoother animation
-                            x = start_coords[0] + (end_coords[0] - start_coords[0]) * t / 20
-                            y = start_coords[1] + (end_coords[1] - start_coords[1]) * t / 20
-                            self.canvas.coords(packet, x, y)
-                            time.sleep(0.05)  # Adjust for speed of animation
-                            self.root.update_idletasks()
-
-                        # Remove the packet from the canvas after reaching the endpoint
-                        self.canvas.delete(packet)
-
-                    # Backward acknowledgment message from destination to source
-                    for i in range(len(path) - 1, 0, -1):
-                        start_coords = self.get_device_center(path[i])
-                        end_coords = self.get_device_center(path[i - 1])
-
-                        # Create an image to represent the acknowledgment packet
-                        ack_packet = self.canvas.create_image(start_coords[0], start_coords[1], image=message_icon)
-
-                        # Animate the packet along the line
-                        for t in range(21):  # 21 steps for smoother animation
-                            x = start_coords[0] + (end_coords[0] - start_coords[0]) * t / 20
-                            y = start_coords[1] + (end_coords[1] - start_coords[1]) * t / 20
-                            self.canvas.coords(ack_packet, x, y)
-                            time.sleep(0.05)  # Adjust for speed of animation
-                            self.root.update_idletasks()
-
-                        # Remove the acknowledgment packet from the canvas after reaching the endpoint
-                        self.canvas.delete(ack_packet)
-
-                    message = (
-                        f"TCP Data Packet Transmission Round Trip: 60ms\n"
-                        f"From: {from_device}\n"
-                        f"To: {to_device}\n"
-                        f"Data: {data}\n"
-                        f"Acknowledgment: Received\n"
-                        f"Status: Success"
-                    )
-                else:
-                    message = f"Data Packet Transmission Failed:\nNo Path Between {from_device} and {to_device}"
+            row=6, column=0, columnspan=2, pady=10)
+
+
+    def send_data_packet_with_return(self, from_device, to_device, data="Hello, Network!", size=None,
+                                     algorithm="reno"):
+        """Sends the data (or a bulk transfer of `size` bytes) with the TCP model on the worker pool."""
+        if from_device not in self.devices or to_device not in self.devices:
+            message = f"Data Packet Transmission Failed:\nInvalid Devices: {from_device}, {to_device}"
+            self.animator.add([], lambda: self.show_message_popup("TCP Data Packet Transmission", message))
+            return
+        simulator = TcpSimulator(self.topology, self.routes)
+        transfer = simulator.add_transfer(from_device, to_device, size or max(len(data.encode()), 1), algorithm)
+        if transfer is None:
+            message = f"Data Packet Transmission Failed:\nNo Path Between {from_device} and {to_device}"
+            self.animator.add([], lambda: self.show_message_popup("TCP Data Packet Transmission", message))
+            return
+
+        # One segment out and its acknowledgment back stand in for the whole transfer on the canvas
+        hops = list(zip(transfer.path, transfer.path[1:])) + list(zip(transfer.back_path, transfer.back_path[1:]))
+
+        def show_report(report):
+            if transfer.finished is None:
+                message = (
+                    f"TCP Data Transfer Failed:\n"
+                    f"From: {from_device}\n"
+                    f"To: {to_device}\n"
+                    f"Segments: Sent = {transfer.sent}, Timeouts = {transfer.timeouts}"
+                )
             else:
-                message = f"Data Packet Transmission Failed:\nInvalid Devices: {from_device}, {to_device}"
+                message = (
+                    f"TCP Data Packet Transmission Round Trip: {transfer.min_rtt * 1000:.2f}ms\n"
+                    f"From: {from_device}\n"
+                    f"To: {to_device}\n"
+                    f"Data: {data if size is None else f'{transfer.size} bytes'} ({algorithm.upper()})\n"
+                    f"Completed in {transfer.duration * 1000:.2f}ms, goodput {transfer.goodput / 1e6:.3f} Mbps\n"
+                    f"Segments: {transfer.segments}, Retransmitted = {transfer.retransmits}, "
+                    f"Timeouts = {transfer.timeouts}, final cwnd = {transfer.cwnd:.1f}\n"
+                    f"Acknowledgment: Received\n"
+                    f"Status: Success"
+                )
+            self.animator.add(hops, lambda: self.show_message_popup("TCP Data Packet Transmission", message))
 
-            self.root.after(0, self.show_message_popup, "TCP Data Packet Transmission", message)
+        self.root.title("Network Design Tool - Transferring...")
+        self.wait_for_result(self.simulation_pool.submit(simulator.run), show_report)
+
+    def show_traffic_menu(self):
+        """Popup to configure and launch a bulk traffic run."""
+        popup = tk.Toplevel(self.root)
+        popup.title("Generate Traffic")
+        popup.geometry("320x300")
 
-        threading.Thread(target=simulate_packet, daemon=True).start()
+        # Adjust popup theme based on the current mode
+        if self.is_dark_mode:
+            popup.configure(bg="#1e1e1e")
+            label_fg = "white"
+            entry_bg = "#333333"
+            entry_fg = "white"
+            button_bg = "#444444"
+            button_fg = "white"
+        else:
+            popup.configure(bg="white")
+            label_fg = "black"
+            entry_bg = "white"
+            entry_fg = "black"
+            button_bg = "#e0e0e0"
+            button_fg = "black"
+
+        tk.Label(popup, text="Pattern:", fg=label_fg, bg=popup.cget("bg")).grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+        pattern = tk.StringVar(value=PATTERNS[0])
+        pattern_menu = tk.OptionMenu(popup, pattern, *PATTERNS)
+        pattern_menu.configure(bg=button_bg, fg=button_fg, highlightthickness=0)
+        pattern_menu.grid(row=0, column=1, padx=10, pady=5)
+
+        fields = [
+            ("Flows:", "1000"),
+            ("Rate (packets/s):", "100"),
+            ("Packets per flow:", "100"),
+            ("Packet size (bytes):", "1000"),
+            ("Seed:", "1"),
+        ]
+        entries = []
+        for row, (text, default) in enumerate(fields, start=1):
+            tk.Label(popup, text=text, fg=label_fg, bg=popup.cget("bg")).grid(row=row, column=0, padx=10, pady=5, sticky=tk.W)
+            entry = tk.Entry(popup, bg=entry_bg, fg=entry_fg)
+            entry.grid(row=row, column=1, padx=10, pady=5)
+            entry.insert(0, default)
+            entries.append(entry)
+
+        def trigger_traffic():
+            try:
+                flows, packets, size, seed = (int(entries[i].get()) for i in (0, 2, 3, 4))
+                rate = float(entries[1].get())
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Traffic settings must be numbers.")
+                return
+            popup.destroy()
+            self.generate_traffic(pattern.get(), flows, rate, packets, size, seed)
+
+        tk.Button(popup, text="Run", command=trigger_traffic, bg=button_bg, fg=button_fg).grid(
+            row=len(fields) + 1, column=0, columnspan=2, pady=10)
+
+    def generate_traffic(self, pattern, flows, rate, packets, size, seed=None):
+        """Builds the flows on the Tk thread and simulates them on the worker pool."""
+        generator = TrafficGenerator(self.topology, self.routes, seed=seed)
+        try:
+            generator.add_random_flows(flows, pattern=pattern, rate=rate, packets=packets, size=size)
+        except ValueError as error:
+            messagebox.showerror("Traffic Error", str(error))
+            return
+        self.root.title("Network Design Tool - Generating Traffic...")
+        future = self.simulation_pool.submit(generator.run)
+        self.wait_for_result(future, lambda report: self.show_message_popup("Traffic Report", report.summary()))
+
+    def wait_for_result(self, future, on_result):
+        """Polls a worker-pool future from the Tk main loop and hands its result back on this thread."""
+        if not future.done():
+            self.root.after(100, self.wait_for_result, future, on_result)
+            return
+        self.root.title("Network Design Tool")
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("Simulation Error", str(error))
+        else:
+            on_result(future.result())
 
     def upload_image(self):
         """Allows the user to upload an image and place it on the canvas."""
@@ -1107,7 +2228,7 @@ class NetworkDesignApp:
 
     def on_image_drag(self, event, image_id):
         """Handles dragging of images on the canvas."""
-        self.canvas.coords(image_id, event.x, event.y)
+        self.canvas.coords(image_id, *self.event_point(event))
 
 
     def delete_image(self, image_id):
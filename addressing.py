@@ -0,0 +1,266 @@
+"""IPv4 and MAC address helpers."""
+
+
+def ip_to_int(ip):
+    """Converts a dotted IPv4 string to a 32-bit integer."""
+    parts = ip.split(".")
+    if len(parts) != 4:
+        raise ValueError(f"'{ip}' is not an IPv4 address.")
+    a, b, c, d = map(int, parts)
+    if not (0 <= a <= 255 and 0 <= b <= 255 and 0 <= c <= 255 and 0 <= d <= 255):
+        raise ValueError(f"'{ip}' is not an IPv4 address.")
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def int_to_ip(value):
+    """Converts a 32-bit integer to a dotted IPv4 string."""
+    return f"{(value >> 24) & 255}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+
+def mac_to_int(mac):
+    """Converts a MAC address written with ':' or '-' separators to a 48-bit integer."""
+    parts = mac.replace("-", ":").split(":")
+    digits = "".join(parts)
+    if len(parts) != 6 or len(digits) != 12 or not digits.isalnum():
+        raise ValueError(f"'{mac}' is not a MAC address.")
+    return int(digits, 16)
+
+
+def int_to_mac(value):
+    """Converts a 48-bit integer to a lower-case, colon separated MAC address."""
+    return "%02x:%02x:%02x:%02x:%02x:%02x" % tuple(value.to_bytes(6, "big"))
+
+
+def parse_cidr(cidr):
+    """Splits 'a.b.c.d/n' into (network int, prefix length), with host bits cleared."""
+    address, _, prefix = cidr.partition("/")
+    prefix = int(prefix) if prefix else 32
+    if not 0 <= prefix <= 32:
+        raise ValueError(f"'{cidr}' is not a CIDR range.")
+    mask = prefix_to_mask(prefix)
+    return ip_to_int(address) & mask, prefix
+
+
+def prefix_to_mask(prefix):
+    return (0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF
+
+
+def mask_to_prefix(mask):
+    """Prefix length of a dotted netmask such as 255.255.240.0; ValueError if it is not contiguous."""
+    value = ip_to_int(mask)
+    prefix = bin(value).count("1")
+    if prefix_to_mask(prefix) != value:
+        raise ValueError(f"'{mask}' is not a contiguous subnet mask.")
+    return prefix
+
+
+class AddressPool:
+    """Hands out the host addresses of one CIDR range in O(1).
+
+    A bytearray marks which offsets are taken. New addresses come from a cursor that only moves
+    forward; released ones go on a free list and are reused first.
+    """
+
+    def __init__(self, cidr):
+        self.network, self.prefix = parse_cidr(cidr)
+        if self.prefix > 30 or self.prefix < 8:
+            raise ValueError(f"Address pools must be between /8 and /30, got '{cidr}'.")
+        self.cidr = f"{int_to_ip(self.network)}/{self.prefix}"
+        self.netmask = int_to_ip(prefix_to_mask(self.prefix))
+        self.size = 1 << (32 - self.prefix)
+        self.used = 0
+        self._taken = bytearray(self.size)
+        self._taken[0] = self._taken[-1] = 1  # Network and broadcast addresses are never handed out
+        self._cursor = 1
+        self._free = []
+
+    def __contains__(self, ip):
+        return self.network <= ip_to_int(ip) < self.network + self.size
+
+    def holds(self, value):
+        """Like `in`, for an address that is already an integer."""
+        return self.network <= value < self.network + self.size
+
+    @property
+    def available(self):
+        return self.size - 2 - self.used
+
+    def allocate(self):
+        """Returns the next free address as a string; RuntimeError when the pool is exhausted."""
+        taken = self._taken
+        while self._free:
+            offset = self._free.pop()
+            if not taken[offset]:
+                break
+        else:
+            # Skip over addresses that were reserved explicitly; the cursor never moves back
+            while self._cursor < self.size - 1 and taken[self._cursor]:
+                self._cursor += 1
+            if self._cursor >= self.size - 1:
+                raise RuntimeError(f"Address pool {self.cidr} is exhausted.")
+            offset = self._cursor
+            self._cursor += 1
+        taken[offset] = 1
+        self.used += 1
+        return int_to_ip(self.network + offset)
+
+    def reserve(self, ip):
+        """Marks an address as used; returns False if it was already taken or is not a host address."""
+        offset = ip_to_int(ip) - self.network
+        if not 0 < offset < self.size - 1 or self._taken[offset]:
+            return False
+        self._taken[offset] = 1
+        self.used += 1
+        return True
+
+    def release(self, ip):
+        offset = ip_to_int(ip) - self.network
+        if 0 < offset < self.size - 1 and self._taken[offset]:
+            self._taken[offset] = 0
+            self.used -= 1
+            self._free.append(offset)
+
+
+class MacAllocator:
+    """Sequential MAC addresses under one OUI (locally administered 02:00:00 by default)."""
+
+    def __init__(self, oui=0x020000):
+        self.oui = oui
+        self._next = 1
+        self._free = []
+        self._taken = set()
+
+    def allocate(self):
+        while self._free:
+            value = self._free.pop()
+            if value not in self._taken:
+                break
+        else:
+            value = (self.oui << 24) | self._next
+            while value in self._taken:
+                self._next += 1
+                value = (self.oui << 24) | self._next
+            if self._next >= 1 << 24:
+                raise RuntimeError(f"MAC addresses under OUI {self.oui:06x} are exhausted.")
+            self._next += 1
+        self._taken.add(value)
+        return int_to_mac(value)
+
+    def reserve(self, mac):
+        """Marks a MAC as used; returns False if it already was."""
+        value = mac_to_int(mac)
+        if value in self._taken:
+            return False
+        self._taken.add(value)
+        return True
+
+    def release(self, mac):
+        value = mac_to_int(mac)
+        if value in self._taken:
+            self._taken.discard(value)
+            if value >> 24 == self.oui:
+                self._free.append(value)
+
+
+DEFAULT_POOLS = ("192.168.1.0/24", "172.16.0.0/12")
+
+
+class AddressPlan:
+    """Keeps IP pools and the MAC allocator in step with a Topology and spots duplicate addresses.
+
+    New devices get addresses from the first pool with room. Devices that are added, edited,
+    loaded or removed through the topology reserve and release their addresses automatically;
+    who holds an address is looked up in the topology's own IP and MAC indexes.
+    """
+
+    def __init__(self, topology, pools=DEFAULT_POOLS, oui=0x020000):
+        self.topology = topology
+        self.pools = [AddressPool(cidr) for cidr in pools]
+        self.macs = MacAllocator(oui)
+        self._assigned = {}  # device_id -> (ip, mac) as last reserved
+        self.conflicts = []  # Messages about duplicates seen while reserving
+        topology.subscribe(self.on_topology_change)
+        self.rebuild()
+
+    def allocate(self):
+        """Returns (ip, subnet mask, mac) for a new device."""
+        for pool in self.pools:
+            if pool.available:
+                return pool.allocate(), pool.netmask, self.macs.allocate()
+        raise RuntimeError("Every address pool is exhausted.")
+
+    def conflict(self, device_id, ip=None, mac=None):
+        """Names the other device already using ip or mac, or returns None."""
+        if ip:
+            others = [other for other in self.topology.devices_with_ip(ip) if other != device_id]
+            if others:
+                return f"IP Address '{ip}' is already used by {others[0]}."
+        if mac:
+            others = [other for other in self.topology.devices_with_mac(mac) if other != device_id]
+            if others:
+                return f"MAC Address '{mac}' is already used by {others[0]}."
+        return None
+
+    def rebuild(self):
+        """Re-reserves every device's addresses; returns the duplicates found."""
+        self.pools = [AddressPool(pool.cidr) for pool in self.pools]
+        self.macs = MacAllocator(self.macs.oui)
+        self._assigned.clear()
+        self.conflicts = []
+        for device_id in self.topology.devices:
+            self._reserve(device_id)
+        return self.conflicts
+
+    def on_topology_change(self, event, subject):
+        if event == "cleared":
+            self.rebuild()
+        elif event == "device_added":
+            self._reserve(subject)
+        elif event == "device_updated":
+            self._release(subject)
+            self._reserve(subject)
+        elif event == "device_removed":
+            self._release(subject)
+
+    def _reserve(self, device_id):
+        data = self.topology.devices[device_id]
+        ip, mac = data.get("ip"), data.get("mac")
+        try:
+            ip_value = ip_to_int(ip) if ip else None
+            mac = _mac_key(mac) if mac else None
+        except (ValueError, AttributeError, TypeError):
+            self.conflicts.append(f"Device '{device_id}' has a malformed address.")
+            return
+        if ip:
+            holder = self.topology.devices_with_ip(ip)[0]
+            if holder != device_id:
+                self.conflicts.append(f"Device '{device_id}' reuses IP {ip} of {holder}.")
+            pool = self._pool_for(ip_value)
+            if pool:
+                pool.reserve(ip)
+        if mac:
+            holder = self.topology.devices_with_mac(mac)[0]
+            if holder != device_id:
+                self.conflicts.append(f"Device '{device_id}' reuses MAC {data['mac']} of {holder}.")
+            self.macs.reserve(mac)
+        self._assigned[device_id] = (ip, mac)
+
+    def _pool_for(self, value):
+        for pool in self.pools:
+            if pool.holds(value):
+                return pool
+        return None
+
+    def _release(self, device_id):
+        # An address only goes back to its pool once no device is configured with it any more
+        ip, mac = self._assigned.pop(device_id, (None, None))
+        if ip and not self.topology.devices_with_ip(ip):
+            pool = self._pool_for(ip_to_int(ip))
+            if pool:
+                pool.release(ip)
+        if mac and not self.topology.devices_with_mac(mac):
+            self.macs.release(mac)
+
+
+def _mac_key(mac):
+    return int_to_mac(mac_to_int(mac))
@@ -0,0 +1,184 @@
+"""Headless discrete-event simulation core used by the Mister A GUI and batch runs."""
+import heapq
+import itertools
+
+
+DEFAULT_HOP_DELAY = 0.001  # Seconds of virtual time spent on a hop when no link model is given
+
+
+class Packet:
+    """A packet travelling hop by hop along a precomputed path."""
+
+    __slots__ = ("id", "src", "dst", "path", "size", "data", "protocol",
+                 "created", "hop", "delivered_at", "on_delivered", "on_dropped", "priority", "dropped_at")
+
+    def __init__(self, packet_id, path, size=64, data=None, protocol="UDP", created=0.0, priority=0):
+        self.id = packet_id
+        self.src = path[0]
+        self.dst = path[-1]
+        self.path = path
+        self.size = size  # Bytes on the wire
+        self.data = data
+        self.protocol = protocol
+        self.created = created
+        self.hop = 0  # Index into path of the node currently holding the packet
+        self.delivered_at = None
+        self.dropped_at = None  # (start, end) of the hop it was lost on
+        self.priority = priority  # Traffic class for priority and WFQ queues; higher is more urgent
+        self.on_delivered = None
+        self.on_dropped = None
+
+    @property
+    def latency(self):
+        """One-way virtual latency in seconds, or None while still in flight."""
+        if self.delivered_at is None:
+            return None
+        return self.delivered_at - self.created
+
+
+class SimulationEngine:
+    """Heap-based event queue that advances virtual time instead of sleeping."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.processed = 0
+        self._queue = []
+        self._counter = itertools.count()  # Tie-breaker keeps same-time events in FIFO order
+        self._listeners = []
+        self._stopped = False
+
+    def schedule(self, delay, callback, *args):
+        """Runs callback(*args) after `delay` seconds of virtual time."""
+        if delay < 0:
+            raise ValueError(f"Cannot schedule an event {delay}s in the past.")
+        heapq.heappush(self._queue, (self.now + delay, next(self._counter), callback, args))
+
+    def schedule_at(self, when, callback, *args):
+        """Runs callback(*args) at the absolute virtual time `when`."""
+        self.schedule(when - self.now, callback, *args)
+
+    def pending(self):
+        """Returns the number of events still waiting in the queue."""
+        return len(self._queue)
+
+    def run(self, until=None, max_events=None):
+        """Processes events in time order until the queue drains, `until` is reached or stop() is called."""
+        queue = self._queue
+        pop = heapq.heappop
+        processed = 0
+        self._stopped = False
+        while queue:
+            if self._stopped or (max_events is not None and processed >= max_events):
+                break
+            if until is not None and queue[0][0] > until:
+                self.now = max(self.now, until)
+                break
+            when, _, callback, args = pop(queue)
+            self.now = when
+            callback(*args)
+            processed += 1
+        else:
+            # Queue drained: the clock still advances to the requested horizon
+            if until is not None:
+                self.now = max(self.now, until)
+        self.processed += processed
+        return processed
+
+    def stop(self):
+        """Stops run() after the event currently being processed."""
+        self._stopped = True
+
+    def reset(self):
+        """Drops all pending events and rewinds the clock."""
+        self._queue.clear()
+        self.now = 0.0
+        self.processed = 0
+
+    def subscribe(self, listener):
+        """Registers listener(kind, now, info) to observe simulation events, e.g. for visualization."""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def emit(self, kind, **info):
+        """Notifies listeners about something that happened at the current virtual time."""
+        for listener in self._listeners:
+            listener(kind, self.now, info)
+
+    @property
+    def has_listeners(self):
+        return bool(self._listeners)
+
+
+class PacketForwarder:
+    """Moves packets along their path as engine events.
+
+    hop_delay(u, v, packet) gives each hop's latency and drop(u, v, packet), when set,
+    decides whether the packet is lost on that hop. With `queues` (a QueueingNetwork) packets
+    instead wait their turn in each link's output queue, which may also drop them, and the
+    hop takes the queue's transmission plus propagation time. jitter(u, v, packet), when set,
+    adds a random amount to every hop's delay (negative amounts count as zero).
+    """
+
+    def __init__(self, engine, hop_delay=None, drop=None, queues=None, jitter=None):
+        self.engine = engine
+        self.hop_delay = hop_delay or (lambda start, end, packet: DEFAULT_HOP_DELAY)
+        self.drop = drop
+        self.queues = queues
+        self.jitter = jitter
+        self.delivered = 0
+        self.dropped = 0
+        self._ids = itertools.count(1)
+
+    def send(self, path, data=None, size=64, protocol="UDP", on_delivered=None, on_dropped=None, priority=0):
+        """Injects a packet at path[0] at the current virtual time and returns it."""
+        if len(path) < 1:
+            raise ValueError("A packet needs at least one device on its path.")
+        packet = Packet(next(self._ids), path, size, data, protocol, self.engine.now, priority)
+        packet.on_delivered = on_delivered
+        packet.on_dropped = on_dropped
+        self.engine.schedule(0, self._forward, packet)
+        return packet
+
+    def _forward(self, packet):
+        engine = self.engine
+        path = packet.path
+        if packet.hop >= len(path) - 1:
+            packet.delivered_at = engine.now
+            self.delivered += 1
+            if engine.has_listeners:
+                engine.emit("delivered", packet=packet)
+            if packet.on_delivered:
+                packet.on_delivered(packet)
+            return
+
+        start, end = path[packet.hop], path[packet.hop + 1]
+        if self.drop is not None and self.drop(start, end, packet):
+            self._dropped(packet, start, end)
+        elif self.queues is not None:
+            if not self.queues.enqueue(start, end, packet, self._depart):
+                self._dropped(packet, start, end)
+        else:
+            self._depart(packet, start, end, self.hop_delay(start, end, packet))
+
+    def _depart(self, packet, start, end, delay):
+        engine = self.engine
+        if self.jitter is not None:
+            delay += max(self.jitter(start, end, packet), 0.0)
+        if engine.has_listeners:
+            engine.emit("hop", packet=packet, start=start, end=end,
+                        depart=engine.now, arrive=engine.now + delay)
+        packet.hop += 1
+        engine.schedule(delay, self._forward, packet)
+
+    def _dropped(self, packet, start, end):
+        engine = self.engine
+        packet.dropped_at = (start, end)
+        self.dropped += 1
+        if engine.has_listeners:
+            engine.emit("dropped", packet=packet, start=start, end=end)
+        if packet.on_dropped:
+            packet.on_dropped(packet)
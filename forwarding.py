@@ -0,0 +1,337 @@
+"""Layer-3 forwarding: longest-prefix-match route tables and hop-by-hop packet delivery."""
+from addressing import ip_to_int, int_to_ip, parse_cidr, prefix_to_mask, mask_to_prefix
+
+
+MASKS = [prefix_to_mask(length) for length in range(33)]
+DEFAULT_ROUTE = "0.0.0.0/0"
+
+
+class Route:
+    """One forwarding entry; next_hop is None for directly connected networks."""
+
+    __slots__ = ("network", "length", "next_hop", "metric", "origin")
+
+    def __init__(self, network, length, next_hop=None, metric=0, origin="static"):
+        self.network = network
+        self.length = length
+        self.next_hop = next_hop
+        self.metric = metric
+        self.origin = origin  # "connected", "static" or "computed"
+
+    @property
+    def prefix(self):
+        return f"{int_to_ip(self.network)}/{self.length}"
+
+    def __repr__(self):
+        return f"Route({self.prefix} via {self.next_hop or 'connected'}, metric={self.metric}, {self.origin})"
+
+
+class _Node:
+    __slots__ = ("key", "length", "value", "children")
+
+    def __init__(self, key, length, value=None):
+        self.key = key
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+def _bit(key, position):
+    return (key >> (31 - position)) & 1
+
+
+class PrefixTrie:
+    """Path-compressed binary (Patricia) trie keyed by IPv4 prefixes.
+
+    Every node stores the full prefix it stands for, so a lookup follows at most one node per
+    distinct branching point and never more than 33 nodes, however many prefixes are stored.
+    """
+
+    def __init__(self):
+        self._root = _Node(0, 0)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, key, length, value):
+        """Stores value under key/length (host bits are cleared), replacing any previous value."""
+        key &= MASKS[length]
+        node = self._root
+        while True:
+            if node.length == length and node.key == key:
+                if node.value is None:
+                    self._size += 1
+                node.value = value
+                return
+            bit = _bit(key, node.length)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(key, length, value)
+                self._size += 1
+                return
+            common = min(length, child.length, 32 - (key ^ child.key).bit_length())
+            if common == child.length:
+                node = child  # The child's prefix covers the new one; keep descending
+                continue
+            if common == length:
+                # The new prefix sits between node and child
+                new = _Node(key, length, value)
+                new.children[_bit(child.key, length)] = child
+            else:
+                # They diverge below both: insert a value-less branching node
+                new = _Node(key & MASKS[common], common)
+                new.children[_bit(child.key, common)] = child
+                new.children[_bit(key, common)] = _Node(key, length, value)
+            node.children[bit] = new
+            self._size += 1
+            return
+
+    def get(self, key, length):
+        """Exact-match lookup; returns the stored value or None."""
+        key &= MASKS[length]
+        node = self._root
+        while node is not None and node.length <= length:
+            if node.key != key & MASKS[node.length]:
+                return None
+            if node.length == length:
+                return node.value
+            node = node.children[_bit(key, node.length)]
+        return None
+
+    def remove(self, key, length):
+        """Deletes key/length; returns the removed value or None."""
+        key &= MASKS[length]
+        parent, node = None, self._root
+        while node is not None and node.length < length:
+            if node.key != key & MASKS[node.length]:
+                return None
+            parent, node = node, node.children[_bit(key, node.length)]
+        if node is None or node.length != length or node.key != key or node.value is None:
+            return None
+        value, node.value = node.value, None
+        self._size -= 1
+        if parent is not None:
+            # Splice out nodes that no longer hold a value or branch
+            children = [child for child in node.children if child is not None]
+            if len(children) < 2:
+                parent.children[_bit(key, parent.length)] = children[0] if children else None
+        return value
+
+    def lookup(self, address):
+        """Longest-prefix match for an address (int); returns the value or None."""
+        node = self._root
+        best = None
+        while node is not None and node.key == address & MASKS[node.length]:
+            if node.value is not None:
+                best = node.value
+            if node.length == 32:
+                break
+            node = node.children[(address >> (31 - node.length)) & 1]
+        return best
+
+    def values(self):
+        """Yields stored values, shorter prefixes first along each branch."""
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.value is not None:
+                yield node.value
+            stack.extend(child for child in reversed(node.children) if child is not None)
+
+
+class ForwardingTable:
+    """A router's routes, looked up by longest prefix match."""
+
+    def __init__(self):
+        self._trie = PrefixTrie()
+
+    def __len__(self):
+        return len(self._trie)
+
+    def add_route(self, cidr, next_hop=None, metric=0, origin="static"):
+        network, length = parse_cidr(cidr)
+        route = Route(network, length, next_hop, metric, origin)
+        self._trie.insert(network, length, route)
+        return route
+
+    def remove_route(self, cidr):
+        return self._trie.remove(*parse_cidr(cidr))
+
+    def route(self, cidr):
+        """The entry for exactly this prefix, or None."""
+        return self._trie.get(*parse_cidr(cidr))
+
+    def lookup(self, ip):
+        """The most specific route covering ip (a string or an int), or None."""
+        return self._trie.lookup(ip_to_int(ip) if isinstance(ip, str) else ip)
+
+    def routes(self):
+        return sorted(self._trie.values(), key=lambda route: (route.network, route.length))
+
+
+class Delivery:
+    """Outcome of forwarding one packet: the devices it visited and whether it arrived."""
+
+    def __init__(self, path, delivered, reason=None, ttl=None):
+        self.path = path
+        self.delivered = delivered
+        self.reason = reason  # Why it was dropped, e.g. "No route to host"
+        self.ttl = ttl        # TTL left on arrival
+
+
+class ForwardingPlane:
+    """Builds Router forwarding tables from the topology and forwards packets hop by hop.
+
+    A Router gets a connected route for every subnet it can reach without crossing another
+    router, and a computed route via the first router on the way to every other subnet. Static
+    routes (including a default route) come from a device's "routes" list, e.g.
+    [{"prefix": "0.0.0.0/0", "next_hop": "Router_2"}]. Hosts send traffic for other subnets to
+    their "gateway" (an IP) or, failing that, to the nearest router. Tables are built per router
+    on first use and thrown away whenever the topology changes.
+
+    When a dynamic routing protocol is set, routers pick their next hop towards a subnet's
+    router from the protocol instead of from global shortest paths, so until it has converged
+    packets follow whatever the routers currently believe.
+    """
+
+    def __init__(self, topology, routes, router_kind="Router", protocol=None):
+        self.topology = topology
+        self.routes = routes
+        self.router_kind = router_kind
+        self.protocol = protocol
+        self._tables = {}
+        self._gateways = {}
+        self._protocol_version = None
+        topology.subscribe(self.on_topology_change)
+
+    def on_topology_change(self, event, subject):
+        self._tables.clear()
+        self._gateways.clear()
+
+    def is_router(self, device_id):
+        return self.topology.devices[device_id].get("kind") == self.router_kind
+
+    def table(self, router):
+        if self.protocol is not None and self.protocol.version != self._protocol_version:
+            self._tables.clear()
+            self._protocol_version = self.protocol.version
+        table = self._tables.get(router)
+        if table is None:
+            table = self._tables[router] = self._build_table(router)
+        return table
+
+    def gateway(self, host):
+        """The router a host hands off-subnet packets to, or None."""
+        if host not in self._gateways:
+            gateway = None
+            configured = self.topology.devices[host].get("gateway")
+            if configured:
+                gateway = self.topology.find_by_ip(configured)
+            if gateway is None:
+                dist = self.routes.tree(host)[0]
+                routers = [device_id for device_id in dist if device_id != host and self.is_router(device_id)]
+                gateway = min(routers, key=dist.get, default=None)
+            self._gateways[host] = gateway
+        return self._gateways[host]
+
+    def forward(self, source, destination_ip, ttl=128):
+        """Follows a packet from source towards destination_ip and returns a Delivery."""
+        devices = self.topology.devices
+        try:
+            address = ip_to_int(destination_ip)
+        except ValueError:
+            return Delivery([source], False, f"'{destination_ip}' is not an IPv4 address")
+        destination = self.topology.find_by_ip(destination_ip)
+        path = [source]
+        current = source
+
+        source_data = devices[source]
+        if destination is not None and _same_subnet(source_data, address):
+            target = destination
+        else:
+            target = source if self.is_router(source) else self.gateway(source)
+            if target is None:
+                return Delivery(path, False, "No default gateway", ttl)
+
+        while True:
+            if current == target:
+                if current == destination:
+                    return Delivery(path, True, ttl=ttl)
+                # A router makes the next decision from its own table
+                route = self.table(current).lookup(address)
+                if route is None:
+                    return Delivery(path, False, f"{current}: Destination net unreachable", ttl)
+                if current != source:
+                    ttl -= 1
+                    if ttl <= 0:
+                        return Delivery(path, False, f"{current}: TTL expired in transit", ttl)
+                if route.next_hop is None:
+                    if destination is None:
+                        return Delivery(path, False, f"{current}: Destination host unreachable", ttl)
+                    target = destination
+                else:
+                    target = route.next_hop
+                if target == current:
+                    return Delivery(path, False, f"{current}: Routing loop", ttl)
+
+            # Walk the cached shortest path towards the target up to the next router on it
+            segment = self.routes.shortest_path(current, target)
+            if not segment:
+                return Delivery(path, False, f"{current}: Destination host unreachable", ttl)
+            for hop in segment[1:]:
+                path.append(hop)
+                current = hop
+                if hop != target and self.is_router(hop):
+                    target = hop  # Routers on the way decide for themselves
+                    break
+
+    def _build_table(self, router):
+        table = ForwardingTable()
+        dist, pred = self.routes.tree(router)
+        data = self.topology.devices[router]
+        own = _subnet_of(data)
+        if own is not None:
+            table.add_route(own, origin="connected")
+        for cidr, members in self.topology.subnets():
+            if cidr == own:
+                continue
+            reachable = [member for member in members if member in dist]
+            if not reachable:
+                continue
+            nearest = min(reachable, key=dist.get)
+            # The last router met walking back from the member is the first one after this router
+            next_hop = egress = None
+            node = nearest
+            while node != router:
+                if self.is_router(node):
+                    next_hop = node
+                    egress = egress or node  # The router serving that subnet
+                node = pred[node][0]
+            if egress is not None and self.protocol is not None:
+                next_hop = self.protocol.next_hop(router, egress)
+                if next_hop is None:
+                    continue  # The protocol has no route there (yet)
+            table.add_route(cidr, next_hop, dist[nearest], "connected" if next_hop is None else "computed")
+        for entry in data.get("routes") or ():
+            next_hop = entry.get("next_hop")
+            if next_hop and next_hop not in self.topology.devices:
+                next_hop = self.topology.find_by_ip(next_hop)
+            table.add_route(entry["prefix"], next_hop, entry.get("metric", 0), "static")
+        return table
+
+
+def _subnet_of(data):
+    try:
+        network, length = parse_cidr(f"{data.get('ip')}/{mask_to_prefix(data.get('subnet'))}")
+    except (ValueError, AttributeError, TypeError):
+        return None
+    return f"{int_to_ip(network)}/{length}"
+
+
+def _same_subnet(data, address):
+    cidr = _subnet_of(data)
+    if cidr is None:
+        return False
+    network, length = parse_cidr(cidr)
+    return address & MASKS[length] == network
@@ -0,0 +1,445 @@
+"""Link impairments: Bernoulli or Gilbert-Elliott loss, delay jitter and scheduled outages.
+
+Profiles are plain dicts so they can live in link attributes, saves and scenario files:
+
+    {"loss": {"model": "bernoulli", "rate": 0.01},
+     "jitter": {"distribution": "normal", "scale": 0.002}}
+    {"loss": {"model": "gilbert", "p": 0.01, "r": 0.3, "loss_good": 0.0, "loss_bad": 1.0}}
+
+Every model draws one value at a time from a random.Random for the event engine, and whole
+arrays at once from a NumPy Generator for sweeps. NumPy is only imported for the latter.
+"""
+import math
+import random
+
+from topology import link_delay
+
+
+LOSS_MODELS = ("none", "bernoulli", "gilbert")
+JITTER_DISTRIBUTIONS = ("none", "normal", "uniform", "exponential")
+PING_INTERVAL = 1.0  # Seconds between echo requests, as ping does by default
+
+
+class BernoulliLoss:
+    """Every packet is lost independently with probability `rate`."""
+
+    def __init__(self, rate=0.0):
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Loss rate must be between 0 and 1, got {rate}.")
+        self.rate = rate
+
+    def lost(self, rng, state=None):
+        """Returns (lost, new state); Bernoulli loss has no state."""
+        return self.rate > 0 and rng.random() < self.rate, None
+
+    def sample(self, count, generator):
+        """Boolean array of `count` independent loss decisions."""
+        return generator.random(count) < self.rate
+
+    def as_dict(self):
+        return {"model": "bernoulli", "rate": self.rate}
+
+
+class GilbertElliottLoss:
+    """Bursty loss from a two-state Markov chain.
+
+    The channel moves from the good to the bad state with probability `p` per packet and back
+    with probability `r`; packets are lost with `loss_good` / `loss_bad` in each state (the
+    classic Gilbert model is loss_good=0, loss_bad=1). Mean burst length is 1 / r.
+    """
+
+    def __init__(self, p=0.01, r=0.3, loss_good=0.0, loss_bad=1.0):
+        for name, value in (("p", p), ("r", r), ("loss_good", loss_good), ("loss_bad", loss_bad)):
+            if not 0 <= value <= 1:
+                raise ValueError(f"Gilbert-Elliott '{name}' must be between 0 and 1, got {value}.")
+        if p + r == 0:
+            raise ValueError("Gilbert-Elliott p and r cannot both be 0.")
+        self.p = p
+        self.r = r
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+
+    @property
+    def rate(self):
+        """Long-run loss probability."""
+        bad = self.p / (self.p + self.r)
+        return bad * self.loss_bad + (1 - bad) * self.loss_good
+
+    def lost(self, rng, state=None):
+        if state is None:
+            state = rng.random() < self.p / (self.p + self.r)  # Start from the stationary mix
+        elif state:
+            state = rng.random() >= self.r
+        else:
+            state = rng.random() < self.p
+        return rng.random() < (self.loss_bad if state else self.loss_good), state
+
+    def sample(self, count, generator):
+        """Loss decisions for `count` consecutive packets, drawn as runs of good and bad states.
+
+        Time spent in each state is geometric, so the chain is built from whole runs instead of
+        one transition per packet.
+        """
+        import numpy as np
+
+        if count <= 0:
+            return np.zeros(0, dtype=bool)
+        bad_first = generator.random() < self.p / (self.p + self.r)
+        runs = []
+        total = 0
+        while total < count:
+            # Enough alternating runs to probably cover what is left, in one draw per state
+            expected = (1 / self.p if self.p else count) + (1 / self.r if self.r else count)
+            pairs = int((count - total) / expected) + 16
+            good = generator.geometric(self.p, pairs) if self.p else np.full(pairs, count)
+            bad = generator.geometric(self.r, pairs) if self.r else np.full(pairs, count)
+            chunk = np.column_stack((bad, good) if bad_first else (good, bad)).ravel()
+            runs.append(chunk)
+            total += int(chunk.sum())
+        lengths = np.concatenate(runs)
+        states = np.zeros(len(lengths), dtype=bool)
+        states[0 if bad_first else 1::2] = True
+        states = np.repeat(states, lengths)[:count]
+        return generator.random(count) < np.where(states, self.loss_bad, self.loss_good)
+
+    def as_dict(self):
+        return {"model": "gilbert", "p": self.p, "r": self.r, "loss_good": self.loss_good, "loss_bad": self.loss_bad}
+
+
+class Jitter:
+    """Extra delay per hop: normal (scale = standard deviation), uniform (+/- scale) or exponential (mean scale).
+
+    Draws are added to the link delay. A normal or uniform draw that comes out negative counts
+    as zero, so a jittered hop never takes less than the link's own delay.
+    """
+
+    def __init__(self, distribution="normal", scale=0.0):
+        if distribution not in JITTER_DISTRIBUTIONS[1:]:
+            raise ValueError(f"Unknown jitter distribution '{distribution}', expected one of {JITTER_DISTRIBUTIONS[1:]}.")
+        if scale < 0:
+            raise ValueError("Jitter scale cannot be negative.")
+        self.distribution = distribution
+        self.scale = scale
+
+    def draw(self, rng):
+        if self.distribution == "normal":
+            return max(rng.gauss(0.0, self.scale), 0.0)
+        if self.distribution == "uniform":
+            return max(rng.uniform(-self.scale, self.scale), 0.0)
+        return rng.expovariate(1 / self.scale) if self.scale else 0.0
+
+    def sample(self, count, generator):
+        import numpy as np
+
+        if self.distribution == "normal":
+            return np.maximum(generator.normal(0.0, self.scale, count), 0.0)
+        if self.distribution == "uniform":
+            return np.maximum(generator.uniform(-self.scale, self.scale, count), 0.0)
+        return generator.exponential(self.scale, count)
+
+    def as_dict(self):
+        return {"distribution": self.distribution, "scale": self.scale}
+
+
+class ImpairmentProfile:
+    """A loss model and a jitter model, either of which may be None."""
+
+    def __init__(self, loss=None, jitter=None):
+        self.loss = loss
+        self.jitter = jitter
+
+    def __bool__(self):
+        return self.loss is not None or self.jitter is not None
+
+    @classmethod
+    def from_dict(cls, spec):
+        """Builds a profile from the dict format in the module docstring (None or {} means no impairment)."""
+        spec = spec or {}
+        loss = spec.get("loss") or {}
+        model = loss.get("model", "bernoulli" if loss else "none")
+        if model == "bernoulli":
+            loss = BernoulliLoss(loss.get("rate", 0.0))
+        elif model == "gilbert":
+            loss = GilbertElliottLoss(loss.get("p", 0.01), loss.get("r", 0.3), loss.get("loss_good", 0.0),
+                                      loss.get("loss_bad", 1.0))
+        elif model == "none":
+            loss = None
+        else:
+            raise ValueError(f"Unknown loss model '{model}', expected one of {LOSS_MODELS}.")
+        jitter = spec.get("jitter") or {}
+        distribution = jitter.get("distribution", "normal" if jitter else "none")
+        jitter = Jitter(distribution, jitter.get("scale", 0.0)) if distribution != "none" else None
+        return cls(loss, jitter)
+
+    def as_dict(self):
+        spec = {}
+        if self.loss is not None:
+            spec["loss"] = self.loss.as_dict()
+        if self.jitter is not None:
+            spec["jitter"] = self.jitter.as_dict()
+        return spec
+
+
+class PathPlan:
+    """A path's impairments folded together for vectorized sampling.
+
+    Fixed link delays collapse into one number and independent (Bernoulli) losses into one
+    survival probability. Exponential jitter of one scale sums to a single gamma draw. Normal
+    and uniform jitter count as zero when negative, as in Impairments.hop_delay, so they are
+    drawn hop by hop and the folded delay stays a lower bound on every sample. Bursty loss and
+    outages stay hop by hop too. Plans add up (plan + plan is the path followed by the other),
+    hold no reference to the topology, and can be sampled from another thread.
+    """
+
+    __slots__ = ("delay", "survival", "normal", "exponential", "uniform", "bursty", "outages")
+
+    def __init__(self, delay=0.0, survival=1.0, normal=None, exponential=None, uniform=(), bursty=(), outages=()):
+        self.delay = delay                    # Sum of the links' fixed delays, in seconds
+        self.survival = survival              # Chance of getting past every Bernoulli loss
+        self.normal = normal or {}            # Normal jitter: scale -> number of hops
+        self.exponential = exponential or {}  # Exponential jitter: scale -> number of hops
+        self.uniform = list(uniform)          # Scales of uniform jitter, one per hop
+        self.bursty = list(bursty)            # Loss models that need a whole sequence, e.g. Gilbert-Elliott
+        self.outages = list(outages)
+
+    def __add__(self, other):
+        normal = dict(self.normal)
+        for scale, hops in other.normal.items():
+            normal[scale] = normal.get(scale, 0) + hops
+        exponential = dict(self.exponential)
+        for scale, hops in other.exponential.items():
+            exponential[scale] = exponential.get(scale, 0) + hops
+        return PathPlan(
+            self.delay + other.delay, self.survival * other.survival, normal, exponential,
+            self.uniform + other.uniform, self.bursty + other.bursty, self.outages + other.outages
+        )
+
+    def add_profile(self, profile):
+        """Folds one hop's loss and jitter models into the plan."""
+        if isinstance(profile.loss, BernoulliLoss):
+            self.survival *= 1 - profile.loss.rate
+        elif profile.loss is not None:
+            self.bursty.append(profile.loss)
+        jitter = profile.jitter
+        if jitter is None or not jitter.scale:
+            return
+        if jitter.distribution == "normal":
+            self.normal[jitter.scale] = self.normal.get(jitter.scale, 0) + 1
+        elif jitter.distribution == "exponential":
+            self.exponential[jitter.scale] = self.exponential.get(jitter.scale, 0) + 1
+        else:
+            self.uniform.append(jitter.scale)
+
+    @property
+    def long_run_survival(self):
+        """Chance that one packet, taken on its own, gets past every loss model."""
+        survival = self.survival
+        for loss in self.bursty:
+            survival *= 1 - loss.rate
+        return survival
+
+    def is_simple(self, bursty=True):
+        """True when delay, Bernoulli survival and normal jitter are the whole story."""
+        return not (self.exponential or self.uniform or self.outages or (bursty and self.bursty))
+
+    def add_extras(self, delays, lost, generator, start=0.0, interval=0.0, bursty=True):
+        """Adds everything but delay, Bernoulli loss and normal jitter to one path's arrays, in place.
+
+        bursty=False leaves out the bursty loss models, for callers that folded in their long-run rate.
+        """
+        import numpy as np
+
+        count = len(delays)
+        for loss in self.bursty if bursty else ():
+            lost |= loss.sample(count, generator)
+        for scale, hops in self.exponential.items():
+            delays += generator.gamma(hops, scale, count)  # A sum of exponentials
+        for scale in self.uniform:
+            delays += np.maximum(generator.uniform(-scale, scale, count), 0.0)
+        if self.outages:
+            times = start + interval * np.arange(count) if interval else None
+            for down, up in self.outages:
+                if times is None:
+                    if down <= start < up:
+                        lost[:] = True
+                else:
+                    lost |= (times >= down) & (times < up)
+
+    def sample(self, count, generator, start=0.0, interval=0.0):
+        """(delays, lost) arrays for `count` packets; packet i leaves at start + i * interval."""
+        import numpy as np
+
+        delays = np.full(count, self.delay)
+        for scale, hops in self.normal.items():
+            delays += np.maximum(generator.normal(0.0, scale, (count, hops)), 0.0).sum(axis=1)
+        if self.survival < 1:
+            lost = generator.random(count) >= self.survival
+        else:
+            lost = np.zeros(count, dtype=bool)
+        self.add_extras(delays, lost, generator, start, interval)
+        return delays, lost
+
+
+class Impairments:
+    """Applies a global profile plus each link's own to packets, pings and sampled sweeps.
+
+    A link's profile is its "impairment" attribute; without one, its plain "loss" probability is
+    Bernoulli loss. The global profile applies on top, to every hop. A link's "outages" attribute
+    lists [down, up] intervals of virtual time during which it drops everything. Gilbert-Elliott
+    state is kept per link direction, so bursts carry over from one packet to the next.
+    """
+
+    def __init__(self, topology, profile=None, seed=None, engine=None):
+        self.topology = topology
+        self.engine = engine
+        self.profile = profile or ImpairmentProfile()
+        self._profiles = {}  # link id -> ImpairmentProfile built from its attributes
+        self._states = {}    # (link id, sender, is global) -> Gilbert-Elliott state
+        self.reseed(seed)
+        topology.subscribe(self.on_topology_change)
+
+    def reseed(self, seed):
+        """Restarts every random stream, so the same seed replays the same losses and delays."""
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._generator = None
+        self._states.clear()
+
+    @property
+    def generator(self):
+        """NumPy Generator for vectorized draws, seeded like the scalar stream."""
+        if self._generator is None:
+            import numpy as np
+
+            self._generator = np.random.default_rng(self.seed)
+        return self._generator
+
+    def on_topology_change(self, event, subject):
+        if event in ("link_updated", "link_removed"):
+            self._profiles.pop(subject.id, None)
+        elif event == "cleared":
+            self._profiles.clear()
+            self._states.clear()
+
+    def now(self):
+        return self.engine.now if self.engine is not None else 0.0
+
+    def link_profile(self, link):
+        profile = self._profiles.get(link.id)
+        if profile is None:
+            spec = link.attrs.get("impairment")
+            if spec:
+                profile = ImpairmentProfile.from_dict(spec)
+            else:
+                rate = link.attrs.get("loss", 0.0)
+                profile = ImpairmentProfile(BernoulliLoss(rate) if rate else None)
+            self._profiles[link.id] = profile
+        return profile
+
+    def is_down(self, link, when):
+        return any(down <= when < up for down, up in link.attrs.get("outages") or ())
+
+    def hop_lost(self, link, sender, when):
+        """Draws whether one packet sent by `sender` over `link` at time `when` is lost."""
+        if self.is_down(link, when):
+            return True
+        lost = False
+        for is_global, profile in ((False, self.link_profile(link)), (True, self.profile)):
+            if profile.loss is not None:
+                key = (link.id, sender, is_global)
+                hit, self._states[key] = profile.loss.lost(self.rng, self._states.get(key))
+                lost = lost or hit
+        return lost
+
+    def hop_delay(self, link, size):
+        """Link delay for `size` bytes plus a jitter draw from both profiles."""
+        delay = link_delay(link, size)
+        for profile in (self.link_profile(link), self.profile):
+            if profile.jitter is not None:
+                delay += profile.jitter.draw(self.rng)
+        return delay
+
+    # Hooks for PacketForwarder
+
+    def drop(self, start, end, packet):
+        link = self.topology.best_link(start, end)
+        return link is not None and self.hop_lost(link, start, self.now())
+
+    def jitter(self, start, end, packet):
+        """Extra delay for one hop, never negative."""
+        link = self.topology.best_link(start, end)
+        extra = 0.0
+        if link is not None:
+            for profile in (self.link_profile(link), self.profile):
+                if profile.jitter is not None:
+                    extra += profile.jitter.draw(self.rng)
+        return extra
+
+    def ping(self, path, size, count=4, start=None, interval=PING_INTERVAL):
+        """RTT in seconds of `count` echoes along a device path and back, None for each one lost.
+
+        Echo i leaves at start + i * interval, which decides whether it meets an outage.
+        """
+        start = self.now() if start is None else start
+        hops = [(self.topology.best_link(a, b), a) for a, b in zip(path, path[1:])]
+        hops += [(link, link.other(sender)) for link, sender in reversed(hops)]
+        results = []
+        for echo in range(count):
+            when = start + echo * interval
+            rtt = 0.0
+            for link, sender in hops:
+                if self.hop_lost(link, sender, when + rtt):
+                    rtt = None
+                    break
+                rtt += self.hop_delay(link, size)
+            results.append(rtt)
+        return results
+
+    def link_plan(self, link, size):
+        """A one-hop PathPlan for `size` bytes crossing a link in one direction."""
+        plan = PathPlan(link_delay(link, size), outages=link.attrs.get("outages") or ())
+        plan.add_profile(self.link_profile(link))
+        plan.add_profile(self.profile)
+        return plan
+
+    def path_plan(self, links, size, round_trip=True):
+        """Folds the delays and impairments of a list of links into a PathPlan.
+
+        With round_trip the packets come back over the same links.
+        """
+        plan = PathPlan()
+        for link in links:
+            plan += self.link_plan(link, size)
+        return plan + plan if round_trip else plan
+
+    def sample_path(self, links, size, count, start=0.0, interval=0.0, round_trip=True):
+        """Vectorized ping: (delays, lost) arrays for `count` packets over a list of links.
+
+        Delays are in seconds and include jitter. Packet i leaves at start + i * interval for
+        the outage check.
+        """
+        return self.path_plan(links, size, round_trip).sample(count, self.generator, start, interval)
+
+    def loss_sweep(self, links, rates, count, model="bernoulli", burst=None):
+        """End-to-end loss fraction over `links` for each global loss rate in `rates`.
+
+        Each rate is tried on `count` packets in one vectorized draw. With model="gilbert", the
+        bad state lasts `burst` packets on average and always loses.
+        """
+        saved = self.profile
+        results = []
+        try:
+            for rate in rates:
+                if model == "gilbert":
+                    r = 1 / (burst or 4)
+                    # Pick p so that the long-run loss equals the requested rate
+                    p = rate * r / (1 - rate) if rate < 1 else 1.0
+                    loss = GilbertElliottLoss(min(p, 1.0), r)
+                else:
+                    loss = BernoulliLoss(rate)
+                self.profile = ImpairmentProfile(loss, saved.jitter)
+                lost = self.sample_path(links, 0, count, round_trip=False)[1]
+                results.append(float(lost.mean()) if count else math.nan)
+        finally:
+            self.profile = saved
+        return results
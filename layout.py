@@ -0,0 +1,486 @@
+"""Node positions for plotting the topology: force-directed, hierarchical, radial or as drawn.
+
+    layouts = LayoutEngine(topology, seed=7)
+    pos = layouts.positions("force")   # {device_id: (x, y)}, cached until the topology changes
+
+    job = layouts.prepare("force")     # or read the topology here and lay out on a worker:
+    pos = job.run()                    # NumPy only, safe on a worker thread
+    layouts.finish(job, pos)           # back where the topology lives; False if it changed since
+
+Force-directed layout is multilevel Fruchterman-Reingold with Barnes-Hut style repulsion.
+The graph is first shrunk by merging linked devices, laid out small and then refined level by
+level back to full size. Within a level, devices are binned into a quadtree of grids and feel
+the mass centres of well separated cells instead of every other device, so one iteration is
+O(N log N) array work and ten thousand devices lay out in seconds. Repulsion falls off as 1/d^2
+rather than FR's 1/d, which keeps big graphs from pushing their links out to great lengths.
+The same seed gives the same picture every time.
+
+Layouts are cached by topology version. After a small edit the old positions are kept, new
+devices start next to their neighbours and only the devices around the edit are refined, so
+the picture does not jump around between plots.
+"""
+import math
+import random
+from collections import deque
+
+
+LAYOUTS = ("force", "hierarchical", "radial", "canvas")
+ITERATIONS = 60
+REFINE_ITERATIONS = 20
+INCREMENTAL_LIMIT = 0.1  # Share of devices an edit may touch and still be refined in place
+GRAVITY = 0.05  # Pull towards the middle that keeps separate parts from drifting apart
+LEAF_SIZE = 2  # Devices per cell the quadtree aims for at its finest level
+MAX_DEPTH = 9
+MIN_DISTANCE = 0.01  # Keeps devices that sit on top of each other from flinging apart
+COARSEST = 100  # Multilevel layout stops shrinking the graph below this many devices
+COARSENING = 0.8  # ... or once a level keeps more than this share of the devices
+LEVEL_ITERATIONS = 25  # Refinement steps for each finer level
+# Cell offsets searched around a device: children of the parent cell's neighbours, and next door
+FAR = tuple((dx, dy) for dx in range(-2, 4) for dy in range(-2, 4))
+NEAR = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+class LayoutEngine:
+    """Positions per layout method, kept in step with a Topology.
+
+    Distances are in units of the ideal link length, and y grows upwards, as matplotlib expects.
+    """
+
+    def __init__(self, topology, seed=0):
+        self.topology = topology
+        self.seed = seed
+        self.full_runs = 0
+        self.incremental_runs = 0
+        self._cache = {}  # method -> [topology version, positions, devices touched since]
+        topology.subscribe(self.on_topology_change)
+
+    def on_topology_change(self, event, subject):
+        """Notes which devices an edit touched, so the next layout can refine just around them."""
+        if event == "cleared":
+            self._cache.clear()
+            return
+        if event in ("device_added", "device_removed"):
+            touched = (subject,)
+        elif event in ("link_added", "link_removed"):
+            touched = (subject.a, subject.b)
+        else:
+            return  # Attribute edits do not move anything
+        for entry in self._cache.values():
+            entry[2].update(touched)
+
+    def positions(self, method="force", coords=None):
+        """{device_id: (x, y)} for every device, laid out with `method` (one of LAYOUTS).
+
+        "canvas" reuses where the devices are drawn: `coords` ({device_id: (x, y)} in canvas
+        units) if given, else the icon_coords saved with the devices. It is not cached, as
+        devices can be dragged without the topology changing.
+        """
+        job = self.prepare(method, coords)
+        positions = job.run()
+        self.finish(job, positions)
+        return positions
+
+    def prepare(self, method="force", coords=None):
+        """A LayoutJob that computes positions(method, coords) away from the topology.
+
+        Everything that reads the topology happens here, and only force-directed layout leaves
+        work for the job; the rest come back already laid out.
+        """
+        if method not in LAYOUTS:
+            raise ValueError(f"Unknown layout '{method}'; expected one of: {', '.join(LAYOUTS)}.")
+        version = self.topology.version
+        if method == "canvas":
+            return LayoutJob(method, version, positions=self._canvas(coords))
+        entry = self._cache.get(method)
+        if entry is not None and (entry[0] == version or not entry[2]):
+            return LayoutJob(method, version, positions=entry[1])  # Unchanged, or only attributes changed
+        if entry is not None and method == "force" and len(entry[2]) <= INCREMENTAL_LIMIT * len(self.topology.devices):
+            self.incremental_runs += 1
+            return self._refine(entry[1], entry[2])
+        self.full_runs += 1
+        if method == "force":
+            return self._force()
+        return LayoutJob(method, version, positions=getattr(self, "_" + method)())
+
+    def finish(self, job, positions):
+        """Caches the positions a job computed; False, and nothing cached, if the topology changed meanwhile."""
+        if job.version != self.topology.version:
+            return False
+        if job.method != "canvas":
+            self._cache[job.method] = [job.version, positions, set()]
+        return True
+
+    def _arrays(self):
+        """Device ids in order, and the links between distinct devices as an (E, 2) index array."""
+        import numpy as np
+
+        ids = list(self.topology.devices)
+        index = {device_id: i for i, device_id in enumerate(ids)}
+        pairs = set()
+        for link in self.topology.links.values():
+            a, b = index[link.a], index[link.b]
+            if a != b:
+                pairs.add((a, b) if a < b else (b, a))  # Parallel links pull like one
+        edges = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+        return ids, edges
+
+    def _force(self):
+        ids, edges = self._arrays()
+        return LayoutJob("force", self.topology.version, ids=ids, edges=edges, seed=self.seed)
+
+    def _refine(self, previous, touched):
+        """Keeps the old positions and lets only the edited devices and their neighbours settle."""
+        import numpy as np
+
+        ids, edges = self._arrays()
+        placed = self._place_missing({device_id: previous[device_id] for device_id in ids if device_id in previous})
+        start = np.array([placed[device_id] for device_id in ids], dtype=float).reshape(-1, 2)
+        mobile = set()
+        for device_id in touched:
+            if device_id in self.topology.devices:
+                mobile.add(device_id)
+                mobile.update(neighbor for neighbor, _ in self.topology.neighbors(device_id))
+        mask = np.array([device_id in mobile for device_id in ids], dtype=bool)
+        return LayoutJob("force", self.topology.version, ids=ids, edges=edges, start=start, mobile=mask)
+
+    def _place_missing(self, positions):
+        """Fills in devices that have no position yet next to their placed neighbours.
+
+        Devices with no placed neighbour at all go somewhere random in the occupied area.
+        """
+        devices = self.topology.devices
+        pending = [device_id for device_id in devices if device_id not in positions]
+        if not pending:
+            return positions
+        positions = dict(positions)
+        generator = random.Random(self.seed)
+        while pending:
+            waiting = []
+            for device_id in pending:
+                near = [positions[neighbor] for neighbor, _ in self.topology.neighbors(device_id) if neighbor in positions]
+                if near:
+                    positions[device_id] = (
+                        sum(x for x, _ in near) / len(near) + generator.uniform(-0.5, 0.5),
+                        sum(y for _, y in near) / len(near) + generator.uniform(-0.5, 0.5),
+                    )
+                else:
+                    waiting.append(device_id)
+            if len(waiting) == len(pending):
+                # Nothing left next to a placed device: scatter the rest over the occupied area
+                xs = [x for x, _ in positions.values()] or [0.0]
+                ys = [y for _, y in positions.values()] or [0.0]
+                side = max(math.sqrt(len(waiting)), 1.0)
+                for device_id in waiting:
+                    positions[device_id] = (
+                        generator.uniform(min(xs), max(max(xs), min(xs) + side)),
+                        generator.uniform(min(ys), max(max(ys), min(ys) + side)),
+                    )
+                break
+            pending = waiting
+        return positions
+
+    def _canvas(self, coords=None):
+        devices = self.topology.devices
+        positions = {}
+        for device_id, attrs in devices.items():
+            point = coords.get(device_id) if coords is not None else attrs.get("icon_coords")
+            if point is not None:
+                positions[device_id] = (float(point[0]), -float(point[1]))  # Canvas y grows downwards
+        return self._place_missing(positions)
+
+    def _components(self):
+        """Connected groups of devices, largest first, each starting from its roots.
+
+        Routers are the roots of a group that has any, else its best connected device.
+        """
+        devices = self.topology.devices
+        adjacency = self.topology.adjacency
+        seen = set()
+        groups = []
+        for start in devices:
+            if start in seen:
+                continue
+            members = [start]
+            seen.add(start)
+            queue = deque([start])
+            while queue:
+                device_id = queue.popleft()
+                for neighbor, _ in self.topology.neighbors(device_id):
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        members.append(neighbor)
+                        queue.append(neighbor)
+            roots = [device_id for device_id in members if devices[device_id].get("kind") == "Router"]
+            if not roots:
+                roots = [max(members, key=lambda device_id: len(adjacency.get(device_id, ())))]
+            groups.append((members, roots))
+        groups.sort(key=lambda group: len(group[0]), reverse=True)
+        return groups
+
+    def _layers(self, roots):
+        """Hop count from the nearest root, and each device's parents one hop closer to a root."""
+        depth = {root: 0 for root in roots}
+        parents = {root: [] for root in roots}
+        queue = deque(roots)
+        while queue:
+            device_id = queue.popleft()
+            for neighbor, _ in self.topology.neighbors(device_id):
+                if neighbor not in depth:
+                    depth[neighbor] = depth[device_id] + 1
+                    parents[neighbor] = [device_id]
+                    queue.append(neighbor)
+                elif depth[neighbor] == depth[device_id] + 1 and device_id not in parents[neighbor]:
+                    parents[neighbor].append(device_id)
+        return depth, parents
+
+    def _hierarchical(self):
+        """Rows by hop count from the routers, each ordered by where its parents sit in the row above."""
+        positions = {}
+        left = 0.0
+        for members, roots in self._components():
+            depth, parents = self._layers(roots)
+            rows = {}
+            for device_id in members:
+                rows.setdefault(depth[device_id], []).append(device_id)
+            order = {}
+            width = 0
+            for level in sorted(rows):
+                row = rows[level]
+                if level == 0:
+                    row.sort(key=str)
+                else:
+                    # Barycentre ordering keeps links between rows from crossing more than needed
+                    row.sort(key=lambda device_id: (sum(order[p] for p in parents[device_id]) / len(parents[device_id]), str(device_id)))
+                for i, device_id in enumerate(row):
+                    order[device_id] = (i + 0.5) / len(row)
+                width = max(width, len(row))
+            # Every row spans the full width, and rows are spread out so that wide, shallow
+            # networks do not come out as a flat line
+            gap = max(1.0, width / (2 * len(rows)))
+            for device_id in members:
+                positions[device_id] = (left + width * order[device_id], gap * -depth[device_id])
+            left += width + 2
+        return positions
+
+    def _radial(self):
+        """Rings by hop count around the best connected root, each subtree in its own wedge."""
+        adjacency = self.topology.adjacency
+        positions = {}
+        left = 0.0
+        for members, roots in self._components():
+            centre = max(roots, key=lambda device_id: len(adjacency.get(device_id, ())))
+            depth, parents = self._layers([centre])
+            children = {device_id: [] for device_id in members}
+            by_depth = sorted(members, key=lambda device_id: depth[device_id])
+            for device_id in by_depth[1:]:
+                children[parents[device_id][0]].append(device_id)
+            # Wedges are sized by the number of leaves below each device
+            leaves = {}
+            for device_id in reversed(by_depth):
+                leaves[device_id] = sum(leaves[child] for child in children[device_id]) or 1
+            wedge = {centre: (0.0, 2 * math.pi)}
+            for device_id in by_depth:
+                start, end = wedge[device_id]
+                span = (end - start) / leaves[device_id]
+                for child in sorted(children[device_id], key=str):
+                    wedge[child] = (start, start + span * leaves[child])
+                    start += span * leaves[child]
+            # Rings are spaced so the outermost one has about a link length per leaf
+            rings = max(depth.values())
+            step = max(1.0, leaves[centre] / (2 * math.pi * max(rings, 1)))
+            radius = rings * step
+            for device_id in members:
+                start, end = wedge[device_id]
+                angle = (start + end) / 2
+                ring = depth[device_id] * step
+                positions[device_id] = (left + radius + ring * math.cos(angle), ring * math.sin(angle))
+            left += 2 * radius + 2
+        return positions
+
+
+class LayoutJob:
+    """One layout cut loose from the topology: device ids, link index pairs and any start positions.
+
+    run() only does array work, so it can go to a worker thread while the editor stays responsive.
+    """
+
+    def __init__(self, method, version, positions=None, ids=(), edges=None, start=None, mobile=None, seed=0):
+        self.method = method
+        self.version = version      # Topology version the job was read from
+        self.positions = positions  # Set when there is nothing left to compute
+        self.ids = ids
+        self.edges = edges
+        self.start = start          # Positions to refine from, or None for a full multilevel layout
+        self.mobile = mobile
+        self.seed = seed
+
+    def run(self):
+        """{device_id: (x, y)} for the job's devices."""
+        if self.positions is not None:
+            return self.positions
+        if not self.ids:
+            return {}
+        import numpy as np
+
+        if self.start is None:
+            moved = multilevel(len(self.ids), self.edges, np.random.default_rng(self.seed))
+        else:
+            moved = force_directed(self.start, self.edges, REFINE_ITERATIONS, temperature=1.0, mobile=self.mobile)
+        return dict(zip(self.ids, map(tuple, moved.tolist())))
+
+
+def force_directed(positions, edges, iterations, temperature, mobile=None):
+    """Runs Fruchterman-Reingold on an (N, 2) array with an ideal link length of 1.
+
+    Moves are capped by a temperature that cools linearly from `temperature` to zero. Only
+    the rows set in the boolean `mobile` mask move, if one is given.
+    """
+    import numpy as np
+
+    pos = np.array(positions, dtype=float).reshape(-1, 2)
+    count = len(pos)
+    if count < 2:
+        return pos
+    # Forces are only needed for the devices that may move
+    moving = np.arange(count) if mobile is None else np.flatnonzero(mobile)
+    if not len(moving):
+        return pos
+    for step in range(iterations):
+        force = _repulsion(pos, moving)
+        if len(edges):
+            # Attraction d^2 along each link, pulling both ends together
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            pull = delta * np.hypot(delta[:, 0], delta[:, 1])[:, None]
+            for axis in (0, 1):
+                total = np.bincount(edges[:, 1], pull[:, axis], count) - np.bincount(edges[:, 0], pull[:, axis], count)
+                force[:, axis] += total[moving]
+        force -= GRAVITY * (pos[moving] - pos.mean(axis=0))
+        limit = temperature * (1 - step / iterations)
+        length = np.hypot(force[:, 0], force[:, 1])[:, None]
+        pos[moving] += force * (np.minimum(length, limit) / np.maximum(length, 1e-12))
+    return pos
+
+
+def multilevel(count, edges, generator):
+    """Force-directed positions for `count` devices, laid out coarse to fine.
+
+    The graph is shrunk level by level by merging linked devices, the smallest version is laid
+    out in full, and each finer level starts from its coarser layout and only needs a short
+    refinement. Returns an (N, 2) array.
+    """
+    import numpy as np
+
+    levels = []  # (group of each device, device count, links) from fine to coarse
+    while count > COARSEST and len(edges):
+        group, groups = _coarsen(count, edges, generator)
+        if groups > COARSENING * count:
+            break  # Stopped shrinking, e.g. only isolated devices left
+        levels.append((group, count, edges))
+        pairs = np.sort(group[edges], axis=1)
+        edges = np.unique(pairs[pairs[:, 0] != pairs[:, 1]], axis=0)
+        count = groups
+    pos = generator.random((count, 2)) * math.sqrt(count)
+    pos = force_directed(pos, edges, ITERATIONS, temperature=max(math.sqrt(count) / 5, 1.0))
+    for group, fine, edges in reversed(levels):
+        # Each device starts on its group's spot, spread out to keep the same density
+        pos = pos[group] * math.sqrt(fine / count) + generator.normal(0.0, 0.5, (fine, 2))
+        pos = force_directed(pos, edges, LEVEL_ITERATIONS, temperature=2.0)
+        count = fine
+    return pos
+
+
+def _coarsen(count, edges, generator):
+    """Groups devices for the next coarser level: pairs from a random matching of links, then
+    each unmatched device joins a matched neighbour (so hubs swallow their leaves).
+
+    Returns (group index per device, number of groups).
+    """
+    import numpy as np
+
+    group = [-1] * count
+    groups = 0
+    order = [(a, b) for a, b in edges[generator.permutation(len(edges))].tolist()]
+    for a, b in order:
+        if group[a] < 0 and group[b] < 0:
+            group[a] = group[b] = groups
+            groups += 1
+    for a, b in order:
+        if group[a] < 0 and group[b] >= 0:
+            group[a] = group[b]
+        elif group[b] < 0 and group[a] >= 0:
+            group[b] = group[a]
+    for device, current in enumerate(group):
+        if current < 0:
+            group[device] = groups
+            groups += 1
+    return np.array(group, dtype=np.int64), groups
+
+
+def _repulsion(pos, moving):
+    """1/d^2 repulsion on every device from all the others, approximated on a quadtree of grids.
+
+    At each level a device feels the cells that are children of its parent cell's neighbours
+    but not next to its own cell; closer cells are left to the finer levels. Above the finest
+    level that push is worked out once per cell, at its mass centre, and shared by the devices
+    in it. At the finest level each device also feels the neighbouring cells, and its own cell
+    without itself, through their mass centres. Returns the force on the devices in `moving`.
+    """
+    import numpy as np
+
+    count = len(pos)
+    low = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - low).max()), 1e-9) * (1 + 1e-9)
+    unit = (pos - low) / span
+    depth = max(2, min(MAX_DEPTH, math.ceil(math.log(max(count / LEAF_SIZE, 1), 4))))
+    force = np.zeros((len(moving), 2))
+    near = np.array(NEAR)
+    for level in range(2, depth + 1):
+        size = 1 << level
+        ix = np.minimum((unit[:, 0] * size).astype(np.int64), size - 1)
+        iy = np.minimum((unit[:, 1] * size).astype(np.int64), size - 1)
+        cell = ix * size + iy
+        # Padded by two cells on every side so lookups next to the edge stay in the grid
+        mass, sum_x, sum_y = (
+            np.pad(np.bincount(cell, weights, size * size).reshape(size, size), 2).ravel()
+            for weights in (None, pos[:, 0], pos[:, 1])
+        )
+        if level < depth:
+            occupied = np.flatnonzero(np.bincount(cell[moving], None, size * size))
+            at_x = sum_x.reshape(size + 4, size + 4)[2:-2, 2:-2].ravel()[occupied]
+            at_y = sum_y.reshape(size + 4, size + 4)[2:-2, 2:-2].ravel()[occupied]
+            weight = mass.reshape(size + 4, size + 4)[2:-2, 2:-2].ravel()[occupied]
+            push = np.zeros((size * size, 2))
+            push[occupied] = _far(occupied // size, occupied % size, at_x / weight, at_y / weight, mass, sum_x, sum_y, size)
+            force += push[cell[moving]]
+        else:
+            ix, iy, x, y = ix[moving], iy[moving], pos[moving, 0], pos[moving, 1]
+            force += _far(ix, iy, x, y, mass, sum_x, sum_y, size)
+            index = (ix[None, :] + near[:, 0:1] + 2) * (size + 4) + iy[None, :] + near[:, 1:2] + 2
+            own = ((near[:, 0] == 0) & (near[:, 1] == 0))[:, None]
+            force += _push(x, y, mass[index] - own, sum_x[index] - own * x[None, :], sum_y[index] - own * y[None, :])
+    return force
+
+
+def _far(ix, iy, x, y, mass, sum_x, sum_y, size):
+    """Push on points at (x, y) in cells (ix, iy) from the cells well separated from them."""
+    import numpy as np
+
+    offsets = np.array(FAR)
+    cx = (ix // 2 * 2)[None, :] + offsets[:, 0:1]
+    cy = (iy // 2 * 2)[None, :] + offsets[:, 1:2]
+    far = (np.abs(cx - ix[None, :]) > 1) | (np.abs(cy - iy[None, :]) > 1)
+    index = (cx + 2) * (size + 4) + cy + 2
+    return _push(x, y, mass[index] * far, sum_x[index], sum_y[index])
+
+
+def _push(x, y, mass, sum_x, sum_y):
+    """Repulsion on points at (x, y) from (cells, N) arrays of cell masses and coordinate sums."""
+    import numpy as np
+
+    occupied = mass > 0
+    safe = np.where(occupied, mass, 1.0)
+    dx = x[None, :] - sum_x / safe
+    dy = y[None, :] - sum_y / safe
+    squared = np.maximum(dx * dx + dy * dy, MIN_DISTANCE)
+    scale = np.where(occupied, mass / (squared * np.sqrt(squared)), 0.0)
+    return np.stack(((scale * dx).sum(axis=0), (scale * dy).sum(axis=0)), axis=1)
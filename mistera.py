@@ -0,0 +1,423 @@
+"""Headless command-line entry point: runs ping, send and traffic scenarios without Tk.
+
+    python mistera.py run Toplogy.json --scenario pings.yaml --output results.json
+    python mistera.py convert Toplogy.json Toplogy.mas     # JSON <-> binary snapshot
+    python mistera.py report Toplogy.json --output report --format svg --layout radial
+
+A scenario is a YAML (needs PyYAML) or JSON file such as:
+
+    seed: 1                    # makes loss and jitter reproducible
+    impairments: {loss: {model: gilbert, p: 0.01, r: 0.3}, jitter: {distribution: normal, scale: 0.001}}
+    outages:
+      - {between: [Router_1, Router_2], down: 2.0, up: 5.0}   # seconds of virtual time
+    pings:
+      - {from: Router_1, to: Smartphone_1, count: 4}
+      - {from: Router_1, to: Smartphone_1, count: 10, at: 1.5}   # starts 1.5s into the run
+      - {from: Laptop_1, to: 192.168.1.10}     # devices can also be named by IP or MAC
+    sends:
+      - {from: Laptop_1, to: Server_1, data: hello, protocol: TCP}
+    ping_sweep: all            # or a list of source devices
+    rtt_sweep: {samples: 1000, hosts: all, export: rtt.parquet}   # Monte-Carlo p50/p95/p99 and loss, all pairs
+    traffic:
+      - {pattern: poisson, flows: 1000, rate: 100, packets: 100, size: 1000, seed: 1}
+      - {pattern: cbr, flows: 50, rate: 2000, queue: wfq, buffer: 50, aqm: red}   # per-link output queues
+    protocol: {type: ospf, cold: true, fail: [[Router_1, Router_2]]}   # or rip
+    tcp:
+      - {transfers: [{from: Laptop_1, to: Server_1}], size: 10000000, algorithm: cubic, trace: true}
+      - {flows: 2000, size: 100000, algorithm: reno, spread: 1.0, seed: 1}
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+from engine import SimulationEngine, PacketForwarder
+from forwarding import ForwardingPlane
+from impairments import Impairments, ImpairmentProfile, PING_INTERVAL
+from layout import LayoutEngine, LAYOUTS
+from plots import FORMATS, topology_plot, latency_plot, render_topology, render_latency
+from protocols import PROTOCOLS
+from queueing import QueueingNetwork, DEFAULT_BUFFER, format_queue_stats
+from switching import SwitchFabric
+from routing import RouteCache, LatencyModel, PING_PACKET_SIZE
+from tcp import TcpSimulator, DEFAULT_MSS
+from sweeps import RttSweep, DEFAULT_SAMPLES
+from snapshot import read_snapshot, json_to_snapshot, snapshot_to_json
+from topology import load_topology
+from traffic import TrafficGenerator, end_hosts
+
+
+class Simulation:
+    """A topology plus the route cache, latency model and engine that scenario steps run on."""
+
+    def __init__(self, topology, impairments=None, seed=None):
+        self.topology = topology
+        self.routes = RouteCache(topology)
+        self.latency = LatencyModel(topology, self.routes)
+        self.forwarding = ForwardingPlane(topology, self.routes)
+        self.engine = SimulationEngine()
+        self.switching = SwitchFabric(topology, self.engine)
+        self.queues = QueueingNetwork(self.engine, topology)
+        self.impairments = Impairments(topology, ImpairmentProfile.from_dict(impairments), seed, self.engine)
+        self.forwarder = PacketForwarder(
+            self.engine, hop_delay=lambda start, end, packet: topology.hop_delay(start, end, packet.size),
+            queues=self.queues, drop=self.impairments.drop, jitter=self.impairments.jitter
+        )
+
+    def resolve(self, name):
+        """Accepts a device id, IP address, MAC address or label and returns the device id."""
+        return self.topology.resolve(name)
+
+    def add_outage(self, between, down, up):
+        """Takes the links between two devices down from `down` to `up` seconds of virtual time."""
+        a, b = (self.resolve(name) for name in between)
+        links = self.topology.links_between(a, b)
+        if not links:
+            raise KeyError(f"'{a}' and '{b}' are not connected.")
+        for link in links:
+            self.topology.update_link(link.id, outages=list(link.attrs.get("outages") or ()) + [[down, up]])
+
+    def ping(self, source, target, count=4, at=None):
+        """Pings the target's IP, forwarded hop by hop through the routers' tables.
+
+        Echoes go out once a second from `at` (default: now), meeting the configured loss,
+        jitter and outages, and the virtual clock moves on past them.
+        """
+        source, target = self.resolve(source), self.resolve(target)
+        if at is not None and at > self.engine.now:
+            self.engine.run(until=at)
+        ip = self.topology.devices[target].get("ip")
+        result = {"from": source, "to": target, "ip": ip, "sent": count}
+        delivery = self.forwarding.forward(source, ip, self.latency.initial_ttl)
+        if not delivery.delivered:
+            result.update(received=0, reachable=False, path=delivery.path, reason=delivery.reason)
+            return result
+        frames, flooded = self.switching.carry(delivery.path)
+        reply_frames, reply_flooded = self.switching.carry(delivery.path[::-1])
+        times = [None if rtt is None else rtt * 1000
+                 for rtt in self.impairments.ping(delivery.path, PING_PACKET_SIZE, count)]
+        self.engine.run(until=self.engine.now + count * PING_INTERVAL)
+        replies = [time for time in times if time is not None]
+        result.update(
+            reachable=True, received=len(replies), lost=count - len(replies), path=delivery.path,
+            frames=frames + reply_frames, flooded=flooded + reply_flooded,
+            times_ms=times, rtt_ms=sum(replies) / len(replies) if replies else None,
+            min_ms=min(replies, default=None), max_ms=max(replies, default=None),
+            ttl=delivery.ttl,
+        )
+        return result
+
+    def send(self, source, target, data="Hello, Network!", protocol="UDP"):
+        """Sends one packet (plus its ACK for TCP) through the event engine."""
+        source, target = self.resolve(source), self.resolve(target)
+        path = self.routes.shortest_path(source, target)
+        result = {"from": source, "to": target, "protocol": protocol, "data": data}
+        if not path:
+            result["status"] = "No Path"
+            return result
+        acks = []
+        on_delivered = None
+        if protocol == "TCP":
+            def on_delivered(packet):
+                acks.append(self.forwarder.send(packet.path[::-1], "ACK", protocol="TCP"))
+        packet = self.forwarder.send(path, data, protocol=protocol, on_delivered=on_delivered)
+        self.engine.run()
+        result["path"] = path
+        if packet.delivered_at is None:
+            result.update(status="Dropped", dropped_at=list(packet.dropped_at))
+            return result
+        result.update(status="Success", latency_ms=packet.latency * 1000)
+        if acks and acks[0].delivered_at is not None:
+            result["round_trip_ms"] = (acks[0].delivered_at - packet.created) * 1000
+        elif acks:
+            result.update(status="ACK Dropped", dropped_at=list(acks[0].dropped_at))
+        return result
+
+    def ping_sweep(self, sources="all"):
+        """RTT in ms from each source to every device it can reach."""
+        if sources == "all":
+            sources = end_hosts(self.topology)
+        sweep = {}
+        for source in sources:
+            source = self.resolve(source)
+            sweep[source] = {target: rtt * 1000 for target, rtt in self.latency.rtt_from(source).items()}
+        return sweep
+
+    def rtt_sweep(self, hosts="all", samples=DEFAULT_SAMPLES, size=PING_PACKET_SIZE, interval=0.0, seed=None,
+                  export=None):
+        """Samples RTT percentiles and loss between every pair of hosts; optionally writes CSV/Parquet."""
+        hosts = end_hosts(self.topology) if hosts == "all" else [self.resolve(host) for host in hosts]
+        matrix = RttSweep(self.topology, self.routes, self.impairments, hosts, size).run(
+            samples, self.engine.now, interval, seed
+        )
+        if export:
+            matrix.export(export)
+        return dict(matrix.as_dict(), summary=matrix.summary())
+
+    def traffic(self, pattern="poisson", flows=100, rate=100.0, packets=100, size=1000, burst=10, seed=None,
+                hosts=None, matrix=None, queueing=True, queue="fifo", buffer=DEFAULT_BUFFER, aqm="tail"):
+        generator = TrafficGenerator(self.topology, self.routes, seed, queueing, queue, buffer, aqm)
+        if matrix:
+            # Matrix entries look like {from: A, to: B, rate: 50}
+            generator.add_matrix(
+                {(self.resolve(entry["from"]), self.resolve(entry["to"])): entry.get("rate", rate) for entry in matrix},
+                pattern=pattern, packets=packets, size=size, burst=burst
+            )
+        else:
+            hosts = [self.resolve(host) for host in hosts] if hosts else None
+            generator.add_random_flows(flows, hosts, pattern, rate, packets, size, burst)
+        report = generator.run()
+        return dict(report.as_dict(), pattern=pattern)
+
+    def tcp(self, transfers=(), flows=0, size=1 << 20, algorithm="reno", mss=DEFAULT_MSS, spread=0.0, seed=None,
+            hosts=None, queue="fifo", buffer=DEFAULT_BUFFER, aqm="tail", trace=False):
+        """Runs TCP bulk transfers: the listed {from, to} pairs plus `flows` between random hosts."""
+        simulator = TcpSimulator(self.topology, self.routes, seed, queue, buffer, aqm, trace)
+        for transfer in transfers:
+            simulator.add_transfer(
+                self.resolve(transfer["from"]), self.resolve(transfer["to"]), transfer.get("size", size),
+                transfer.get("algorithm", algorithm), mss, transfer.get("start", 0.0)
+            )
+        if flows:
+            hosts = [self.resolve(host) for host in hosts] if hosts else None
+            simulator.add_random_transfers(flows, hosts, size, algorithm, mss, spread)
+        return dict(simulator.run().as_dict(traces=trace), algorithm=algorithm)
+
+    def protocol(self, type="ospf", fail=(), cold=False):
+        """Starts a routing protocol, then cuts each [a, b] pair (or link id) and reports every reconvergence."""
+        if type not in PROTOCOLS:
+            raise ValueError(f"Unknown routing protocol '{type}', expected one of {tuple(PROTOCOLS)}.")
+        protocol = PROTOCOLS[type](self.topology, self.engine)
+        protocol.start(cold=cold)
+        self.forwarding.protocol = protocol
+        self.engine.run()
+        result = {"type": type, "routers": len(protocol.neighbors), "start": protocol.report().as_dict(), "failures": []}
+        for failure in fail:
+            if isinstance(failure, (list, tuple)):
+                a, b = (self.resolve(name) for name in failure)
+                links = self.topology.links_between(a, b)
+                if not links:
+                    raise KeyError(f"'{a}' and '{b}' are not connected.")
+            else:
+                links = [self.topology.links[failure]]
+            for link in links:
+                self.topology.remove_link(link.id)
+            self.engine.run()
+            result["failures"].append(dict(protocol.report().as_dict(), link=[links[0].a, links[0].b]))
+        return result
+
+
+def open_topology(path):
+    """Loads a JSON save or a binary snapshot, depending on the extension."""
+    if path.endswith(".mas"):
+        return read_snapshot(path)[0]
+    return load_topology(path)
+
+
+def load_scenario(path):
+    """Reads a YAML or JSON scenario file into a dict."""
+    with open(path, "r") as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        import yaml  # Only needed for YAML scenarios
+
+        return yaml.safe_load(text) or {}
+    return json.loads(text)
+
+
+def run_scenario(simulation, scenario):
+    """Executes every step of a scenario and returns the results as plain data."""
+    results = {}
+    for outage in scenario.get("outages") or ():
+        simulation.add_outage(outage["between"], outage["down"], outage["up"])
+    if scenario.get("pings"):
+        results["pings"] = [
+            simulation.ping(step["from"], step["to"], step.get("count", 4), step.get("at"))
+            for step in scenario["pings"]
+        ]
+    if scenario.get("sends"):
+        results["sends"] = [
+            simulation.send(step["from"], step["to"], step.get("data", "Hello, Network!"), step.get("protocol", "UDP"))
+            for step in scenario["sends"]
+        ]
+    if scenario.get("ping_sweep"):
+        results["ping_sweep"] = simulation.ping_sweep(scenario["ping_sweep"])
+    if scenario.get("rtt_sweep"):
+        step = scenario["rtt_sweep"]
+        step = {} if step is True or step == "all" else step
+        results["rtt_sweep"] = simulation.rtt_sweep(**{key.replace("-", "_"): value for key, value in step.items()})
+    if scenario.get("protocol"):
+        results["protocol"] = simulation.protocol(**scenario["protocol"])
+    if scenario.get("tcp"):
+        results["tcp"] = [
+            simulation.tcp(**{key.replace("-", "_"): value for key, value in step.items()}) for step in scenario["tcp"]
+        ]
+    if scenario.get("traffic"):
+        results["traffic"] = [
+            simulation.traffic(**{key.replace("-", "_"): value for key, value in step.items()})
+            for step in scenario["traffic"]
+        ]
+    return results
+
+
+def export_report(simulation, directory, scenario, fmt="png", layout="force", sources=None, dark=False):
+    """Writes a topology plot, latency plots and the scenario's results into `directory`.
+
+    Latency is plotted from each of `sources` (default: the first host). Plots are drawn
+    off-screen, so this needs matplotlib but no display. Returns the paths written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Plots can be saved as {', '.join(FORMATS)}, not '{fmt}'.")
+    topology = simulation.topology
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    path = os.path.join(directory, f"topology.{fmt}")
+    written.append(render_topology(path, topology_plot(topology, LayoutEngine(topology).positions(layout)), dark))
+
+    if sources is None:
+        sources = end_hosts(topology)[:1]
+    for source in sources:
+        source = simulation.resolve(source)
+        name = re.sub(r"[^\w.-]+", "_", str(topology.devices[source].get("label", source)))
+        path = os.path.join(directory, f"latency_{name}.{fmt}")
+        written.append(render_latency(path, latency_plot(topology, source, simulation.latency.rtt_from(source)), dark))
+
+    results = run_scenario(simulation, scenario)
+    path = os.path.join(directory, "results.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+    written.append(path)
+    path = os.path.join(directory, "results.txt")
+    with open(path, "w") as f:
+        f.write(format_results(results) + "\n")
+    written.append(path)
+    return written
+
+
+def format_results(results):
+    """Renders results as the same kind of text the GUI shows in its popups."""
+    lines = []
+    for ping in results.get("pings", []):
+        if ping["reachable"] and ping["received"]:
+            lines.append(
+                f"Ping {ping['from']} -> {ping['to']} [{ping['ip']}]: time={ping['rtt_ms']:.3f}ms "
+                f"(min {ping['min_ms']:.3f}ms, max {ping['max_ms']:.3f}ms) TTL={ping['ttl']} "
+                f"Sent = {ping['sent']}, Received = {ping['received']}, "
+                f"Lost = {ping['lost']} ({ping['lost'] / ping['sent']:.0%} loss)"
+            )
+        elif ping["reachable"]:
+            lines.append(f"Ping {ping['from']} -> {ping['to']} [{ping['ip']}]: Request timed out ({ping['sent']} lost)")
+        else:
+            lines.append(f"Ping {ping['from']} -> {ping['to']}: {ping.get('reason') or 'Could not reach the host.'}")
+    for send in results.get("sends", []):
+        line = f"{send['protocol']} {send['from']} -> {send['to']}: {send['status']}"
+        if "dropped_at" in send:
+            line += f" between {send['dropped_at'][0]} and {send['dropped_at'][1]}"
+        if "latency_ms" in send:
+            line += f", latency={send['latency_ms']:.3f}ms"
+        if "round_trip_ms" in send:
+            line += f", round trip={send['round_trip_ms']:.3f}ms"
+        lines.append(line)
+    for source, rtts in results.get("ping_sweep", {}).items():
+        lines.append(f"Ping sweep from {source}: {len(rtts)} reachable")
+        for target, rtt in sorted(rtts.items(), key=lambda item: item[1]):
+            lines.append(f"    {target}: {rtt:.3f}ms")
+    if "rtt_sweep" in results:
+        lines.append(results["rtt_sweep"]["summary"])
+    for report in results.get("traffic", []):
+        lines.append(
+            f"Traffic ({report['pattern']}): {report['flows']} flows, sent={report['sent']} "
+            f"delivered={report['delivered']} dropped={report['dropped']} "
+            f"throughput={report['throughput_bps'] / 1e6:.3f}Mbps"
+        )
+        if report["latency_p50"] is not None:
+            lines.append(
+                f"    latency p50={report['latency_p50'] * 1000:.3f}ms p95={report['latency_p95'] * 1000:.3f}ms "
+                f"p99={report['latency_p99'] * 1000:.3f}ms"
+            )
+        if report.get("queues"):
+            lines.append("    busiest links:")
+            lines.extend(f"        {line}" for line in format_queue_stats(report["queues"]).splitlines())
+    for report in results.get("tcp", []):
+        lines.append(
+            f"TCP ({report['algorithm']}): {report['completed']}/{report['flows']} transfers completed, "
+            f"goodput={report['aggregate_goodput_bps'] / 1e6:.3f}Mbps, "
+            f"retransmits={report['retransmits']} timeouts={report['timeouts']}"
+        )
+        for transfer in report["transfers"][:10]:
+            if transfer["completed"]:
+                lines.append(
+                    f"    {transfer['from']} -> {transfer['to']}: {transfer['size']} bytes in "
+                    f"{transfer['duration'] * 1000:.3f}ms ({transfer['goodput_bps'] / 1e6:.3f}Mbps)"
+                )
+            else:
+                lines.append(f"    {transfer['from']} -> {transfer['to']}: not completed")
+    protocol = results.get("protocol")
+    if protocol:
+        for label, report in [("start", protocol["start"])] + [
+            (f"{failure['link'][0]} - {failure['link'][1]} down", failure) for failure in protocol["failures"]
+        ]:
+            lines.append(
+                f"{protocol['type'].upper()} {label}: converged in {report['convergence_time'] * 1000:.3f}ms, "
+                f"{report['messages']} messages, CPU {report['cpu_time'] * 1000:.1f}ms"
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mistera", description="Run Mister A network scenarios without a display.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="load a topology and run a scenario against it")
+    run.add_argument("topology", help="topology JSON saved from the GUI")
+    run.add_argument("--scenario", help="YAML or JSON scenario (default: ping sweep from every host)")
+    run.add_argument("--output", "-o", help="write results as JSON to this file instead of printing text")
+    convert = commands.add_parser("convert", help="convert between JSON saves and binary .mas snapshots")
+    convert.add_argument("source")
+    convert.add_argument("target")
+    report = commands.add_parser("report", help="write topology and latency plots plus scenario results to a directory")
+    report.add_argument("topology", help="topology JSON saved from the GUI, or a .mas snapshot")
+    report.add_argument("--scenario", help="YAML or JSON scenario (default: ping sweep from every host)")
+    report.add_argument("--output", "-o", default="report", help="directory to write into (default: report)")
+    report.add_argument("--format", choices=FORMATS, default="png", help="file format of the plots")
+    report.add_argument("--layout", choices=LAYOUTS, default="force",
+                        help="topology layout; canvas reuses the saved icon positions")
+    report.add_argument("--latency-from", action="append", dest="sources",
+                        help="device to plot latency from (repeatable; default: the first host)")
+    report.add_argument("--dark", action="store_true", help="use the dark theme")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        if args.source.endswith(".mas"):
+            snapshot_to_json(args.source, args.target)
+        else:
+            json_to_snapshot(args.source, args.target)
+        return 0
+
+    scenario = load_scenario(args.scenario) if args.scenario else {"ping_sweep": "all"}
+    try:
+        simulation = Simulation(open_topology(args.topology), scenario.get("impairments"), scenario.get("seed"))
+        if args.command == "report":
+            written = export_report(
+                simulation, args.output, scenario, args.format, args.layout, args.sources, args.dark
+            )
+        else:
+            results = run_scenario(simulation, scenario)
+    except (KeyError, ValueError) as error:
+        print(f"mistera: {error}", file=sys.stderr)
+        return 1
+
+    if args.command == "report":
+        print("\n".join(written))
+        return 0
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    else:
+        print(format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
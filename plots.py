@@ -0,0 +1,158 @@
+"""Off-screen topology and latency plots, written to PNG, SVG or PDF files.
+
+    renderer = PlotRenderer()
+    data = topology_plot(topology, layouts.positions("force"))   # plain data; build it where the topology lives
+    future = renderer.submit(render_topology, "topology.svg", data, dark=True)
+
+Figures are drawn with matplotlib's Agg canvas through the object-oriented API, so nothing
+touches pyplot's global figure list or style, and no display is needed. Each process keeps one
+figure per size and clears it for the next plot instead of opening a new one. Plots are
+described with plain data, so PlotRenderer can hand them to a separate process and a big
+topology renders without holding up the editor.
+"""
+import os
+from contextlib import contextmanager
+
+
+FORMATS = ("png", "svg", "pdf")
+DPI = 100
+TOPOLOGY_SIZE = (8, 6)  # Inches
+LATENCY_SIZE = (10, 6)
+LABEL_LIMIT = 60  # Devices and links are only labelled on plots with up to this many devices
+
+_figures = {}  # (width, height) -> Figure reused by this process
+
+
+class PlotRenderer:
+    """Runs render functions in a worker process started on first use."""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._pool = None
+
+    def submit(self, function, *args, **kwargs):
+        """Queues function(*args, **kwargs) on the worker and returns its Future."""
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Spawned rather than forked: the parent may be running Tk and worker threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool.submit(function, *args, **kwargs)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def plot_format(path):
+    """The file format for a path, from its extension."""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension not in FORMATS:
+        raise ValueError(f"Plots can be saved as {', '.join(FORMATS)}, not '{extension or path}'.")
+    return extension
+
+
+def topology_plot(topology, positions, title="Network Topology"):
+    """Plain, picklable data for render_topology: device positions and labels, and the links."""
+    devices = topology.devices
+    return {
+        "title": title,
+        "positions": {device_id: tuple(positions[device_id]) for device_id in devices},
+        "labels": {device_id: attrs.get("label", device_id) for device_id, attrs in devices.items()},
+        "links": [(link.a, link.b, link.attrs.get("connection")) for link in topology.links.values()],
+    }
+
+
+def latency_plot(topology, source, rtts):
+    """Plain data for render_latency from LatencyModel.rtt_from(source) results (seconds)."""
+    devices = topology.devices
+    return {
+        "title": f"Latency from {devices[source].get('label', source)}",
+        "names": [devices[device_id].get("label", device_id) for device_id in rtts],
+        "latencies": [rtt * 1000 for rtt in rtts.values()],
+    }
+
+
+def render_topology(path, plot, dark=False):
+    """Draws a topology_plot to `path` and returns the path."""
+    from matplotlib.collections import LineCollection
+
+    fmt = plot_format(path)
+    positions = plot["positions"]
+    count = len(positions)
+    labelled = count <= LABEL_LIMIT
+    with _style(dark) as colors:
+        figure = _figure(TOPOLOGY_SIZE)
+        axes = figure.add_subplot()
+        segments = [(positions[a], positions[b]) for a, b, _ in plot["links"]]
+        axes.add_collection(LineCollection(segments, colors=colors["edge"], linewidths=1.0 if labelled else 0.3))
+        if positions:
+            xs, ys = zip(*positions.values())
+            # Big topologies get small markers so the links stay visible
+            axes.scatter(xs, ys, s=max(2000 * min(1.0, 20 / count), 4), c=colors["node"], zorder=2)
+        if labelled:
+            for device_id, (x, y) in positions.items():
+                axes.text(x, y, plot["labels"][device_id], ha="center", va="center", fontsize=10,
+                          color=colors["text"], fontweight="bold", zorder=3)
+            for a, b, connection in plot["links"]:
+                if connection:
+                    (x0, y0), (x1, y1) = positions[a], positions[b]
+                    axes.text((x0 + x1) / 2, (y0 + y1) / 2, connection, ha="center", va="center", fontsize=8,
+                              color=colors["edge"], zorder=3)
+        axes.autoscale()
+        axes.margins(0.1)
+        axes.set_axis_off()
+        axes.set_title(plot["title"], fontsize=16, color=colors["text"])
+        figure.savefig(path, format=fmt)
+    return path
+
+
+def render_latency(path, plot, dark=False):
+    """Draws a latency_plot bar chart to `path` and returns the path."""
+    fmt = plot_format(path)
+    with _style(dark) as colors:
+        figure = _figure(LATENCY_SIZE)
+        axes = figure.add_subplot()
+        axes.bar(plot["names"], plot["latencies"], color=colors["bar"])
+        axes.set_xlabel("Devices", fontsize=12, color=colors["text"])
+        axes.set_ylabel("Round Trip Time (ms)", fontsize=12, color=colors["text"])
+        axes.set_title(plot["title"], fontsize=16, color=colors["text"])
+        axes.tick_params(axis="x", labelrotation=45, colors=colors["text"])
+        axes.tick_params(axis="y", colors=colors["text"])
+        for label in axes.get_xticklabels():
+            label.set_horizontalalignment("right")
+        figure.tight_layout()
+        figure.savefig(path, format=fmt)
+    return path
+
+
+@contextmanager
+def _style(dark):
+    """Applies the light or dark matplotlib style for one plot and yields the colours to use."""
+    import matplotlib.style
+
+    with matplotlib.style.context("dark_background" if dark else "default"):
+        if dark:
+            yield {"node": "skyblue", "edge": "lightgray", "text": "white", "bar": "limegreen"}
+        else:
+            yield {"node": "blue", "edge": "black", "text": "black", "bar": "blue"}
+
+
+def _figure(size):
+    """This process's figure of the given size, cleared for a new plot."""
+    import matplotlib
+
+    figure = _figures.get(size)
+    if figure is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=size, dpi=DPI)
+        FigureCanvasAgg(figure)
+        _figures[size] = figure
+    else:
+        figure.clear()
+    figure.set_facecolor(matplotlib.rcParams["figure.facecolor"])
+    return figure
@@ -0,0 +1,590 @@
+"""Dynamic routing between Router devices: RIP-style distance vector and OSPF-style link state.
+
+Both protocols run on a SimulationEngine and exchange messages over the modelled links, so a
+message between two routers takes as long as the links between them. When the topology changes
+(e.g. a line is deleted) the routers next to the change react, and report() tells how long the
+network took to settle, how many messages that cost and how much CPU the routers burned.
+"""
+import heapq
+import time
+
+from topology import link_cost, link_delay
+
+
+PROTOCOL_MESSAGE_SIZE = 64  # Bytes per routing message, used to time it on the links
+INFINITY = float("inf")
+
+
+class ConvergenceReport:
+    """Cost of the protocol's reaction to the last change."""
+
+    def __init__(self, protocol, started, converged, messages, entries, cpu_time, route_changes):
+        self.protocol = protocol
+        self.started = started        # Virtual time of the change
+        self.converged = converged    # Virtual time of the last routing change it caused
+        self.messages = messages
+        self.entries = entries        # Routes (DV) or LSAs (LS) carried by those messages
+        self.cpu_time = cpu_time      # Process seconds spent handling messages and running SPF
+        self.route_changes = route_changes  # Table entries (distance vector) or LSAs (link state) replaced
+
+    @property
+    def convergence_time(self):
+        return max(0.0, self.converged - self.started)
+
+    def as_dict(self):
+        return {
+            "protocol": self.protocol,
+            "convergence_time": self.convergence_time,
+            "messages": self.messages,
+            "entries": self.entries,
+            "cpu_time": self.cpu_time,
+            "route_changes": self.route_changes,
+        }
+
+    def summary(self):
+        return (
+            f"{self.protocol} converged in {self.convergence_time * 1000:.3f}ms of network time\n"
+            f"Messages: {self.messages} ({self.entries} entries), route changes: {self.route_changes}\n"
+            f"CPU time: {self.cpu_time * 1000:.1f}ms"
+        )
+
+
+class RoutingProtocol:
+    """Shared plumbing: router adjacencies, message delivery and convergence accounting.
+
+    Two routers are neighbors when a path joins them without crossing a third router (so a
+    switch in between is transparent). Subclasses implement _warm_start, _cold_start,
+    _neighbors_changed, _router_removed, _receive and next_hop.
+    """
+
+    name = None
+
+    def __init__(self, topology, engine, router_kind="Router", message_size=PROTOCOL_MESSAGE_SIZE):
+        self.topology = topology
+        self.engine = engine
+        self.router_kind = router_kind
+        self.message_size = message_size
+        self.neighbors = {}  # router -> {neighbor router: (cost, delay)}
+        self.version = 0     # Bumped whenever any router's routes change
+        self.running = False
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.started = self.converged = self.engine.now
+        self.messages = self.entries = self.route_changes = 0
+        self.cpu_time = 0.0
+
+    def routers(self):
+        return [device_id for device_id, data in self.topology.devices.items() if data.get("kind") == self.router_kind]
+
+    def start(self, cold=False):
+        """Brings the protocol up. Warm starts begin converged; cold starts exchange everything first."""
+        self._reset_counters()
+        self.neighbors = {router: self._adjacent_routers(router) for router in self.routers()}
+        if not self.running:
+            self.topology.subscribe(self.on_topology_change)
+        self.running = True
+        clock = time.process_time()
+        if cold:
+            self._cold_start()
+        else:
+            self._warm_start()
+        self.cpu_time += time.process_time() - clock
+        self.version += 1
+
+    def stop(self):
+        """Stops reacting to topology changes; messages already in flight are dropped on arrival."""
+        if self.running:
+            self.topology.unsubscribe(self.on_topology_change)
+        self.running = False
+
+    def report(self):
+        return ConvergenceReport(self.name, self.started, self.converged, self.messages, self.entries,
+                                 self.cpu_time, self.route_changes)
+
+    def on_topology_change(self, event, subject):
+        if not self.running:
+            return
+        if event == "cleared":
+            self.start()  # A newly loaded design starts out converged
+            return
+        if event in ("link_added", "link_removed", "link_updated"):
+            touched = self._routers_near(subject.a) | self._routers_near(subject.b)
+        elif event == "device_removed":
+            touched = {router for router, adjacent in self.neighbors.items() if subject in adjacent or router == subject}
+        elif event == "device_added" and self.topology.devices[subject].get("kind") == self.router_kind:
+            touched = {subject}
+        else:
+            return
+        if self.engine.now != self.started:
+            # Changes made at the same virtual instant (a device and all its lines) are one event
+            self._reset_counters()
+        clock = time.process_time()
+        for router in touched:
+            old = self.neighbors.get(router, {})
+            if router not in self.topology.devices:
+                self.neighbors.pop(router, None)
+                self._router_removed(router, old)
+                continue
+            new = self._adjacent_routers(router)
+            self.neighbors[router] = new
+            if old != new:
+                self._neighbors_changed(router, old, new)
+        self.cpu_time += time.process_time() - clock
+
+    def send(self, source, target, payload, entries=1):
+        """Schedules a message to a neighbor; it is lost if the neighbors are cut apart meanwhile."""
+        self.messages += 1
+        self.entries += entries
+        self.engine.schedule(self.neighbors[source][target][1], self._deliver, source, target, payload)
+
+    def _deliver(self, source, target, payload):
+        if not self.running or source not in self.neighbors.get(target, {}):
+            return
+        clock = time.process_time()
+        self._receive(target, source, payload)
+        self.cpu_time += time.process_time() - clock
+
+    def _routes_changed(self, count=1):
+        self.route_changes += count
+        self.converged = self.engine.now
+        self.version += 1
+
+    def _adjacent_routers(self, router):
+        """Dijkstra from a router that stops at every other router it meets."""
+        devices = self.topology.devices
+        size = self.message_size
+        best = {router: (0.0, 0.0)}
+        found = {}
+        heap = [(0.0, 0.0, router)]
+        while heap:
+            cost, delay, node = heapq.heappop(heap)
+            if cost > best[node][0]:
+                continue
+            if node != router and devices[node].get("kind") == self.router_kind:
+                found[node] = (cost, delay)
+                continue
+            for link in self.topology.links_of(node):
+                other = link.other(node)
+                new_cost = cost + link_cost(link)
+                if other not in best or new_cost < best[other][0]:
+                    best[other] = (new_cost, delay + link_delay(link, size))
+                    heapq.heappush(heap, (new_cost, best[other][1], other))
+        return found
+
+    def _routers_near(self, device_id):
+        """Routers whose adjacencies can run through device_id."""
+        devices = self.topology.devices
+        if device_id not in devices:
+            return set()
+        if devices[device_id].get("kind") == self.router_kind:
+            return {device_id}
+        routers, seen, stack = set(), {device_id}, [device_id]
+        while stack:
+            node = stack.pop()
+            for neighbor, _ in self.topology.neighbors(node):
+                if neighbor in seen:
+                    continue
+                seen.add(neighbor)
+                if devices[neighbor].get("kind") == self.router_kind:
+                    routers.add(neighbor)
+                else:
+                    stack.append(neighbor)
+        return routers
+
+
+class DistanceVector(RoutingProtocol):
+    """RIP-style distance vector with triggered updates, split horizon and poisoned reverse.
+
+    Each router remembers what every neighbor last advertised, so losing a neighbor falls back
+    to the next best advertisement at once. Routes longer than max_hops count as unreachable,
+    which bounds counting to infinity. Tables hold one entry per router and destination, so for
+    thousands of routers pass `destinations` to follow only some of them.
+    """
+
+    name = "Distance vector"
+
+    def __init__(self, topology, engine, destinations=None, max_hops=64, update_delay=0.0, **options):
+        self.destinations = destinations
+        self.max_hops = max_hops
+        self.update_delay = update_delay  # Hold-down before a triggered update goes out
+        self.best = {}        # router -> {destination: (cost, next hop, hops)}
+        self.advertised = {}  # router -> {destination: {neighbor: (cost, hops)}}
+        self._pending = {}    # router -> destinations to include in its next triggered update
+        super().__init__(topology, engine, **options)
+
+    def next_hop(self, router, destination):
+        if router == destination:
+            return router
+        entry = self.best.get(router, {}).get(destination)
+        return entry[1] if entry else None
+
+    def cost(self, router, destination):
+        entry = self.best.get(router, {}).get(destination)
+        return entry[0] if entry else None
+
+    def _tracked(self):
+        return self.destinations if self.destinations is not None else list(self.neighbors)
+
+    def _warm_start(self):
+        # Converged state straight from one Dijkstra per destination over the router graph
+        self.best = {router: {} for router in self.neighbors}
+        self.advertised = {router: {} for router in self.neighbors}
+        for destination in self._tracked():
+            if destination not in self.neighbors:
+                continue
+            dist, parent, hops = _dijkstra(self.neighbors, destination)
+            for router, cost in dist.items():
+                self.best[router][destination] = (cost, parent[router] or router, hops[router])
+                for neighbor in self.neighbors[router]:
+                    # Poisoned reverse: a neighbor that routes through us advertises nothing useful
+                    if neighbor in dist and parent[neighbor] != router and hops[neighbor] < self.max_hops:
+                        self.advertised[router].setdefault(destination, {})[neighbor] = (dist[neighbor], hops[neighbor])
+
+    def _cold_start(self):
+        self.best = {router: {} for router in self.neighbors}
+        self.advertised = {router: {} for router in self.neighbors}
+        tracked = set(self._tracked())
+        for router in self.neighbors:
+            if router in tracked:
+                self.best[router][router] = (0.0, router, 0)
+                self._queue_update(router, [router])
+
+    def _router_removed(self, router, old):
+        self.best.pop(router, None)
+        self.advertised.pop(router, None)
+        self._pending.pop(router, None)
+
+    def _neighbors_changed(self, router, old, new):
+        best = self.best.setdefault(router, {})
+        advertised = self.advertised.setdefault(router, {})
+        lost = [neighbor for neighbor in old if neighbor not in new or old[neighbor] != new[neighbor]]
+        touched = set()
+        for destination, offers in advertised.items():
+            for neighbor in lost:
+                if neighbor in offers:
+                    if neighbor not in new:
+                        del offers[neighbor]
+                    touched.add(destination)
+        for destination, entry in best.items():
+            if entry[1] in lost:
+                touched.add(destination)
+        if self.destinations is None or router in self.destinations:
+            best.setdefault(router, (0.0, router, 0))
+        changed = [destination for destination in touched if self._recompute(router, destination)]
+        self._queue_update(router, changed)
+        # New or re-priced neighbors get the whole table
+        for neighbor in new:
+            if neighbor not in old or old[neighbor] != new[neighbor]:
+                self._send_vector(router, neighbor, list(best))
+
+    def _recompute(self, router, destination):
+        """Picks the best advertisement for destination; returns True if the route changed."""
+        best = self.best[router]
+        if destination == router:
+            return False
+        previous = best.get(destination)
+        choice = None
+        for neighbor, (cost, hops) in self.advertised[router].get(destination, {}).items():
+            link = self.neighbors[router].get(neighbor)
+            if link is None or hops + 1 > self.max_hops:
+                continue
+            candidate = (cost + link[0], neighbor, hops + 1)
+            if choice is None or candidate[0] < choice[0]:
+                choice = candidate
+        if choice is None:
+            best.pop(destination, None)
+        else:
+            best[destination] = choice
+        if previous != choice:
+            self._routes_changed()
+            return True
+        return False
+
+    def _queue_update(self, router, destinations):
+        if not destinations:
+            return
+        if router not in self._pending:
+            self._pending[router] = set()
+            self.engine.schedule(self.update_delay, self._flush, router)
+        self._pending[router].update(destinations)
+
+    def _flush(self, router):
+        destinations = self._pending.pop(router, ())
+        if router not in self.neighbors:
+            return
+        for neighbor in self.neighbors[router]:
+            self._send_vector(router, neighbor, destinations)
+
+    def _send_vector(self, router, neighbor, destinations):
+        best = self.best.get(router, {})
+        vector = {}
+        for destination in destinations:
+            entry = best.get(destination)
+            # Split horizon with poisoned reverse: never offer a route back to where it came from
+            vector[destination] = None if entry is None or entry[1] == neighbor else (entry[0], entry[2])
+        if vector:
+            self.send(router, neighbor, vector, len(vector))
+
+    def _receive(self, router, neighbor, vector):
+        advertised = self.advertised[router]
+        changed = []
+        for destination, offer in vector.items():
+            offers = advertised.setdefault(destination, {})
+            if offer is None:
+                if offers.pop(neighbor, None) is None:
+                    continue
+            else:
+                offers[neighbor] = offer
+            if self._recompute(router, destination):
+                changed.append(destination)
+        self._queue_update(router, changed)
+
+
+class LinkState(RoutingProtocol):
+    """OSPF-style link state: LSAs are flooded hop by hop and every router keeps its own SPF tree.
+
+    A link counts only when both ends list each other. Trees are built the first time a router is
+    asked for a route and from then on are repaired incrementally: only the part of the tree
+    below a failed link is recomputed, and an improved link only pushes its gain downstream.
+    LSAs are shared between routers, each router only records which sequence number it has
+    seen, so memory grows with the changes rather than with routers squared. When an adjacency
+    comes up, the two ends swap their whole databases, as OSPF's database exchange does, so a
+    healed partition learns what changed on the other side while it was cut off.
+    """
+
+    name = "Link state"
+
+    def __init__(self, topology, engine, **options):
+        self.lsas = {}    # origin -> {sequence: {neighbor: cost}}
+        self.latest = {}  # origin -> newest sequence number
+        self.views = {}   # router -> {origin: sequence} where it differs from the warm-start LSA 0
+        self.trees = {}   # router -> (dist, parent, children), built on demand
+        self.spf_runs = 0
+        self.incremental_updates = 0
+        self._base = set()  # Origins whose LSA 0 every router knew from the warm start
+        super().__init__(topology, engine, **options)
+
+    def lsa(self, router, origin):
+        """The link list router currently believes origin advertises, or None."""
+        sequence = self.views[router].get(origin) if router in self.views else None
+        if sequence is None:
+            if origin not in self._base:
+                return None
+            sequence = 0
+        return self.lsas[origin].get(sequence)
+
+    def weight(self, router, u, v):
+        links = self.lsa(router, u)
+        if not links or v not in links:
+            return None
+        back = self.lsa(router, v)
+        if not back or u not in back:
+            return None
+        return links[v]
+
+    def next_hop(self, router, destination):
+        if router == destination:
+            return router
+        dist, parent, _ = self.tree(router)
+        if destination not in dist:
+            return None
+        node = destination
+        while parent[node] != router:
+            node = parent[node]
+        return node
+
+    def cost(self, router, destination):
+        return self.tree(router)[0].get(destination)
+
+    def tree(self, router):
+        tree = self.trees.get(router)
+        if tree is None:
+            tree = self.trees[router] = self._spf(router)
+        return tree
+
+    def _warm_start(self):
+        self._base = set(self.neighbors)
+        self.lsas = {router: {0: {n: cost for n, (cost, _) in adjacent.items()}} for router, adjacent in self.neighbors.items()}
+        self.latest = {router: 0 for router in self.neighbors}
+        self.views = {router: {} for router in self.neighbors}
+        self.trees = {}
+
+    def _cold_start(self):
+        self._base = set()
+        self.lsas, self.latest, self.trees = {}, {}, {}
+        self.views = {router: {} for router in self.neighbors}
+        for router in self.neighbors:
+            self._originate(router)
+
+    def _router_removed(self, router, old):
+        # Its neighbors have already flooded LSAs without it, as its lines went first
+        self.views.pop(router, None)
+        self.trees.pop(router, None)
+
+    def _neighbors_changed(self, router, old, new):
+        self.views.setdefault(router, {})
+        synced = [neighbor for neighbor, (cost, _) in new.items() if neighbor not in old or old[neighbor][0] != cost]
+        self._originate(router, skip=synced)
+        database = self._database(router)
+        for neighbor in synced:
+            self.send(router, neighbor, database, entries=len(database))
+
+    def _database(self, router):
+        """{origin: sequence} for every LSA router holds, its own new one included."""
+        view = self.views[router]
+        database = {origin: 0 for origin in self._base if origin not in view}
+        database.update(view)
+        return database
+
+    def _new_lsa(self, origin, links):
+        sequence = self.latest.get(origin, -1) + 1
+        self.latest[origin] = sequence
+        self.lsas.setdefault(origin, {})[sequence] = links
+        return sequence
+
+    def _originate(self, router, skip=()):
+        """Floods a new LSA for router's current links; `skip` neighbors get it with the database instead."""
+        links = {neighbor: cost for neighbor, (cost, _) in self.neighbors[router].items()}
+        sequence = self._new_lsa(router, links)
+        self._install(router, router, sequence)
+        for neighbor in self.neighbors[router]:
+            if neighbor not in skip:
+                self.send(router, neighbor, {router: sequence})
+
+    def _receive(self, router, sender, message):
+        # Flooded LSAs and database exchanges both arrive as {origin: sequence}; whatever was
+        # news to this router goes on to its other neighbors in one message
+        if router not in self.neighbors:
+            return
+        fresh = {origin: sequence for origin, sequence in message.items() if self._install(router, origin, sequence)}
+        if fresh:
+            for neighbor in self.neighbors[router]:
+                if neighbor != sender:
+                    self.send(router, neighbor, fresh, entries=len(fresh))
+
+    def _install(self, router, origin, sequence):
+        """Stores a newer LSA in router's view and repairs its tree; False if it was not newer."""
+        view = self.views[router]
+        current = view.get(origin, 0 if origin in self._base else -1)
+        if sequence <= current:
+            return False
+        old_links = self.lsa(router, origin) or {}
+        view[origin] = sequence
+        new_links = self.lsa(router, origin) or {}
+        self._routes_changed()
+        tree = self.trees.get(router)
+        if tree is not None:
+            self._repair(router, tree, origin, old_links, new_links)
+        return True
+
+    def _spf(self, router):
+        self.spf_runs += 1
+        view = {}  # This run's memo of origin -> link list, so the two-way check stays cheap
+
+        def links(origin):
+            found = view.get(origin)
+            if found is None:
+                found = view[origin] = self.lsa(router, origin) or {}
+            return found
+
+        dist, parent, children = {router: 0.0}, {router: None}, {}
+        heap = [(0.0, router)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in links(u).items():
+                if u in links(v) and d + w < dist.get(v, INFINITY):
+                    dist[v] = d + w
+                    _reparent(parent, children, v, u)
+                    heapq.heappush(heap, (d + w, v))
+        return dist, parent, children
+
+    def _repair(self, router, tree, origin, old_links, new_links):
+        """Incremental SPF after origin's LSA changed from old_links to new_links."""
+        self.incremental_updates += 1
+        dist, parent, children = tree
+        worse, better = [], []
+        for other in set(old_links) | set(new_links):
+            # The two-way check means both directions between origin and other may have changed
+            for u, v in ((origin, other), (other, origin)):
+                new_w = self.weight(router, u, v)
+                if parent.get(v) == u and (new_w is None or dist[u] + new_w > dist[v]):
+                    worse.append((u, v))
+                elif new_w is not None and u in dist and dist[u] + new_w < dist.get(v, INFINITY):
+                    better.append((u, v, new_w))
+
+        heap = []
+        for u, v in worse:
+            if parent.get(v) != u:
+                continue  # Already cut away (and perhaps reattached) with an earlier subtree
+            # Forget the subtree hanging below the failed tree edge, then reattach it from outside
+            subtree = [v]
+            for node in subtree:
+                subtree.extend(children.get(node, ()))
+            cut = set(subtree)
+            for node in subtree:
+                children.pop(node, None)
+                del dist[node]
+            _reparent(parent, children, v, None)
+            for node in subtree:
+                parent.pop(node, None)
+            for node in subtree:
+                best = None
+                for u in self.lsa(router, node) or ():
+                    if u in cut or u not in dist:
+                        continue
+                    w = self.weight(router, u, node)
+                    if w is not None and (best is None or dist[u] + w < best[0]):
+                        best = (dist[u] + w, u)
+                if best is not None:
+                    dist[node] = best[0]
+                    _reparent(parent, children, node, best[1])
+                    heapq.heappush(heap, (best[0], node))
+        for u, v, w in better:
+            if u in dist and dist[u] + w < dist.get(v, INFINITY):
+                dist[v] = dist[u] + w
+                _reparent(parent, children, v, u)
+                heapq.heappush(heap, (dist[v], v))
+
+        # Push the improvements outwards; only nodes whose distance drops are visited
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, INFINITY):
+                continue
+            for v in self.lsa(router, u) or ():
+                w = self.weight(router, u, v)
+                if w is not None and d + w < dist.get(v, INFINITY):
+                    dist[v] = d + w
+                    _reparent(parent, children, v, u)
+                    heapq.heappush(heap, (d + w, v))
+
+
+def _reparent(parent, children, node, new_parent):
+    old = parent.get(node)
+    if old is not None and old in children:
+        children[old].discard(node)
+    parent[node] = new_parent
+    if new_parent is not None:
+        children.setdefault(new_parent, set()).add(node)
+
+
+def _dijkstra(neighbors, source):
+    """Distances, next-hop parents and hop counts from source over a router adjacency map."""
+    dist, parent, hops = {source: 0.0}, {source: None}, {source: 0}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, (cost, _) in neighbors[u].items():
+            if d + cost < dist.get(v, INFINITY):
+                dist[v] = d + cost
+                parent[v] = u
+                hops[v] = hops[u] + 1
+                heapq.heappush(heap, (d + cost, v))
+    return dist, parent, hops
+
+
+PROTOCOLS = {"rip": DistanceVector, "ospf": LinkState}
@@ -0,0 +1,404 @@
+"""Output queues on link endpoints: finite buffers, FIFO/priority/WFQ scheduling, tail drop or RED."""
+import heapq
+import itertools
+import random
+from bisect import insort
+from collections import deque
+
+from topology import LINK_PROFILES, DEFAULT_CONNECTION
+
+
+DISCIPLINES = ("fifo", "priority", "wfq")
+DROP_POLICIES = ("tail", "red")
+DEFAULT_BUFFER = 100      # Packets waiting per output queue, the one being sent not included
+DEFAULT_INTERVAL = 0.01   # Seconds covered by one row of a queue's timeline
+RED_WEIGHT = 0.002        # Weight of the newest sample in RED's average queue length
+RED_MAX_P = 0.1           # Early drop probability when the average reaches the upper threshold
+
+
+class FifoBuffer:
+    """First come, first served, one buffer shared by every packet."""
+
+    def __init__(self, weights=None):
+        self._items = deque()
+
+    def __len__(self):
+        return len(self._items)
+
+    def backlog(self, packet):
+        """Packets already queued that count against this packet's share of the buffer."""
+        return len(self._items)
+
+    def push(self, packet, item):
+        self._items.append(item)
+
+    def pop(self):
+        return self._items.popleft()
+
+
+class PriorityBuffer:
+    """Strict priority: packets with a higher `priority` always leave first, FIFO within a class.
+
+    Every class has its own buffer, so a flood of low priority packets cannot crowd out the rest.
+    """
+
+    def __init__(self, weights=None):
+        self._classes = {}  # priority -> deque of items
+        self._order = []    # Priorities with something queued, lowest first
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def backlog(self, packet):
+        queue = self._classes.get(packet.priority)
+        return len(queue) if queue else 0
+
+    def push(self, packet, item):
+        queue = self._classes.get(packet.priority)
+        if queue is None:
+            queue = self._classes[packet.priority] = deque()
+            insort(self._order, packet.priority)
+        queue.append(item)
+        self._size += 1
+
+    def pop(self):
+        priority = self._order[-1]
+        queue = self._classes[priority]
+        item = queue.popleft()
+        if not queue:
+            del self._classes[priority]
+            self._order.pop()
+        self._size -= 1
+        return item
+
+
+class WfqBuffer:
+    """Self-clocked weighted fair queueing between priority classes.
+
+    Each class gets link capacity in proportion to its weight (priority + 1 unless `weights`
+    says otherwise) and its own buffer. Packets are stamped with a virtual finish time and sent
+    in stamp order.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = weights or {}
+        self._heap = []
+        self._finish = {}  # priority -> finish stamp of its newest packet
+        self._counts = {}  # priority -> packets queued
+        self._virtual = 0.0
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def backlog(self, packet):
+        return self._counts.get(packet.priority, 0)
+
+    def push(self, packet, item):
+        priority = packet.priority
+        weight = self.weights.get(priority) or max(priority, 0) + 1
+        finish = max(self._virtual, self._finish.get(priority, 0.0)) + packet.size / weight
+        self._finish[priority] = finish
+        self._counts[priority] = self._counts.get(priority, 0) + 1
+        heapq.heappush(self._heap, (finish, next(self._counter), priority, item))
+
+    def pop(self):
+        finish, _, priority, item = heapq.heappop(self._heap)
+        self._virtual = finish
+        self._counts[priority] -= 1
+        return item
+
+
+BUFFERS = {"fifo": FifoBuffer, "priority": PriorityBuffer, "wfq": WfqBuffer}
+
+
+class OutputQueue:
+    """The sending side of one link endpoint.
+
+    Packets are put on the wire one at a time at the link bandwidth and then spend the link's
+    propagation delay in flight. While the link is busy they wait in a buffer of `buffer`
+    packets (per class for priority and WFQ); arrivals beyond that are tail dropped, and RED
+    starts dropping early at random once the average queue length passes a quarter of the
+    buffer. Depth, drops and bytes sent are kept per `interval` seconds for the timeline.
+
+    An idle queue costs no events: the link is simply marked busy until the packet has been
+    sent, and only a backlog schedules the next transmission.
+    """
+
+    def __init__(self, engine, start, end, bandwidth, delay=0.0, discipline="fifo", buffer=DEFAULT_BUFFER,
+                 aqm="tail", weights=None, rng=None, interval=DEFAULT_INTERVAL):
+        self.engine = engine
+        self.start = start
+        self.end = end
+        self.interval = interval
+        self.rng = rng or random.Random()
+        self.discipline = None
+        self._buffer = None
+        self.configure(bandwidth, delay, discipline, buffer, aqm, weights)
+        self.arrivals = 0
+        self.drops = 0
+        self.early_drops = 0  # Drops RED made before the buffer was full
+        self.sent = 0
+        self.bytes_sent = 0
+        self.busy_time = 0.0
+        self.max_depth = 0
+        self._free_at = 0.0  # When the packet now on the wire has been sent
+        self._waking = False  # A _next_packet event is pending
+        self._area = 0.0  # Integral of the depth over time, for the mean
+        self._changed_at = None
+        self._first = None
+        self._timeline = {}  # interval index -> [arrivals, drops, bytes sent, max depth]
+        self._row_index = None
+        self._row = None
+        self._average = 0.0
+        self._red_count = -1
+        self._service = 0.0
+
+    def configure(self, bandwidth, delay=0.0, discipline="fifo", buffer=DEFAULT_BUFFER, aqm="tail", weights=None):
+        """Applies new link settings; packets already waiting carry over to a new discipline."""
+        self.bandwidth = bandwidth
+        self.delay = delay
+        self.buffer = buffer
+        self.aqm = aqm
+        if discipline != self.discipline:
+            old, self._buffer = self._buffer, BUFFERS[discipline](weights)
+            while old:
+                packet, on_depart = old.pop()
+                self._buffer.push(packet, (packet, on_depart))
+            self.discipline = discipline
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def busy(self):
+        return self._free_at > self.engine.now
+
+    def offer(self, packet, on_depart):
+        """Queues a packet; on_depart(packet, start, end, delay) runs when it goes on the wire.
+
+        Returns False if the packet was dropped instead.
+        """
+        now = self.engine.now
+        if self._first is None:
+            self._first = self._changed_at = now
+        row = self._current_row(now)
+        row[0] += 1
+        self.arrivals += 1
+        busy = self._free_at > now
+        if self.aqm == "red" and self._red_drop(now, busy):
+            self.drops += 1
+            self.early_drops += 1
+            row[1] += 1
+            return False
+        if not busy and not self._waking:
+            self._transmit(packet, on_depart, now, row)
+            return True
+        if self._buffer.backlog(packet) >= self.buffer:
+            self.drops += 1
+            row[1] += 1
+            return False
+        buffer = self._buffer
+        self._area += len(buffer) * (now - self._changed_at)
+        self._changed_at = now
+        buffer.push(packet, (packet, on_depart))
+        if not self._waking:
+            self._waking = True
+            self.engine.schedule(self._free_at - now, self._next_packet)
+        depth = len(buffer)
+        if depth > row[3]:
+            row[3] = depth
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def _transmit(self, packet, on_depart, now, row):
+        service = packet.size * 8 / self.bandwidth
+        self._free_at = now + service
+        self.busy_time += service
+        self.sent += 1
+        self.bytes_sent += packet.size
+        self._service = service
+        row[2] += packet.size
+        on_depart(packet, self.start, self.end, service + self.delay)
+
+    def _next_packet(self):
+        now = self.engine.now
+        buffer = self._buffer
+        self._waking = False
+        if not buffer:
+            return  # Emptied by a change of discipline
+        self._area += len(buffer) * (now - self._changed_at)
+        self._changed_at = now
+        packet, on_depart = buffer.pop()
+        self._transmit(packet, on_depart, now, self._current_row(now))
+        if buffer:
+            self._waking = True
+            self.engine.schedule(self._free_at - now, self._next_packet)
+
+    def _current_row(self, now):
+        index = int(now / self.interval)
+        if index != self._row_index:
+            self._row_index = index
+            self._row = self._timeline.get(index)
+            if self._row is None:
+                self._row = self._timeline[index] = [0, 0, 0, 0]
+        return self._row
+
+    def _red_drop(self, now, busy):
+        # Floyd & Jacobson RED with the idle-time correction and the count-based spacing of drops
+        waiting = len(self._buffer)
+        average = self._average
+        if not busy and not waiting and self._service > 0:
+            average *= (1 - RED_WEIGHT) ** ((now - self._free_at) / self._service)
+        average += RED_WEIGHT * (waiting - average)
+        self._average = average
+        low, high = max(self.buffer / 4, 1), max(self.buffer * 3 / 4, 2)
+        if average < low:
+            self._red_count = -1
+            return False
+        if average >= high:
+            self._red_count = 0
+            return waiting > 0  # An empty queue lets the packet through while the average catches up
+        self._red_count += 1
+        p = RED_MAX_P * (average - low) / (high - low)
+        if self._red_count * p >= 1 or self.rng.random() < p / (1 - self._red_count * p):
+            self._red_count = 0
+            return True
+        return False
+
+    def stats(self):
+        """Totals since the first packet arrived, as plain data."""
+        now = self.engine.now
+        elapsed = now - self._first if self._first is not None else 0.0
+        area = self._area + len(self._buffer) * (now - self._changed_at) if self._first is not None else 0.0
+        return {
+            "from": self.start,
+            "to": self.end,
+            "discipline": self.discipline,
+            "aqm": self.aqm,
+            "buffer": self.buffer,
+            "arrivals": self.arrivals,
+            "sent": self.sent,
+            "drops": self.drops,
+            "early_drops": self.early_drops,
+            "drop_rate": self.drops / self.arrivals if self.arrivals else 0.0,
+            "utilization": min(self.busy_time / elapsed, 1.0) if elapsed > 0 else 0.0,
+            "mean_depth": area / elapsed if elapsed > 0 else 0.0,
+            "max_depth": self.max_depth,
+        }
+
+    def timeline(self):
+        """Yields one dict per interval that saw traffic: depth, drop rate and utilization over time."""
+        capacity = self.bandwidth * self.interval / 8
+        for index in sorted(self._timeline):
+            arrivals, drops, sent, depth = self._timeline[index]
+            yield {
+                "time": index * self.interval,
+                "arrivals": arrivals,
+                "drops": drops,
+                "drop_rate": drops / arrivals if arrivals else 0.0,
+                "utilization": min(sent / capacity, 1.0),
+                "max_depth": depth,
+            }
+
+
+class QueueingNetwork:
+    """An OutputQueue for every (link, sending device) that carries traffic, made on first use.
+
+    The service rate is the link's bandwidth. The link attributes "queue" (fifo, priority or
+    wfq), "buffer" (packets) and "aqm" (tail or red) override the defaults given here. Links
+    are found with `link_for(start, end, packet)`, by default the topology's best link, and
+    queues follow edits to their link while keeping their statistics.
+    """
+
+    def __init__(self, engine, topology=None, discipline="fifo", buffer=DEFAULT_BUFFER, aqm="tail",
+                 weights=None, interval=DEFAULT_INTERVAL, seed=None, link_for=None):
+        if discipline not in DISCIPLINES:
+            raise ValueError(f"Unknown queueing discipline '{discipline}', expected one of {DISCIPLINES}.")
+        if aqm not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{aqm}', expected one of {DROP_POLICIES}.")
+        if buffer < 0:
+            raise ValueError("Queue buffers cannot be negative.")
+        self.engine = engine
+        self.topology = topology
+        self.discipline = discipline
+        self.buffer = buffer
+        self.aqm = aqm
+        self.weights = weights
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.link_for = link_for or (lambda start, end, packet: topology.best_link(start, end))
+        self.queues = {}  # (link id, sending device) -> OutputQueue
+        if topology is not None:
+            topology.subscribe(self.on_topology_change)
+
+    def on_topology_change(self, event, subject):
+        if event == "link_updated":
+            for start in subject.endpoints:
+                queue = self.queues.get((subject.id, start))
+                if queue is not None:
+                    queue.configure(**self._settings(subject.attrs))
+        elif event == "link_removed":
+            for start in subject.endpoints:
+                self.queues.pop((subject.id, start), None)
+        elif event == "cleared":
+            self.queues.clear()
+
+    def _settings(self, attrs):
+        return {
+            "bandwidth": attrs.get("bandwidth") or LINK_PROFILES[DEFAULT_CONNECTION]["bandwidth"],
+            "delay": attrs.get("delay", 0.0),
+            "discipline": attrs.get("queue") or self.discipline,
+            "buffer": attrs.get("buffer", self.buffer),
+            "aqm": attrs.get("aqm") or self.aqm,
+            "weights": self.weights,
+        }
+
+    def queue(self, link, start):
+        """The queue on `link` for traffic leaving `start`."""
+        key = (link.id, start)
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = OutputQueue(
+                self.engine, start, link.other(start), rng=self.rng, interval=self.interval,
+                **self._settings(link.attrs)
+            )
+        return queue
+
+    def enqueue(self, start, end, packet, on_depart):
+        """Offers a packet to the queue from start towards end; False if it was dropped."""
+        link = self.link_for(start, end, packet)
+        if link is None:
+            raise KeyError(f"Devices '{start}' and '{end}' are not connected.")
+        queue = self.queues.get((link.id, start))
+        if queue is None:
+            queue = self.queue(link, start)
+        return queue.offer(packet, on_depart)
+
+    def stats(self):
+        """Per-queue totals, busiest first."""
+        return sorted((queue.stats() for queue in self.queues.values() if queue.arrivals),
+                      key=lambda stats: stats["utilization"], reverse=True)
+
+    def timelines(self, limit=5):
+        """Timelines of the `limit` busiest queues, keyed by "from -> to"."""
+        busiest = sorted((queue for queue in self.queues.values() if queue.arrivals),
+                         key=lambda queue: queue.busy_time, reverse=True)[:limit]
+        return {f"{queue.start} -> {queue.end}": list(queue.timeline()) for queue in busiest}
+
+    def summary(self, limit=5):
+        return format_queue_stats(self.stats(), limit)
+
+
+def format_queue_stats(stats, limit=5):
+    """One line per queue for the busiest `limit` entries of QueueingNetwork.stats()."""
+    lines = []
+    for entry in stats[:limit]:
+        lines.append(
+            f"{entry['from']} -> {entry['to']}: {entry['utilization'] * 100:.1f}% busy, "
+            f"depth {entry['mean_depth']:.1f} avg / {entry['max_depth']} max, "
+            f"dropped {entry['drops']}/{entry['arrivals']} ({entry['drop_rate'] * 100:.1f}%)"
+        )
+    return "\n".join(lines) if lines else "No queue has carried traffic yet."
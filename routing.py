@@ -0,0 +1,203 @@
+"""Route computation on top of the Topology model."""
+import heapq
+from collections import OrderedDict
+
+from topology import link_cost, link_delay
+
+
+PING_PACKET_SIZE = 32 + 8 + 20 + 18  # Echo payload + ICMP + IPv4 + Ethernet headers, in bytes
+INITIAL_TTL = 128
+
+
+class RouteCache:
+    """Memoizes one shortest-path tree per source, with LRU eviction and targeted invalidation.
+
+    Trees are built on demand with Dijkstra over the topology's adjacency index, weighted by
+    link_cost unless another weight(link) is given. When the topology changes only the trees
+    that the change can actually affect are dropped.
+    """
+
+    def __init__(self, topology, capacity=1024, weight=None):
+        self.topology = topology
+        self.capacity = capacity
+        self.weight = weight or link_cost
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._trees = OrderedDict()  # source -> (dist, pred); pred[v] = (parent, link id)
+        topology.subscribe(self.on_topology_change)
+
+    def __len__(self):
+        return len(self._trees)
+
+    def tree(self, source):
+        """Returns (dist, pred) for source, computing and caching it if needed."""
+        tree = self._trees.get(source)
+        if tree is not None:
+            self.hits += 1
+            self._trees.move_to_end(source)
+            return tree
+        self.misses += 1
+        tree = self._build_tree(source)
+        self._trees[source] = tree
+        if len(self._trees) > self.capacity:
+            self._trees.popitem(last=False)
+        return tree
+
+    def has_path(self, source, target):
+        if source not in self.topology.devices or target not in self.topology.devices:
+            return False
+        return target in self.tree(source)[0]
+
+    def distance(self, source, target):
+        """Returns the path cost between two devices, or None if unreachable."""
+        if source not in self.topology.devices:
+            return None
+        return self.tree(source)[0].get(target)
+
+    def shortest_path(self, source, target):
+        """Returns the list of devices from source to target, or None if unreachable."""
+        if source not in self.topology.devices or target not in self.topology.devices:
+            return None
+        pred = self.tree(source)[1]
+        if target not in pred:
+            return None
+        path = [target]
+        step = pred[target]
+        while step is not None:
+            path.append(step[0])
+            step = pred[step[0]]
+        path.reverse()
+        return path
+
+    def path_links(self, source, target):
+        """Returns the link ids along the shortest path, or None if unreachable."""
+        if source not in self.topology.devices or target not in self.topology.devices:
+            return None
+        pred = self.tree(source)[1]
+        if target not in pred:
+            return None
+        links = []
+        step = pred[target]
+        while step is not None:
+            links.append(step[1])
+            step = pred[step[0]]
+        links.reverse()
+        return links
+
+    def clear(self):
+        self._trees.clear()
+
+    def _build_tree(self, source):
+        links = self.topology.links
+        adjacency = self.topology.adjacency
+        weight = self.weight
+        dist = {source: 0}
+        pred = {source: None}
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for link_id in adjacency[u]:
+                link = links[link_id]
+                v = link.b if link.a == u else link.a
+                nd = d + weight(link)
+                if v not in dist or nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = (u, link_id)
+                    heapq.heappush(heap, (nd, v))
+        return dist, pred
+
+    def _invalidate(self, source):
+        del self._trees[source]
+        self.invalidations += 1
+
+    def on_topology_change(self, event, subject):
+        """Drops only the cached trees that a topology change can alter."""
+        if event == "cleared":
+            self.invalidations += len(self._trees)
+            self._trees.clear()
+        elif event == "link_added":
+            self._drop_improved(subject)
+        elif event == "link_removed":
+            self._drop_using(subject)
+        elif event == "link_updated":
+            # A cheaper link may shorten other paths, a dearer one only hurts trees that use it
+            self._drop_using(subject)
+            self._drop_improved(subject)
+        elif event == "device_removed":
+            # Its links were already removed one by one; only its own tree is left to drop
+            if subject in self._trees:
+                self._invalidate(subject)
+
+    def _drop_using(self, link):
+        for source, (dist, pred) in list(self._trees.items()):
+            step_a = pred.get(link.a)
+            step_b = pred.get(link.b)
+            if (step_a is not None and step_a[1] == link.id) or (step_b is not None and step_b[1] == link.id):
+                self._invalidate(source)
+
+    def _drop_improved(self, link):
+        if link.id not in self.topology.links:
+            return
+        w = self.weight(link)
+        for source, (dist, pred) in list(self._trees.items()):
+            da = dist.get(link.a)
+            db = dist.get(link.b)
+            if da is None and db is None:
+                continue  # Neither endpoint is reachable from this source
+            if db is None or da is None or da + w < db or db + w < da:
+                self._invalidate(source)
+
+
+class LatencyModel:
+    """Derives round trip times and TTLs from the links along cached routes."""
+
+    def __init__(self, topology, routes, initial_ttl=INITIAL_TTL):
+        self.topology = topology
+        self.routes = routes
+        self.initial_ttl = initial_ttl
+
+    def one_way(self, source, target, size=PING_PACKET_SIZE):
+        """Seconds for `size` bytes to travel the routed path, or None if unreachable."""
+        link_ids = self.routes.path_links(source, target)
+        if link_ids is None:
+            return None
+        links = self.topology.links
+        return sum(link_delay(links[link_id], size) for link_id in link_ids)
+
+    def path_delay(self, path, size=PING_PACKET_SIZE):
+        """Seconds for `size` bytes to cross an explicit list of devices, e.g. a forwarded path."""
+        hop_delay = self.topology.hop_delay
+        return sum(hop_delay(a, b, size) for a, b in zip(path, path[1:]))
+
+    def rtt(self, source, target, size=PING_PACKET_SIZE):
+        """Echo request plus reply over the same path, in seconds, or None if unreachable."""
+        delay = self.one_way(source, target, size)
+        return None if delay is None else 2 * delay
+
+    def ttl(self, path):
+        """TTL seen by the source on a reply: one less for each router that forwarded it."""
+        devices = self.topology.devices
+        routers = sum(1 for device_id in path[1:-1] if devices[device_id].get("kind") == "Router")
+        return self.initial_ttl - routers
+
+    def rtt_from(self, source, size=PING_PACKET_SIZE):
+        """RTT in seconds from source to every reachable device, in one pass over its route tree."""
+        if source not in self.topology.devices:
+            return {}
+        pred = self.routes.tree(source)[1]
+        links = self.topology.links
+        one_way = {source: 0.0}
+        for device_id in pred:
+            # Walk up to the nearest device whose delay is known, then fill in on the way back
+            chain = []
+            node = device_id
+            while node not in one_way:
+                chain.append(node)
+                node = pred[node][0]
+            for node in reversed(chain):
+                parent, link_id = pred[node]
+                one_way[node] = one_way[parent] + link_delay(links[link_id], size)
+        return {device_id: 2 * delay for device_id, delay in one_way.items() if device_id != source}
@@ -0,0 +1,373 @@
+"""Compact binary snapshot of a configuration, as an alternative to the JSON save format.
+
+Layout (little-endian, every section padded to 8 bytes):
+
+    header        magic "MASN", version, string/node/edge counts, string blob size
+    strings       u32 offsets[n_strings + 1] + UTF-8 blob (ids, labels, kinds, link types)
+    node table    id, label, kind, flags, ip, subnet (u32) | mac (u64) | x, y (f64) | extra (u32)
+    edge table    a, b, connection, flags (u32) | bandwidth, delay, loss (f64) | extra (u32)
+
+IPs, subnets and MACs are stored as integers and text as string-table indexes. Anything the
+columns cannot reproduce exactly is kept as a JSON string in `extra`, so converting JSON to a
+snapshot and back gives the same configuration. Snapshots are opened with mmap and the
+columns are read in place, so read-only loads do not parse anything up front.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from addressing import ip_to_int, int_to_ip, mac_to_int, int_to_mac
+from topology import Topology, OPTIONAL_DEVICE_FIELDS, check_connection, iter_configuration, link_attributes
+
+
+MAGIC = b"MASN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+NONE = 0xFFFFFFFF  # String index meaning "field not present"
+
+# Node flags
+HAS_IP, HAS_SUBNET, HAS_MAC, HAS_COORDS = 1, 2, 4, 8
+# Edge flags
+PAIR, RAW, HAS_BANDWIDTH, HAS_DELAY, HAS_LOSS = 1, 2, 4, 8, 16
+
+NODE_COLUMNS = [("id", "I"), ("label", "I"), ("kind", "I"), ("flags", "I"), ("ip", "I"), ("subnet", "I"),
+                ("mac", "Q"), ("x", "d"), ("y", "d"), ("extra", "I")]
+EDGE_COLUMNS = [("a", "I"), ("b", "I"), ("connection", "I"), ("flags", "I"),
+                ("bandwidth", "d"), ("delay", "d"), ("loss", "d"), ("extra", "I")]
+EDGE_NUMBERS = [("bandwidth", HAS_BANDWIDTH), ("delay", HAS_DELAY), ("loss", HAS_LOSS)]
+
+
+def _pad(size):
+    return (8 - size % 8) % 8
+
+
+def _section(size):
+    return size + _pad(size)
+
+
+def _snapshot_size(n_strings, n_nodes, n_edges, blob_size):
+    """Bytes a snapshot with these header counts takes, padding included."""
+    size = _section(HEADER.size) + _section(4 * (n_strings + 1)) + _section(blob_size)
+    size += sum(_section(struct.calcsize(code) * n_nodes) for _, code in NODE_COLUMNS)
+    size += sum(_section(struct.calcsize(code) * n_edges) for _, code in EDGE_COLUMNS)
+    return size
+
+
+def _canonical(value, parse, render):
+    """Returns the integer form of an address string if it renders back identically, else None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        number = parse(value)
+    except ValueError:
+        return None
+    return number if render(number) == value else None
+
+
+class SnapshotWriter:
+    """Collects devices and connections into packed columns and writes them as one snapshot."""
+
+    def __init__(self):
+        self.strings = []
+        self.string_index = {}
+        self.node_index = {}
+        self.nodes = {name: array(code) for name, code in NODE_COLUMNS}
+        self.edges = {name: array(code) for name, code in EDGE_COLUMNS}
+
+    def intern(self, text):
+        index = self.string_index.get(text)
+        if index is None:
+            index = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def add_device(self, device_id, data):
+        rest = dict(data)
+        flags = 0
+        columns = self.nodes
+
+        def take_string(key):
+            value = rest.get(key)
+            if isinstance(value, str):
+                del rest[key]
+                return self.intern(value)
+            return NONE
+
+        label, kind = take_string("label"), take_string("kind")
+        ip = _canonical(rest.get("ip"), ip_to_int, int_to_ip)
+        if ip is not None:
+            flags |= HAS_IP
+            del rest["ip"]
+        subnet = _canonical(rest.get("subnet"), ip_to_int, int_to_ip)
+        if subnet is not None:
+            flags |= HAS_SUBNET
+            del rest["subnet"]
+        mac = _canonical(rest.get("mac"), mac_to_int, int_to_mac)
+        if mac is not None:
+            flags |= HAS_MAC
+            del rest["mac"]
+        coords = rest.get("icon_coords")
+        if isinstance(coords, list) and len(coords) == 2 and all(type(c) is float for c in coords):
+            flags |= HAS_COORDS
+            del rest["icon_coords"]
+        else:
+            coords = (0.0, 0.0)
+
+        self.node_index[device_id] = len(columns["id"])
+        columns["id"].append(self.intern(device_id))
+        columns["label"].append(label)
+        columns["kind"].append(kind)
+        columns["flags"].append(flags)
+        columns["ip"].append(ip or 0)
+        columns["subnet"].append(subnet or 0)
+        columns["mac"].append(mac or 0)
+        columns["x"].append(coords[0])
+        columns["y"].append(coords[1])
+        columns["extra"].append(self.intern(json.dumps(rest)) if rest else NONE)
+
+    def add_connection(self, entry):
+        columns = self.edges
+        flags = 0
+        a = b = NONE
+        connection = NONE
+        numbers = {"bandwidth": 0.0, "delay": 0.0, "loss": 0.0}
+        rest = None
+
+        if isinstance(entry, list) and len(entry) == 2 and all(end in self.node_index for end in entry):
+            flags |= PAIR
+            a, b = self.node_index[entry[0]], self.node_index[entry[1]]
+        elif isinstance(entry, dict) and entry.get("from") in self.node_index and entry.get("to") in self.node_index:
+            rest = dict(entry)
+            a, b = self.node_index[rest.pop("from")], self.node_index[rest.pop("to")]
+            if isinstance(rest.get("connection"), str):
+                connection = self.intern(rest.pop("connection"))
+            for key, flag in EDGE_NUMBERS:
+                if type(rest.get(key)) is float:
+                    numbers[key] = rest.pop(key)
+                    flags |= flag
+        else:
+            # Null or dangling endpoints and other odd entries are kept verbatim
+            flags |= RAW
+            rest = entry
+
+        columns["a"].append(a)
+        columns["b"].append(b)
+        columns["connection"].append(connection)
+        columns["flags"].append(flags)
+        for key, value in numbers.items():
+            columns[key].append(value)
+        columns["extra"].append(self.intern(json.dumps(rest)) if (rest or flags & RAW) else NONE)
+
+    def write(self, path):
+        blob = bytearray()
+        offsets = array("I", [0])
+        for text in self.strings:
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+
+        sections = [offsets, bytes(blob)]
+        sections += [self.nodes[name] for name, _ in NODE_COLUMNS]
+        sections += [self.edges[name] for name, _ in EDGE_COLUMNS]
+        with open(path, "wb") as f:
+            header = HEADER.pack(MAGIC, VERSION, 0, len(self.strings), len(self.nodes["id"]),
+                                 len(self.edges["a"]), len(blob))
+            f.write(header + b"\0" * _pad(len(header)))
+            for section in sections:
+                if isinstance(section, array):
+                    if sys.byteorder == "big":
+                        section = array(section.typecode, section)
+                        section.byteswap()
+                    data = section.tobytes()
+                else:
+                    data = section
+                f.write(data + b"\0" * _pad(len(data)))
+
+
+class SnapshotView:
+    """Read-only, memory-mapped access to a snapshot file."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = self._buffer = None
+        self._views = []
+        try:
+            self._open(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _open(self, path):
+        if os.fstat(self._file.fileno()).st_size < HEADER.size:
+            raise ValueError(f"'{path}' is truncated.")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = self._buffer = memoryview(self._map)
+        magic, version, _, n_strings, self.n_nodes, self.n_edges, blob_size = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a Mister A snapshot.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+        if len(buffer) < _snapshot_size(n_strings, self.n_nodes, self.n_edges, blob_size):
+            raise ValueError(f"'{path}' is truncated.")
+
+        position = HEADER.size + _pad(HEADER.size)
+        self._offsets, position = self._column(buffer, position, "I", n_strings + 1)
+        self._blob = buffer[position:position + blob_size]
+        self._views.append(self._blob)
+        position += blob_size + _pad(blob_size)
+        self.nodes = {}
+        for name, code in NODE_COLUMNS:
+            self.nodes[name], position = self._column(buffer, position, code, self.n_nodes)
+        self.edges = {}
+        for name, code in EDGE_COLUMNS:
+            self.edges[name], position = self._column(buffer, position, code, self.n_edges)
+
+    def _column(self, buffer, position, code, count):
+        size = struct.calcsize(code) * count
+        raw = buffer[position:position + size]
+        if sys.byteorder == "big":
+            # The file is little-endian; big-endian hosts get a swapped copy instead of a view
+            column = array(code, raw.tobytes())
+            column.byteswap()
+            raw.release()
+        else:
+            column = raw.cast(code)
+            self._views.append(raw)
+            self._views.append(column)
+        return column, position + size + _pad(size)
+
+    def string(self, index):
+        if index == NONE:
+            return None
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+
+    def device_ids(self):
+        string = self.string
+        return [string(index) for index in self.nodes["id"]]
+
+    def device(self, i):
+        """Rebuilds the JSON-schema dict of node i."""
+        nodes = self.nodes
+        flags = nodes["flags"][i]
+        data = {}
+        for key in ("kind", "label"):
+            if nodes[key][i] != NONE:
+                data[key] = self.string(nodes[key][i])
+        if flags & HAS_COORDS:
+            data["icon_coords"] = [nodes["x"][i], nodes["y"][i]]
+        if flags & HAS_IP:
+            data["ip"] = int_to_ip(nodes["ip"][i])
+        if flags & HAS_MAC:
+            data["mac"] = int_to_mac(nodes["mac"][i])
+        if flags & HAS_SUBNET:
+            data["subnet"] = int_to_ip(nodes["subnet"][i])
+        if nodes["extra"][i] != NONE:
+            data.update(json.loads(self.string(nodes["extra"][i])))
+        return data
+
+    def connection(self, i, ids):
+        """Rebuilds the JSON-schema entry of edge i; ids is the list from device_ids()."""
+        edges = self.edges
+        flags = edges["flags"][i]
+        if flags & RAW:
+            return json.loads(self.string(edges["extra"][i]))
+        if flags & PAIR:
+            return [ids[edges["a"][i]], ids[edges["b"][i]]]
+        entry = {"from": ids[edges["a"][i]], "to": ids[edges["b"][i]]}
+        if edges["connection"][i] != NONE:
+            entry["connection"] = self.string(edges["connection"][i])
+        for key, flag in EDGE_NUMBERS:
+            if flags & flag:
+                entry[key] = edges[key][i]
+        if edges["extra"][i] != NONE:
+            entry.update(json.loads(self.string(edges["extra"][i])))
+        return entry
+
+    def to_config(self):
+        """Returns the configuration in the same dict shape the JSON save uses."""
+        ids = self.device_ids()
+        return {
+            "devices": {device_id: self.device(i) for i, device_id in enumerate(ids)},
+            "connections": [self.connection(i, ids) for i in range(self.n_edges)],
+        }
+
+    def to_topology(self):
+        """Builds a Topology straight from the columns (no JSON round trip).
+
+        Returns (topology, problems), where problems describes the connections that were
+        skipped, worded as topology.read_topology words them for a JSON save.
+        """
+        topology = Topology()
+        problems = []
+        ids = self.device_ids()
+        for i, device_id in enumerate(ids):
+            data = self.device(i)
+            label = data.get("label") or device_id.replace("_", " ")
+            topology.add_device(
+                device_id, kind=data.get("kind") or device_id.rpartition("_")[0] or label.split(" ")[0],
+                label=label, ip=data.get("ip"), mac=data.get("mac"), subnet=data.get("subnet", "255.255.255.0"),
+                icon_coords=data.get("icon_coords"), **{key: data[key] for key in OPTIONAL_DEVICE_FIELDS if key in data}
+            )
+        a, b, flags = self.edges["a"], self.edges["b"], self.edges["flags"]
+        for i in range(self.n_edges):
+            entry = self.connection(i, ids)
+            if flags[i] & RAW or a[i] == b[i]:
+                # Entries the JSON loader would skip as well
+                problems.append(check_connection(entry, topology.devices)[3])
+                continue
+            attrs = {} if flags[i] & PAIR else {k: v for k, v in entry.items() if k not in ("from", "to")}
+            topology.add_link(ids[a[i]], ids[b[i]], **link_attributes(**attrs))
+        return topology, problems
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._buffer is not None:
+            self._buffer.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_snapshot(config, path):
+    """Writes a configuration dict (the JSON save schema) as a binary snapshot."""
+    writer = SnapshotWriter()
+    for device_id, data in config["devices"].items():
+        writer.add_device(device_id, data)
+    for entry in config.get("connections", []):
+        writer.add_connection(entry)
+    writer.write(path)
+
+
+def read_snapshot(path):
+    """Loads a snapshot into a new Topology; returns (topology, problems) like topology.read_topology."""
+    with SnapshotView(path) as view:
+        return view.to_topology()
+
+
+def json_to_snapshot(json_path, snapshot_path):
+    """Converts a JSON save to a snapshot, streaming the JSON instead of loading it whole."""
+    writer = SnapshotWriter()
+    for kind, first, second in iter_configuration(json_path):
+        if kind == "device":
+            writer.add_device(first, second)
+        else:
+            writer.add_connection(first)
+    writer.write(snapshot_path)
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    """Converts a snapshot back to the JSON save format."""
+    with SnapshotView(snapshot_path) as view:
+        config = view.to_config()
+    with open(json_path, "w") as f:
+        json.dump(config, f, indent=4)
@@ -0,0 +1,191 @@
+"""Uniform-grid spatial index for hit-testing and region queries on the canvas.
+
+Entries are axis-aligned boxes (device icons with their labels) or line segments (links),
+stored in every grid cell they touch. A query only looks at the cells around the point or
+region asked about, so its cost depends on how crowded that spot is, not on the topology size.
+"""
+import math
+
+
+CELL_SIZE = 100  # Canvas units per grid cell; roughly two device icons across
+
+
+class SpatialIndex:
+    """Boxes and segments keyed by any hashable (device ids, canvas line ids)."""
+
+    def __init__(self, cell=CELL_SIZE):
+        self.cell = cell
+        self._cells = {}    # (column, row) -> set of keys
+        self._shapes = {}   # key -> ("box" | "segment", x0, y0, x1, y1)
+        self._covers = {}   # key -> cells it is stored in
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __contains__(self, key):
+        return key in self._shapes
+
+    def clear(self):
+        self._cells.clear()
+        self._shapes.clear()
+        self._covers.clear()
+
+    def shape(self, key):
+        return self._shapes.get(key)
+
+    def set_box(self, key, x0, y0, x1, y1):
+        """Adds or moves a box; corners may come in any order."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        self._store(key, ("box", x0, y0, x1, y1), self._box_cells(x0, y0, x1, y1))
+
+    def set_segment(self, key, x0, y0, x1, y1):
+        """Adds or moves a line segment."""
+        self._store(key, ("segment", x0, y0, x1, y1), self._segment_cells(x0, y0, x1, y1))
+
+    def remove(self, key):
+        self._shapes.pop(key, None)
+        for cell in self._covers.pop(key, ()):
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._cells[cell]
+
+    def nearest(self, x, y, tolerance=0.0):
+        """The key closest to (x, y) within `tolerance`, or None."""
+        best, best_distance = None, None
+        for key in self._candidates(x - tolerance, y - tolerance, x + tolerance, y + tolerance):
+            distance = self.distance(key, x, y)
+            if distance <= tolerance and (best_distance is None or distance < best_distance):
+                best, best_distance = key, distance
+        return best
+
+    def within(self, x, y, radius):
+        """Keys within `radius` of (x, y), nearest first."""
+        found = []
+        for key in self._candidates(x - radius, y - radius, x + radius, y + radius):
+            distance = self.distance(key, x, y)
+            if distance <= radius:
+                found.append((distance, key))
+        found.sort(key=lambda item: item[0])
+        return [key for _, key in found]
+
+    def in_region(self, x0, y0, x1, y1, contained=False):
+        """Keys overlapping the rectangle, or only those wholly inside it with contained=True."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        found = []
+        for key in self._candidates(x0, y0, x1, y1):
+            kind, a, b, c, d = self._shapes[key]
+            inside = x0 <= min(a, c) and max(a, c) <= x1 and y0 <= min(b, d) and max(b, d) <= y1
+            if contained:
+                if inside:
+                    found.append(key)
+            elif inside or (kind == "box" and a <= x1 and c >= x0 and b <= y1 and d >= y0) or (
+                    kind == "segment" and _segment_hits_box(a, b, c, d, x0, y0, x1, y1)):
+                found.append(key)
+        return found
+
+    def entries(self):
+        """(key, x0, y0, x1, y1) for everything in the index."""
+        return [(key,) + shape[1:] for key, shape in self._shapes.items()]
+
+    def entries_in_region(self, x0, y0, x1, y1):
+        """(key, x0, y0, x1, y1) for every box or segment whose bounds overlap the rectangle."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        found = []
+        shapes = self._shapes
+        for key in self._candidates(x0, y0, x1, y1):
+            _, a, b, c, d = shapes[key]
+            if min(a, c) <= x1 and max(a, c) >= x0 and min(b, d) <= y1 and max(b, d) >= y0:
+                found.append((key, a, b, c, d))
+        return found
+
+    def distance(self, key, x, y):
+        kind, x0, y0, x1, y1 = self._shapes[key]
+        if kind == "box":
+            return math.hypot(max(x0 - x, 0.0, x - x1), max(y0 - y, 0.0, y - y1))
+        return _segment_distance(x, y, x0, y0, x1, y1)
+
+    def _store(self, key, shape, cells):
+        if key in self._shapes:
+            self.remove(key)
+        self._shapes[key] = shape
+        self._covers[key] = cells
+        for cell in cells:
+            members = self._cells.get(cell)
+            if members is None:
+                members = self._cells[cell] = set()
+            members.add(key)
+
+    def _candidates(self, x0, y0, x1, y1):
+        size = self.cell
+        left, right = math.floor(x0 / size), math.floor(x1 / size)
+        top, bottom = math.floor(y0 / size), math.floor(y1 / size)
+        found = set()
+        if (right - left + 1) * (bottom - top + 1) > len(self._cells):
+            # A region wider than the occupied area: walk the occupied cells instead
+            for (column, row), members in self._cells.items():
+                if left <= column <= right and top <= row <= bottom:
+                    found.update(members)
+            return found
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                members = self._cells.get((column, row))
+                if members:
+                    found.update(members)
+        return found
+
+    def _box_cells(self, x0, y0, x1, y1):
+        size = self.cell
+        return [
+            (column, row)
+            for column in range(math.floor(x0 / size), math.floor(x1 / size) + 1)
+            for row in range(math.floor(y0 / size), math.floor(y1 / size) + 1)
+        ]
+
+    def _segment_cells(self, x0, y0, x1, y1):
+        """Cells the segment passes through, column by column, so long links stay cheap to store."""
+        size = self.cell
+        if x0 > x1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        first, last = math.floor(x0 / size), math.floor(x1 / size)
+        slope = (y1 - y0) / (x1 - x0) if x1 != x0 else 0.0
+        cells = []
+        for column in range(first, last + 1):
+            # The part of the segment inside this column
+            left = max(x0, column * size)
+            right = min(x1, (column + 1) * size)
+            top = y0 + slope * (left - x0)
+            bottom = y0 + slope * (right - x0) if x1 != x0 else y1
+            low, high = min(top, bottom), max(top, bottom)
+            cells.extend((column, row) for row in range(math.floor(low / size), math.floor(high / size) + 1))
+        return cells
+
+
+def _segment_distance(x, y, x0, y0, x1, y1):
+    dx, dy = x1 - x0, y1 - y0
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length))
+    return math.hypot(x - (x0 + t * dx), y - (y0 + t * dy))
+
+
+def _segment_hits_box(x0, y0, x1, y1, left, top, right, bottom):
+    """Liang-Barsky clip: True when the segment crosses the rectangle."""
+    dx, dy = x1 - x0, y1 - y0
+    low, high = 0.0, 1.0
+    for p, q in ((-dx, x0 - left), (dx, right - x0), (-dy, y0 - top), (dy, bottom - y0)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                low = max(low, t)
+            else:
+                high = min(high, t)
+            if low > high:
+                return False
+    return True
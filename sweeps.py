@@ -0,0 +1,235 @@
+"""Monte-Carlo RTT sweeps: round trip percentiles and loss between every pair of hosts.
+
+    sweep = RttSweep(topology, routes, impairments)   # resolves paths; do this where the topology lives
+    matrix = sweep.run(samples=1000)                   # NumPy only, safe on a worker thread
+    matrix.export("rtt.parquet")                       # or .csv
+
+Each pair's routed path is folded into an impairments PathPlan once. Pairs are then sampled in
+blocks: fixed delays and loss for a whole block come from one array draw each, normal jitter
+from one draw per hop position, and only the other jitter distributions and outages are drawn
+per pair. Jitter counts as zero when negative on each hop, as it does for a single ping. Percentiles are read
+off one row-wise sort per block, so a million pair-samples take well under a second.
+
+When echoes are sent back to back (interval 0) they are independent trials, so bursty loss
+only shows through its long-run rate and is folded in as such. With an interval, each pair's
+echoes form a time series and Gilbert-Elliott bursts are drawn in full.
+"""
+import csv
+import math
+
+from impairments import PathPlan
+from routing import PING_PACKET_SIZE
+
+
+PERCENTILES = (50, 95, 99)
+DEFAULT_SAMPLES = 1000
+BLOCK_SAMPLES = 1 << 20  # Samples held in memory at once (pairs per block x samples per pair)
+COLUMNS = ("from", "to", "samples", "received", "loss_pct") + tuple(f"p{q}_ms" for q in PERCENTILES)
+
+
+class RttMatrix:
+    """Results of a sweep as host x host arrays: RTT percentiles in ms and loss in percent.
+
+    Entry [i, j] is for pings from hosts[i] to hosts[j]. The diagonal and unreachable pairs
+    have NaN percentiles; unreachable pairs show 100% loss.
+    """
+
+    def __init__(self, hosts, samples, percentiles, loss, received):
+        self.hosts = hosts
+        self.samples = samples
+        self.percentiles = percentiles  # q -> array of ms
+        self.loss = loss                # Percent of samples lost
+        self.received = received        # Samples that came back
+
+    def __getitem__(self, name):
+        """The matrix for "p50", "p95", "p99" or "loss"."""
+        if name == "loss":
+            return self.loss
+        return self.percentiles[int(name.lstrip("p"))]
+
+    @property
+    def pairs(self):
+        return len(self.hosts) * (len(self.hosts) - 1)
+
+    def rows(self):
+        """One dict per ordered pair of distinct hosts, with the keys in COLUMNS."""
+        for i, source in enumerate(self.hosts):
+            for j, target in enumerate(self.hosts):
+                if i == j:
+                    continue
+                row = {
+                    "from": source, "to": target, "samples": self.samples,
+                    "received": int(self.received[i, j]), "loss_pct": float(self.loss[i, j]),
+                }
+                for q in PERCENTILES:
+                    value = float(self.percentiles[q][i, j])
+                    row[f"p{q}_ms"] = None if math.isnan(value) else value
+                yield row
+
+    def as_dict(self):
+        """Plain data for JSON: the host order plus one nested list per matrix (None for NaN)."""
+        def plain(matrix):
+            return [[None if math.isnan(value) else float(value) for value in row] for row in matrix.tolist()]
+
+        result = {"hosts": list(self.hosts), "samples": self.samples, "pairs": self.pairs}
+        for q in PERCENTILES:
+            result[f"p{q}_ms"] = plain(self.percentiles[q])
+        result["loss_pct"] = plain(self.loss)
+        return result
+
+    def to_csv(self, path):
+        """Writes one line per pair (see COLUMNS); unreachable percentiles are left empty."""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def to_parquet(self, path):
+        """Writes the same table as to_csv in Parquet format (needs pyarrow)."""
+        import numpy as np
+        import pyarrow as pa  # Only needed for Parquet exports
+        import pyarrow.parquet as pq
+
+        count = len(self.hosts)
+        mask = ~np.eye(count, dtype=bool)
+        sources, targets = np.nonzero(mask)
+        hosts = np.array(self.hosts, dtype=object)
+        columns = {
+            "from": pa.array(hosts[sources].tolist(), pa.string()),
+            "to": pa.array(hosts[targets].tolist(), pa.string()),
+            "samples": pa.array(np.full(len(sources), self.samples, dtype=np.int64)),
+            "received": pa.array(self.received[mask].astype(np.int64)),
+            "loss_pct": pa.array(self.loss[mask]),
+        }
+        for q in PERCENTILES:
+            values = self.percentiles[q][mask]
+            columns[f"p{q}_ms"] = pa.array(values, mask=np.isnan(values))
+        pq.write_table(pa.table(columns), path)
+
+    def export(self, path):
+        """Writes CSV or Parquet depending on the file extension."""
+        if path.endswith(".parquet"):
+            self.to_parquet(path)
+        else:
+            self.to_csv(path)
+
+    def summary(self, limit=10):
+        """Text report with the pairs that have the worst p99 and the worst loss."""
+        rows = list(self.rows())
+        lines = [f"RTT sweep: {len(self.hosts)} hosts, {self.pairs} pairs x {self.samples} samples"]
+        reached = [row for row in rows if row["p99_ms"] is not None]
+        if reached:
+            lines.append("Slowest pairs (p50 / p95 / p99):")
+            for row in sorted(reached, key=lambda row: row["p99_ms"], reverse=True)[:limit]:
+                lines.append(
+                    f"    {row['from']} -> {row['to']}: {row['p50_ms']:.3f} / {row['p95_ms']:.3f} / "
+                    f"{row['p99_ms']:.3f}ms, {row['loss_pct']:.1f}% loss"
+                )
+        lossy = [row for row in rows if row["loss_pct"] > 0]
+        if lossy:
+            lines.append("Lossiest pairs:")
+            for row in sorted(lossy, key=lambda row: row["loss_pct"], reverse=True)[:limit]:
+                lines.append(f"    {row['from']} -> {row['to']}: {row['loss_pct']:.1f}% loss")
+        return "\n".join(lines)
+
+
+class RttSweep:
+    """Samples echo round trips between every ordered pair of hosts along their cached routes.
+
+    Paths and impairments are read from the topology when the sweep is built, so run() never
+    touches the topology and can be handed to a worker. Pings follow the same routed path both
+    ways, as LatencyModel assumes, and meet the links' own and the global loss and jitter.
+    """
+
+    def __init__(self, topology, routes, impairments, hosts, size=PING_PACKET_SIZE):
+        self.hosts = list(hosts)
+        self.size = size
+        self.seed = impairments.seed
+        links = topology.links
+        hops = {}         # link id -> one-hop plan, shared by every tree that uses the link
+        self._plans = {}  # (i, j) -> round trip PathPlan for reachable pairs
+        for i, source in enumerate(self.hosts):
+            if source not in topology.devices:
+                continue
+            pred = routes.tree(source)[1]
+            # One-way plans built down the route tree, as LatencyModel.rtt_from does for delays
+            one_way = {source: PathPlan()}
+            for j, target in enumerate(self.hosts):
+                if i == j or target not in pred:
+                    continue
+                chain = []
+                node = target
+                while node not in one_way:
+                    chain.append(node)
+                    node = pred[node][0]
+                for node in reversed(chain):
+                    parent, link_id = pred[node]
+                    hop = hops.get(link_id)
+                    if hop is None:
+                        hop = hops[link_id] = impairments.link_plan(links[link_id], size)
+                    one_way[node] = one_way[parent] + hop
+                plan = one_way[target]
+                self._plans[i, j] = plan + plan
+
+    def run(self, samples=DEFAULT_SAMPLES, start=0.0, interval=0.0, seed=None):
+        """Draws `samples` echoes per pair and returns an RttMatrix.
+
+        Echo k leaves at start + k * interval, which only matters for outages. The seed
+        defaults to the impairments' seed, so a seeded sweep gives the same matrices every time.
+        """
+        import numpy as np
+
+        if samples < 1:
+            raise ValueError("A sweep needs at least one sample per pair.")
+        generator = np.random.default_rng(self.seed if seed is None else seed)
+        count = len(self.hosts)
+        percentiles = {q: np.full((count, count), np.nan) for q in PERCENTILES}
+        loss = np.full((count, count), np.nan)
+        received = np.zeros((count, count), dtype=np.int64)
+        for i in range(count):
+            for j in range(count):
+                if i != j and (i, j) not in self._plans:
+                    loss[i, j] = 100.0
+
+        folded = not interval  # Bursty loss reduces to its long-run rate for independent echoes
+        pairs = list(self._plans.items())
+        block = max(1, BLOCK_SAMPLES // samples)
+        fractions = np.array(PERCENTILES) / 100
+        for first in range(0, len(pairs), block):
+            chunk = pairs[first:first + block]
+            plans = [plan for _, plan in chunk]
+            delays = np.repeat(np.array([plan.delay for plan in plans])[:, None], samples, axis=1)
+            for scale in {scale for plan in plans for scale in plan.normal}:
+                # Hop k's draws go to the rows whose paths have more than k hops of this scale
+                hops = np.array([plan.normal.get(scale, 0) for plan in plans])
+                for hop in range(hops.max()):
+                    rows = np.flatnonzero(hops > hop)
+                    delays[rows] += np.maximum(generator.normal(0.0, scale, (len(rows), samples)), 0.0)
+            survival = np.array([plan.long_run_survival if folded else plan.survival for plan in plans])
+            if (survival < 1).any():
+                lost = generator.random((len(plans), samples)) >= survival[:, None]
+            else:
+                lost = np.zeros((len(plans), samples), dtype=bool)
+            for row, plan in enumerate(plans):
+                if not plan.is_simple(bursty=not folded):
+                    plan.add_extras(delays[row], lost[row], generator, start, interval, bursty=not folded)
+
+            # Lost echoes sort to the end as inf; percentiles interpolate over the received ones
+            delays[lost] = np.inf
+            delays.sort(axis=1)
+            got = samples - lost.sum(axis=1)
+            rows = np.arange(len(plans))[:, None]
+            position = np.maximum(got - 1, 0)[:, None] * fractions[None, :]
+            below = np.floor(position).astype(np.int64)
+            above = np.minimum(below + 1, np.maximum(got - 1, 0)[:, None])
+            low = delays[rows, below]
+            high = delays[rows, above]
+            with np.errstate(invalid="ignore"):  # inf - inf for pairs that lost everything
+                values = np.where(got[:, None] > 0, low + (high - low) * (position - below), np.nan) * 1000
+
+            index = tuple(np.array([key for key, _ in chunk]).T)
+            for column, q in enumerate(PERCENTILES):
+                percentiles[q][index] = values[:, column]
+            loss[index] = (samples - got) / samples * 100
+            received[index] = got
+        return RttMatrix(self.hosts, samples, percentiles, loss, received)
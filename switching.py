@@ -0,0 +1,255 @@
+"""Layer-2 switching: bounded MAC learning tables, flooding, broadcast domains and ARP."""
+from collections import OrderedDict, deque
+
+from addressing import int_to_mac, mac_to_int
+
+
+BROADCAST_MAC = "ff:ff:ff:ff:ff:ff"
+DEFAULT_TABLE_SIZE = 1024  # Entries per switch MAC table (roughly 100 bytes each in CPython)
+DEFAULT_AGEING = 300.0     # Seconds an idle MAC table entry survives, as on most switches
+DEFAULT_ARP_TIMEOUT = 60.0
+
+
+class LearningTable:
+    """A fixed-size key -> value table whose entries age out and are evicted least recently learned first.
+
+    Used for switch MAC tables (mac -> port) and host ARP caches (ip -> mac). Entries are kept in
+    learning order, so both ageing and eviction only ever look at the front.
+    """
+
+    def __init__(self, capacity=DEFAULT_TABLE_SIZE, ageing=DEFAULT_AGEING):
+        self.capacity = capacity
+        self.ageing = ageing
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, learned at)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def learn(self, key, value, now):
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = (value, now)
+
+    def lookup(self, key, now):
+        """Returns the value for key, or None if unknown or aged out."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[1] > self.ageing:
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    def expire(self, now):
+        """Drops every aged-out entry; returns how many went."""
+        entries = self._entries
+        expired = 0
+        while entries:
+            key, (value, learned) = next(iter(entries.items()))
+            if now - learned <= self.ageing:
+                break
+            del entries[key]
+            expired += 1
+        return expired
+
+    def items(self, now):
+        """Yields (key, value, age) for live entries."""
+        for key, (value, learned) in self._entries.items():
+            if now - learned <= self.ageing:
+                yield key, value, now - learned
+
+    def clear(self):
+        self._entries.clear()
+
+
+class FrameResult:
+    """What happened to one Ethernet frame."""
+
+    def __init__(self, received_by, links, flooded):
+        self.received_by = received_by  # Devices that accepted the frame
+        self.links = links              # Number of link crossings it caused
+        self.flooded = flooded          # True if any switch had to flood it
+
+
+class SwitchFabric:
+    """Carries frames through the Switches of a topology, with MAC learning and ARP.
+
+    Every Switch learns which port (link id) each source MAC arrived on and floods frames for
+    unknown or broadcast destinations out of every other port. Each frame reaches a device at
+    most once, as it would over a spanning tree. Routers end a broadcast domain: they take in
+    frames addressed to them but never pass them on. Tables are created on first use, capped at
+    a device's "mac_table_size" (or `table_size`), and cleared when the wiring changes.
+    """
+
+    def __init__(self, topology, engine=None, table_size=DEFAULT_TABLE_SIZE, ageing=DEFAULT_AGEING,
+                 arp_timeout=DEFAULT_ARP_TIMEOUT, switch_kind="Switch", router_kind="Router"):
+        self.topology = topology
+        self.engine = engine
+        self.table_size = table_size
+        self.ageing = ageing
+        self.arp_timeout = arp_timeout
+        self.switch_kind = switch_kind
+        self.router_kind = router_kind
+        self.frames = 0
+        self.floods = 0
+        self.arp_requests = 0
+        self._mac_tables = {}
+        self._arp_caches = {}
+        self._domains = {}
+        topology.subscribe(self.on_topology_change)
+
+    def on_topology_change(self, event, subject):
+        self._domains.clear()
+        if event in ("link_added", "link_removed", "link_updated", "cleared"):
+            # Ports may have changed meaning; let every switch learn again
+            self._mac_tables.clear()
+            self._arp_caches.clear()
+        elif event in ("device_updated", "device_removed"):
+            # An address may have moved; forget the ARP caches that could point at it
+            self._arp_caches.clear()
+            self._mac_tables.pop(subject, None)
+
+    def now(self):
+        return self.engine.now if self.engine is not None else 0.0
+
+    def mac_table(self, switch):
+        table = self._mac_tables.get(switch)
+        if table is None:
+            size = self.topology.devices[switch].get("mac_table_size", self.table_size)
+            table = self._mac_tables[switch] = LearningTable(size, self.ageing)
+        return table
+
+    def arp_cache(self, device_id):
+        cache = self._arp_caches.get(device_id)
+        if cache is None:
+            cache = self._arp_caches[device_id] = LearningTable(self.table_size, self.arp_timeout)
+        return cache
+
+    def broadcast_domain(self, device_id):
+        """Every device a broadcast from device_id reaches (routers on the edge included).
+
+        For a router this is the union of the domains on all of its links.
+        """
+        domain = self._domains.get(device_id)
+        if domain is None:
+            devices = self.topology.devices
+            members = {device_id}
+            queue = deque([device_id])
+            while queue:
+                current = queue.popleft()
+                if current != device_id and devices[current].get("kind") == self.router_kind:
+                    continue
+                for neighbor, _ in self.topology.neighbors(current):
+                    if neighbor not in members:
+                        members.add(neighbor)
+                        queue.append(neighbor)
+            domain = frozenset(members)
+            self._domains[device_id] = domain
+            if devices[device_id].get("kind") != self.router_kind:
+                # Devices inside the domain (not the routers bounding it) share the same answer
+                for member in members:
+                    if devices[member].get("kind") != self.router_kind:
+                        self._domains[member] = domain
+        return domain
+
+    def send_frame(self, origin, src_mac, dst_mac, now=None):
+        """Floods or switches one frame from origin and returns a FrameResult."""
+        now = self.now() if now is None else now
+        devices = self.topology.devices
+        links = self.topology.links
+        adjacency = self.topology.adjacency
+        src_mac, dst_mac = _normalize(src_mac), _normalize(dst_mac)
+        broadcast = dst_mac == BROADCAST_MAC
+        received_by = []
+        crossings = 0
+        flooded = False
+        seen = {origin}
+        queue = deque([(origin, None)])
+        self.frames += 1
+        while queue:
+            device, ingress = queue.popleft()
+            if device == origin:
+                ports = adjacency[device]
+            elif devices[device].get("kind") == self.switch_kind:
+                table = self.mac_table(device)
+                table.learn(src_mac, ingress, now)
+                port = None if broadcast else table.lookup(dst_mac, now)
+                if port is not None and port in links:
+                    ports = (port,)
+                else:
+                    ports = [link_id for link_id in adjacency[device] if link_id != ingress]
+                    flooded = flooded or bool(ports)
+            else:
+                # Hosts and routers take frames for their own MAC (or broadcasts) and stop there
+                mac = devices[device].get("mac")
+                if broadcast or (mac and _normalize(mac) == dst_mac):
+                    received_by.append(device)
+                continue
+            for link_id in ports:
+                neighbor = links[link_id].other(device)
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    crossings += 1
+                    queue.append((neighbor, link_id))
+        if flooded:
+            self.floods += 1
+        return FrameResult(received_by, crossings, flooded)
+
+    def arp_resolve(self, source, ip, now=None):
+        """Returns the MAC answering for ip in source's broadcast domain, or None.
+
+        A cache miss broadcasts an ARP request; the owner's unicast reply lets the switches
+        learn where it lives, and both ends cache each other's address.
+        """
+        now = self.now() if now is None else now
+        cache = self.arp_cache(source)
+        mac = cache.lookup(ip, now)
+        if mac is not None:
+            return mac
+        devices = self.topology.devices
+        source_mac = devices[source].get("mac")
+        if not source_mac:
+            return None
+        self.arp_requests += 1
+        request = self.send_frame(source, source_mac, BROADCAST_MAC, now)
+        for device_id in request.received_by:
+            data = devices[device_id]
+            if data.get("ip") == ip and data.get("mac"):
+                mac = data["mac"]
+                self.arp_cache(device_id).learn(devices[source].get("ip"), source_mac, now)
+                self.send_frame(device_id, mac, source_mac, now)  # The reply
+                cache.learn(ip, mac, now)
+                return mac
+        return None
+
+    def carry(self, path, now=None):
+        """Moves a packet's frames along a forwarded path, one L2 segment at a time.
+
+        The path is cut at every router. Each segment resolves the next L3 hop with ARP and then
+        switches a unicast frame to it. Returns (frames sent, frames flooded).
+        """
+        now = self.now() if now is None else now
+        devices = self.topology.devices
+        frames, floods = self.frames, self.floods
+        hop_start = path[0]
+        for device_id in path[1:]:
+            if device_id != path[-1] and devices[device_id].get("kind") != self.router_kind:
+                continue  # Switches (and anything else in between) only carry the frame
+            mac = self.arp_resolve(hop_start, devices[device_id].get("ip"), now)
+            if mac is None:
+                break
+            self.send_frame(hop_start, devices[hop_start].get("mac"), mac, now)
+            hop_start = device_id
+        return self.frames - frames, self.floods - floods
+
+
+def _normalize(mac):
+    try:
+        return int_to_mac(mac_to_int(mac))
+    except (ValueError, AttributeError, TypeError):
+        return mac
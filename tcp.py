@@ -0,0 +1,414 @@
+"""Segment-level TCP bulk transfers (Reno and CUBIC) on the queued, lossy link model."""
+import random
+from array import array
+
+from engine import SimulationEngine, PacketForwarder
+from queueing import QueueingNetwork, DEFAULT_BUFFER, format_queue_stats
+from traffic import copy_link, end_hosts, percentile
+
+
+ALGORITHMS = ("reno", "cubic")
+DEFAULT_MSS = 1460            # Payload bytes per segment on an Ethernet path
+HEADER_SIZE = 40              # IPv4 + TCP headers, no options
+INITIAL_WINDOW = 10           # Segments (RFC 6928)
+DEFAULT_RECEIVE_WINDOW = 1 << 20
+INITIAL_RTO = 1.0             # Seconds (RFC 6298)
+MIN_RTO = 0.2                 # Linux's floor; RFC 6298 asks for 1s
+MAX_RTO = 60.0
+DUPACK_THRESHOLD = 3
+CUBIC_C = 0.4
+CUBIC_BETA = 0.7
+
+
+class TcpFlow:
+    """Sender and receiver state of one transfer, in __slots__ so thousands stay cheap.
+
+    Sequence numbers count segments, not bytes. Windows are in segments too.
+    """
+
+    __slots__ = ("id", "src", "dst", "path", "links", "loss", "back_path", "back_links", "back_loss",
+                 "size", "mss", "segments", "algorithm", "start", "receive_window",
+                 "cwnd", "ssthresh", "snd_una", "snd_nxt", "dupacks", "recover",
+                 "rcv_next", "out_of_order",
+                 "srtt", "rttvar", "rto", "min_rtt", "deadline", "timer",
+                 "w_max", "epoch", "origin", "k", "w_est",
+                 "started", "finished", "sent", "retransmits", "fast_retransmits", "timeouts", "trace")
+
+    def __init__(self, flow_id, src, dst, path, links, size, algorithm, mss, start, receive_window, trace):
+        self.id = flow_id
+        self.src = src
+        self.dst = dst
+        self.path = path
+        self.links = links
+        self.loss = [link.attrs.get("loss", 0.0) for link in links]
+        self.back_path = path[::-1]
+        self.back_links = links[::-1]
+        self.back_loss = self.loss[::-1]
+        self.size = size
+        self.mss = mss
+        self.segments = max(1, -(-size // mss))
+        self.algorithm = algorithm
+        self.start = start
+        self.receive_window = max(1, receive_window // mss)
+        self.cwnd = float(INITIAL_WINDOW)
+        self.ssthresh = float("inf")
+        self.snd_una = 0      # Oldest unacknowledged segment
+        self.snd_nxt = 0      # Next segment to send
+        self.dupacks = 0
+        self.recover = None   # Highest segment sent when fast recovery began, None outside it
+        self.rcv_next = 0     # Receiver: next segment expected in order
+        self.out_of_order = None
+        self.srtt = None
+        self.rttvar = 0.0
+        self.rto = INITIAL_RTO
+        self.min_rtt = None
+        self.deadline = 0.0   # When the retransmission timer expires
+        self.timer = False    # A timer event is pending
+        self.w_max = 0.0      # CUBIC: window before the last reduction
+        self.epoch = None     # CUBIC: start of the current growth epoch
+        self.origin = 0.0
+        self.k = 0.0
+        self.w_est = 0.0
+        self.started = None
+        self.finished = None
+        self.sent = 0
+        self.retransmits = 0
+        self.fast_retransmits = 0
+        self.timeouts = 0
+        self.trace = array("d") if trace else None  # Flat (time, cwnd) pairs
+
+    @property
+    def duration(self):
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def goodput(self):
+        """Application bytes delivered per second, in bits/s, once the transfer has finished."""
+        duration = self.duration
+        return self.size * 8 / duration if duration else None
+
+    def cwnd_trace(self):
+        """(time, cwnd in segments) at every change of the window."""
+        trace = self.trace or ()
+        return list(zip(trace[0::2], trace[1::2]))
+
+    def as_dict(self, trace=False):
+        result = {
+            "id": self.id,
+            "from": self.src,
+            "to": self.dst,
+            "size": self.size,
+            "algorithm": self.algorithm,
+            "completed": self.finished is not None,
+            "duration": self.duration,
+            "goodput_bps": self.goodput,
+            "segments": self.segments,
+            "sent": self.sent,
+            "retransmits": self.retransmits,
+            "fast_retransmits": self.fast_retransmits,
+            "timeouts": self.timeouts,
+            "srtt": self.srtt,
+            "cwnd": self.cwnd,
+        }
+        if trace:
+            result["cwnd_trace"] = self.cwnd_trace()
+        return result
+
+
+class TcpReport:
+    """Results of a TcpSimulator run."""
+
+    def __init__(self, flows, duration, unroutable, queues=None):
+        self.flows = flows
+        self.duration = duration
+        self.unroutable = unroutable
+        self.queues = queues or []
+        self.completed = [flow for flow in flows if flow.finished is not None]
+        self.goodputs = sorted(flow.goodput for flow in self.completed if flow.goodput)
+        self.retransmits = sum(flow.retransmits for flow in flows)
+        self.timeouts = sum(flow.timeouts for flow in flows)
+        self.sent = sum(flow.sent for flow in flows)
+
+    @property
+    def aggregate_goodput(self):
+        """All delivered application bits over the whole run, in bits/s."""
+        delivered = sum(flow.size for flow in self.completed)
+        return delivered * 8 / self.duration if self.duration > 0 else 0.0
+
+    def as_dict(self, traces=False):
+        return {
+            "flows": len(self.flows),
+            "completed": len(self.completed),
+            "unroutable": self.unroutable,
+            "duration": self.duration,
+            "segments_sent": self.sent,
+            "retransmits": self.retransmits,
+            "timeouts": self.timeouts,
+            "aggregate_goodput_bps": self.aggregate_goodput,
+            "goodput_p50": percentile(self.goodputs, 50),
+            "goodput_p5": percentile(self.goodputs, 5),
+            "transfers": [flow.as_dict(traces) for flow in self.flows],
+            "queues": self.queues,
+        }
+
+    def summary(self):
+        def mbps(value):
+            return "n/a" if value is None else f"{value / 1e6:.3f} Mbps"
+
+        summary = (
+            f"Transfers: {len(self.completed)}/{len(self.flows)} completed ({self.unroutable} without a route)\n"
+            f"Goodput: p50 = {mbps(percentile(self.goodputs, 50))}, p5 = {mbps(percentile(self.goodputs, 5))}, "
+            f"total = {mbps(self.aggregate_goodput)} over {self.duration:.3f}s\n"
+            f"Segments: Sent = {self.sent}, Retransmitted = {self.retransmits}, Timeouts = {self.timeouts}"
+        )
+        if len(self.flows) == 1 and self.completed:
+            flow = self.flows[0]
+            summary += (
+                f"\nCompleted in {flow.duration * 1000:.2f}ms, smoothed RTT {flow.srtt * 1000:.2f}ms, "
+                f"final cwnd {flow.cwnd:.1f} segments"
+            )
+        if self.queues:
+            summary += "\nBusiest links:\n" + format_queue_stats(self.queues)
+        return summary
+
+
+class TcpSimulator:
+    """Runs TCP bulk transfers, thousands at a time, on one SimulationEngine.
+
+    Data segments and ACKs are engine packets: they wait in the output queues of every link
+    (see queueing.py) and are lost with each link's "loss" probability. Senders use Reno or
+    CUBIC congestion control (RFC 5681, 8312) with NewReno fast recovery (RFC 6582) and
+    retransmission timeouts (RFC 6298). Receivers ACK every segment cumulatively and echo its
+    send time, as the timestamp option would, for RTT samples.
+
+    As with TrafficGenerator, transfers are resolved against the route cache when they are
+    added and run() only touches their own state, so it can be handed to a worker.
+    """
+
+    def __init__(self, topology, routes, seed=None, discipline="fifo", buffer=DEFAULT_BUFFER, aqm="tail", trace=True):
+        self.topology = topology
+        self.routes = routes
+        self.rng = random.Random(seed)
+        self.queue_options = {"discipline": discipline, "buffer": buffer, "aqm": aqm}
+        self.trace = trace
+        self.flows = []
+        self.unroutable = 0
+        self._links = {}
+        self._forwarder = None
+
+    def add_transfer(self, src, dst, size, algorithm="reno", mss=DEFAULT_MSS, start=0.0,
+                     receive_window=DEFAULT_RECEIVE_WINDOW):
+        """Adds a transfer of `size` bytes starting at virtual time `start`; None if unreachable."""
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown congestion control '{algorithm}', expected one of {ALGORITHMS}.")
+        if size <= 0 or mss <= 0:
+            raise ValueError("Transfer size and MSS must be positive.")
+        path = self.routes.shortest_path(src, dst)
+        if not path or len(path) < 2:
+            self.unroutable += 1
+            return None
+        links = [copy_link(self.topology, link_id, self._links) for link_id in self.routes.path_links(src, dst)]
+        flow = TcpFlow(len(self.flows) + 1, src, dst, path, links, size, algorithm, mss, start, receive_window,
+                       self.trace)
+        self.flows.append(flow)
+        return flow
+
+    def add_random_transfers(self, count, hosts=None, size=1 << 20, algorithm="reno", mss=DEFAULT_MSS, spread=0.0):
+        """Adds `count` transfers between random distinct hosts, starting uniformly within `spread` seconds."""
+        hosts = list(hosts) if hosts is not None else end_hosts(self.topology)
+        if len(hosts) < 2:
+            raise ValueError("At least two hosts are needed for a transfer.")
+        for _ in range(count):
+            src, dst = self.rng.sample(hosts, 2)
+            self.add_transfer(src, dst, size, algorithm, mss, self.rng.uniform(0, spread))
+
+    def run(self, until=None, engine=None):
+        """Simulates every transfer to completion (or `until`) and returns a TcpReport."""
+        engine = engine or SimulationEngine()
+        rng = self.rng
+        start_time = engine.now
+
+        def link_for(start, end, packet):
+            flow, _, _, is_ack = packet.data
+            return (flow.back_links if is_ack else flow.links)[packet.hop]
+
+        def drop(start, end, packet):
+            flow, _, _, is_ack = packet.data
+            loss = (flow.back_loss if is_ack else flow.loss)[packet.hop]
+            return loss > 0 and rng.random() < loss
+
+        queues = QueueingNetwork(engine, seed=rng.random(), link_for=link_for, **self.queue_options)
+        self._forwarder = PacketForwarder(engine, drop=drop, queues=queues)
+        for flow in self.flows:
+            engine.schedule_at(max(start_time + flow.start, engine.now), self._open, flow)
+        engine.run(until=until)
+        self._forwarder = None
+
+        last = max((flow.finished for flow in self.flows if flow.finished is not None), default=engine.now)
+        return TcpReport(self.flows, last - start_time, self.unroutable, queues.stats())
+
+    # Sender
+
+    def _open(self, flow):
+        flow.started = self._forwarder.engine.now
+        self._record(flow, flow.started)
+        self._fill(flow, flow.started)
+
+    def _fill(self, flow, now):
+        # Send new segments while the congestion and receive windows allow
+        window = min(int(flow.cwnd), flow.receive_window)
+        while flow.snd_nxt < flow.segments and flow.snd_nxt - flow.snd_una < window:
+            self._send_segment(flow, flow.snd_nxt, now)
+            flow.snd_nxt += 1
+        if flow.snd_nxt > flow.snd_una and not flow.timer:
+            self._restart_timer(flow, now)
+
+    def _send_segment(self, flow, seq, now, retransmit=False):
+        payload = min(flow.mss, flow.size - seq * flow.mss)
+        flow.sent += 1
+        if retransmit:
+            flow.retransmits += 1
+        self._forwarder.send(flow.path, (flow, seq, now, False), payload + HEADER_SIZE, "TCP",
+                             on_delivered=self._segment_arrived)
+
+    def _restart_timer(self, flow, now):
+        flow.deadline = now + flow.rto
+        if not flow.timer:
+            # One pending event per flow; it re-arms itself if the deadline moved meanwhile
+            flow.timer = True
+            self._forwarder.engine.schedule(flow.rto, self._timer, flow)
+
+    def _timer(self, flow):
+        now = self._forwarder.engine.now
+        flow.timer = False
+        if flow.finished is not None or flow.snd_una == flow.snd_nxt:
+            return
+        if now < flow.deadline:
+            flow.timer = True
+            self._forwarder.engine.schedule(flow.deadline - now, self._timer, flow)
+            return
+        # Retransmission timeout: back to one segment and go-back-N from the first hole
+        flow.timeouts += 1
+        self._reduce(flow)
+        flow.cwnd = 1.0
+        flow.recover = None
+        flow.dupacks = 0
+        flow.rto = min(flow.rto * 2, MAX_RTO)
+        flow.snd_nxt = flow.snd_una
+        self._record(flow, now)
+        self._send_segment(flow, flow.snd_nxt, now, retransmit=True)
+        flow.snd_nxt += 1
+        self._restart_timer(flow, now)
+
+    def _ack_arrived(self, packet):
+        flow, ack, stamp, _ = packet.data
+        if flow.finished is not None:
+            return
+        now = self._forwarder.engine.now
+        if ack > flow.snd_una:
+            self._rtt_sample(flow, now - stamp)
+            acked = ack - flow.snd_una
+            flow.snd_una = ack
+            flow.snd_nxt = max(flow.snd_nxt, ack)
+            if ack >= flow.segments:
+                flow.finished = now
+                return
+            if flow.recover is not None:
+                if ack > flow.recover:
+                    # Everything outstanding at the loss is acknowledged: leave fast recovery
+                    flow.cwnd = flow.ssthresh
+                    flow.recover = None
+                    flow.dupacks = 0
+                else:
+                    # Partial ACK (NewReno): the next hole was lost too
+                    self._send_segment(flow, ack, now, retransmit=True)
+                    flow.cwnd = max(flow.cwnd - acked + 1, 1.0)
+            else:
+                flow.dupacks = 0
+                self._grow(flow, acked, now)
+            self._restart_timer(flow, now)
+            self._record(flow, now)
+        elif ack == flow.snd_una and flow.snd_nxt > ack:
+            flow.dupacks += 1
+            if flow.recover is None and flow.dupacks == DUPACK_THRESHOLD:
+                # Fast retransmit, then fast recovery with the window inflated by the dupacks
+                flow.fast_retransmits += 1
+                self._reduce(flow)
+                flow.recover = flow.snd_nxt - 1
+                flow.cwnd = flow.ssthresh + DUPACK_THRESHOLD
+                self._send_segment(flow, ack, now, retransmit=True)
+                self._record(flow, now)
+            elif flow.recover is not None:
+                flow.cwnd += 1
+        self._fill(flow, now)
+
+    def _grow(self, flow, acked, now):
+        cwnd = flow.cwnd
+        if cwnd < flow.ssthresh:
+            flow.cwnd = cwnd + acked  # Slow start
+        elif flow.algorithm == "reno":
+            flow.cwnd = cwnd + acked / cwnd
+        else:
+            if flow.epoch is None:
+                flow.epoch = now
+                flow.w_est = cwnd
+                if cwnd < flow.w_max:
+                    flow.k = ((flow.w_max - cwnd) / CUBIC_C) ** (1 / 3)
+                    flow.origin = flow.w_max
+                else:
+                    flow.k = 0.0
+                    flow.origin = cwnd
+            t = now - flow.epoch + (flow.min_rtt or 0.0)
+            target = flow.origin + CUBIC_C * (t - flow.k) ** 3
+            if target > cwnd:
+                cwnd += acked * (target - cwnd) / cwnd
+            else:
+                cwnd += acked * 0.01 / cwnd
+            # Never grow slower than Reno would in the same conditions
+            flow.w_est += acked * 3 * (1 - CUBIC_BETA) / (1 + CUBIC_BETA) / flow.cwnd
+            flow.cwnd = max(cwnd, flow.w_est)
+
+    def _reduce(self, flow):
+        if flow.algorithm == "reno":
+            flow.ssthresh = max((flow.snd_nxt - flow.snd_una) / 2, 2.0)
+        else:
+            cwnd = flow.cwnd
+            # Fast convergence: give up bandwidth sooner when the window is shrinking
+            flow.w_max = cwnd * (1 + CUBIC_BETA) / 2 if cwnd < flow.w_max else cwnd
+            flow.ssthresh = max(cwnd * CUBIC_BETA, 2.0)
+            flow.epoch = None
+
+    def _rtt_sample(self, flow, rtt):
+        if flow.srtt is None:
+            flow.srtt = rtt
+            flow.rttvar = rtt / 2
+        else:
+            flow.rttvar = 0.75 * flow.rttvar + 0.25 * abs(flow.srtt - rtt)
+            flow.srtt = 0.875 * flow.srtt + 0.125 * rtt
+        flow.rto = min(max(flow.srtt + 4 * flow.rttvar, MIN_RTO), MAX_RTO)
+        if flow.min_rtt is None or rtt < flow.min_rtt:
+            flow.min_rtt = rtt
+
+    def _record(self, flow, now):
+        if flow.trace is not None:
+            flow.trace.append(now)
+            flow.trace.append(flow.cwnd)
+
+    # Receiver
+
+    def _segment_arrived(self, packet):
+        flow, seq, stamp, _ = packet.data
+        if seq == flow.rcv_next:
+            flow.rcv_next += 1
+            waiting = flow.out_of_order
+            while waiting and flow.rcv_next in waiting:
+                waiting.discard(flow.rcv_next)
+                flow.rcv_next += 1
+        elif seq > flow.rcv_next:
+            if flow.out_of_order is None:
+                flow.out_of_order = set()
+            flow.out_of_order.add(seq)
+        self._forwarder.send(flow.back_path, (flow, flow.rcv_next, stamp, True), HEADER_SIZE, "TCP",
+                             on_delivered=self._ack_arrived)
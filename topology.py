@@ -0,0 +1,540 @@
+"""Tk-free model of the devices and links that make up a network design."""
+import json
+
+from addressing import ip_to_int, int_to_ip, mac_to_int, int_to_mac, mask_to_prefix, prefix_to_mask, parse_cidr
+
+
+# Default physical characteristics per connection type: bits/s, seconds, drop probability
+LINK_PROFILES = {
+    "Ethernet": {"bandwidth": 100e6, "delay": 0.0005, "loss": 0.0},
+    "Fiber Optic": {"bandwidth": 1e9, "delay": 0.0002, "loss": 0.0},
+    "Wireless": {"bandwidth": 54e6, "delay": 0.002, "loss": 0.01},
+}
+DEFAULT_CONNECTION = "Ethernet"
+REFERENCE_PACKET_SIZE = 1500  # Bytes used to price links for routing
+OPTIONAL_DEVICE_FIELDS = ("gateway", "routes")  # Saved and loaded only when a device has them
+
+
+def link_attributes(connection=DEFAULT_CONNECTION, **overrides):
+    """Builds the attribute dict for a new link of the given type, with optional overrides."""
+    attrs = {"connection": connection}
+    attrs.update(LINK_PROFILES.get(connection, LINK_PROFILES[DEFAULT_CONNECTION]))
+    attrs.update({key: value for key, value in overrides.items() if value is not None})
+    return attrs
+
+
+def serialization_delay(attrs, size):
+    """Seconds needed to put `size` bytes on a link."""
+    bandwidth = attrs.get("bandwidth") or LINK_PROFILES[DEFAULT_CONNECTION]["bandwidth"]
+    return size * 8 / bandwidth
+
+
+def queueing_delay(attrs, size):
+    """Mean M/M/1 waiting time in seconds for a link running at attrs["utilization"] (0 when idle)."""
+    utilization = min(attrs.get("utilization", 0.0), 0.99)
+    return utilization / (1 - utilization) * serialization_delay(attrs, size)
+
+
+def link_delay(link, size):
+    """One-way delay in seconds for `size` bytes: propagation + serialization + queueing."""
+    attrs = link.attrs
+    return attrs.get("delay", 0.0) + serialization_delay(attrs, size) + queueing_delay(attrs, size)
+
+
+def link_cost(link):
+    """Routing weight of a link: propagation plus serialization of a reference packet, in seconds."""
+    attrs = link.attrs
+    return attrs.get("delay", LINK_PROFILES[DEFAULT_CONNECTION]["delay"]) + \
+        serialization_delay(attrs, REFERENCE_PACKET_SIZE)
+
+
+class Link:
+    """A connection between two devices, identified by its canvas line id in the GUI."""
+
+    __slots__ = ("id", "a", "b", "attrs")
+
+    def __init__(self, link_id, a, b, attrs=None):
+        self.id = link_id
+        self.a = a
+        self.b = b
+        self.attrs = attrs or {}
+
+    @property
+    def endpoints(self):
+        return self.a, self.b
+
+    def other(self, device_id):
+        """Returns the endpoint on the far side of device_id."""
+        return self.b if device_id == self.a else self.a
+
+
+class Topology:
+    """Device registry, link table and per-device adjacency sets, mirrored into a live NetworkX graph.
+
+    Every mutation bumps `version`, so consumers can cache derived data and tell when it went
+    stale. The NetworkX graph is only built the first time `graph` is used (headless runs never
+    pay for importing networkx) and from then on is updated in place. Devices are also indexed
+    by IP, MAC, label and subnet so lookups by address do not scan every device.
+    """
+
+    def __init__(self):
+        self.devices = {}    # device_id -> attribute dict (shared with the graph node once it exists)
+        self.links = {}      # link id -> Link
+        self.adjacency = {}  # device_id -> set of link ids touching it
+        self.version = 0
+        self._graph = None
+        self._next_link_id = 1
+        self._listeners = []
+        # Index key -> {device_id: None}; the dict keeps insertion order so the oldest holder wins
+        self._by_ip = {}
+        self._by_mac = {}
+        self._by_label = {}
+        self._by_subnet = {}  # (network int, prefix length) -> devices
+
+    def subscribe(self, listener):
+        """Registers listener(event, subject) to hear about topology changes (e.g. "link_removed", link)."""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @property
+    def graph(self):
+        """The live nx.Graph view of the topology."""
+        if self._graph is None:
+            import networkx as nx
+
+            graph = nx.Graph()
+            for device_id, attrs in self.devices.items():
+                graph.add_node(device_id, **attrs)
+                self.devices[device_id] = graph.nodes[device_id]
+            self._graph = graph
+            for link in self.links.values():
+                self._sync_edge(link.a, link.b)
+        return self._graph
+
+    def _changed(self, event, subject):
+        self.version += 1
+        for listener in self._listeners:
+            listener(event, subject)
+
+    def clear(self):
+        self.devices.clear()
+        self.links.clear()
+        self.adjacency.clear()
+        self._reindex()
+        if self._graph is not None:
+            self._graph.clear()
+        self._changed("cleared", None)
+
+    def replace(self, other):
+        """Takes over the contents of another Topology (e.g. one just loaded) in a single change."""
+        self.devices = other.devices
+        self.links = other.links
+        self.adjacency = other.adjacency
+        self._next_link_id = other._next_link_id
+        self._by_ip, self._by_mac = other._by_ip, other._by_mac
+        self._by_label, self._by_subnet = other._by_label, other._by_subnet
+        self._graph = None  # Rebuilt on next use
+        self._changed("cleared", None)
+
+    def add_device(self, device_id, **attrs):
+        if device_id in self.devices:
+            raise ValueError(f"Device '{device_id}' already exists.")
+        if self._graph is not None:
+            self._graph.add_node(device_id, **attrs)
+            attrs = self._graph.nodes[device_id]
+        self.devices[device_id] = attrs
+        self.adjacency[device_id] = set()
+        self._index(device_id, attrs)
+        self._changed("device_added", device_id)
+
+    def update_device(self, device_id, **attrs):
+        """Edits device attributes (label, ip, mac, ...) in place."""
+        data = self.devices[device_id]
+        self._unindex(device_id, data)
+        data.update(attrs)
+        self._index(device_id, data)
+        self._changed("device_updated", device_id)
+
+    def remove_device(self, device_id):
+        """Removes a device and every link touching it; returns the removed links."""
+        removed = [self.remove_link(link_id) for link_id in list(self.adjacency.get(device_id, ()))]
+        if device_id in self.devices:
+            self._unindex(device_id, self.devices.pop(device_id))
+        self.adjacency.pop(device_id, None)
+        if self._graph is not None and device_id in self._graph:
+            self._graph.remove_node(device_id)
+        self._changed("device_removed", device_id)
+        return removed
+
+    def add_link(self, a, b, link_id=None, **attrs):
+        """Connects two existing devices and returns the new Link."""
+        if a not in self.devices or b not in self.devices:
+            raise KeyError(f"Cannot link unknown devices '{a}' and '{b}'.")
+        if a == b:
+            raise ValueError(f"Cannot link '{a}' to itself.")
+        if link_id is None:
+            while self._next_link_id in self.links:
+                self._next_link_id += 1
+            link_id = self._next_link_id
+        elif link_id in self.links:
+            raise ValueError(f"Link {link_id} already exists.")
+        link = Link(link_id, a, b, attrs)
+        self.links[link_id] = link
+        self.adjacency[a].add(link_id)
+        self.adjacency[b].add(link_id)
+        if self._graph is not None:
+            self._graph.add_edge(a, b, link=link_id, **link.attrs)
+        self._changed("link_added", link)
+        return link
+
+    def update_link(self, link_id, **attrs):
+        """Edits link attributes in place."""
+        link = self.links[link_id]
+        link.attrs.update(attrs)
+        self._sync_edge(link.a, link.b)
+        self._changed("link_updated", link)
+
+    def remove_link(self, link_id):
+        """Removes a link from the table and both adjacency sets; returns it (or None)."""
+        link = self.links.pop(link_id, None)
+        if link is not None:
+            self.adjacency[link.a].discard(link_id)
+            self.adjacency[link.b].discard(link_id)
+            self._sync_edge(link.a, link.b)
+            self._changed("link_removed", link)
+        return link
+
+    def find_by_ip(self, ip):
+        """Returns the device holding an IP address, or None."""
+        return _first(self._by_ip, _ip_key(ip))
+
+    def find_by_mac(self, mac):
+        return _first(self._by_mac, _mac_key(mac))
+
+    def find_by_label(self, label):
+        return _first(self._by_label, label)
+
+    def devices_with_ip(self, ip):
+        """Every device configured with an IP address (more than one means a duplicate)."""
+        return list(self._by_ip.get(_ip_key(ip), ()))
+
+    def devices_with_mac(self, mac):
+        return list(self._by_mac.get(_mac_key(mac), ()))
+
+    def devices_in_subnet(self, cidr):
+        """Devices whose own address and mask put them in exactly this network, e.g. '10.0.0.0/24'."""
+        return list(self._by_subnet.get(parse_cidr(cidr), ()))
+
+    def subnets(self):
+        """Yields (cidr, device ids) for every subnet that has devices in it."""
+        for (network, prefix), members in self._by_subnet.items():
+            yield f"{int_to_ip(network)}/{prefix}", list(members)
+
+    def arp(self, ip):
+        """ARP-style resolution: the MAC address that answers for an IP, or None."""
+        device_id = self.find_by_ip(ip)
+        return None if device_id is None else self.devices[device_id].get("mac")
+
+    def resolve(self, name):
+        """Accepts a device id, IP address, MAC address or label and returns the device id."""
+        if name in self.devices:
+            return name
+        device_id = self.find_by_ip(name) or self.find_by_mac(name) or self.find_by_label(name)
+        if device_id is None:
+            raise KeyError(f"Unknown device '{name}'.")
+        return device_id
+
+    def _index(self, device_id, data):
+        for index, key in self._keys(data):
+            index.setdefault(key, {})[device_id] = None
+
+    def _unindex(self, device_id, data):
+        for index, key in self._keys(data):
+            members = index.get(key)
+            if members is not None:
+                members.pop(device_id, None)
+                if not members:
+                    del index[key]
+
+    def _keys(self, data):
+        ip, mac, label = data.get("ip"), data.get("mac"), data.get("label")
+        keys = []
+        if ip and isinstance(ip, str):
+            keys.append((self._by_ip, _ip_key(ip)))
+            subnet = _subnet_key(ip, data.get("subnet"))
+            if subnet is not None:
+                keys.append((self._by_subnet, subnet))
+        if mac and isinstance(mac, str):
+            keys.append((self._by_mac, _mac_key(mac)))
+        if label and isinstance(label, str):
+            keys.append((self._by_label, label))
+        return keys
+
+    def _reindex(self):
+        self._by_ip, self._by_mac, self._by_label, self._by_subnet = {}, {}, {}, {}
+        for device_id, data in self.devices.items():
+            self._index(device_id, data)
+
+    def links_between(self, a, b):
+        """Returns the links directly connecting two devices."""
+        return [link for link in self.links_of(a) if link.other(a) == b]
+
+    def best_link(self, a, b):
+        """Returns the cheapest link between two adjacent devices, or None."""
+        return min(self.links_between(a, b), key=link_cost, default=None)
+
+    def hop_delay(self, a, b, size):
+        """One-way delay in seconds for `size` bytes crossing the link from a to b."""
+        link = self.best_link(a, b)
+        if link is None:
+            raise KeyError(f"Devices '{a}' and '{b}' are not connected.")
+        return link_delay(link, size)
+
+    def _sync_edge(self, a, b):
+        # Parallel links collapse onto a single graph edge carrying one of their attribute sets
+        graph = self._graph
+        if graph is None:
+            return
+        remaining = self.links_between(a, b)
+        if remaining:
+            if not graph.has_edge(a, b):
+                graph.add_edge(a, b)
+            data = graph.edges[a, b]
+            data.clear()
+            data.update(remaining[0].attrs, link=remaining[0].id)
+        elif graph.has_edge(a, b):
+            graph.remove_edge(a, b)
+
+    def link_endpoints(self, link_id):
+        """Returns (start, end) devices of a link, or (None, None) if it is unknown."""
+        link = self.links.get(link_id)
+        if link is None:
+            return None, None
+        return link.a, link.b
+
+    def links_of(self, device_id):
+        """Yields the links attached to a device."""
+        links = self.links
+        for link_id in self.adjacency.get(device_id, ()):
+            yield links[link_id]
+
+    def neighbors(self, device_id):
+        """Yields (neighbor, link) pairs for a device."""
+        for link in self.links_of(device_id):
+            yield link.other(device_id), link
+
+
+def _first(index, key):
+    members = index.get(key)
+    return next(iter(members)) if members else None
+
+
+def _ip_key(ip):
+    # Spellings like 010.0.0.1 share a key with 10.0.0.1; anything unparsable is indexed as written
+    try:
+        return int_to_ip(ip_to_int(ip))
+    except (ValueError, AttributeError, TypeError):
+        return ip
+
+
+def _mac_key(mac):
+    try:
+        return int_to_mac(mac_to_int(mac))
+    except (ValueError, AttributeError, TypeError):
+        return mac
+
+
+def _subnet_key(ip, mask):
+    try:
+        prefix = mask_to_prefix(mask)
+        return ip_to_int(ip) & prefix_to_mask(prefix), prefix
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+class _StreamReader:
+    """Pulls one JSON value at a time out of a file that is read in fixed-size chunks."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed so the buffer stays small
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ("" at end of file)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed configuration: expected '{char}' but found '{found or 'end of file'}'.")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut at the chunk boundary still decodes, so insist on a following character
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as error:
+                if self.eof:
+                    raise ValueError(f"Malformed configuration: {error}") from None
+            self._fill()
+
+    def items(self, open_char, close_char, keyed):
+        """Yields the members of the object or array that starts at the current position."""
+        self.expect(open_char)
+        if self.peek() == close_char:
+            self.pos += 1
+            return
+        while True:
+            if keyed:
+                key = self.value()
+                self.expect(":")
+                yield key, self.value()
+            else:
+                yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect(close_char)
+            return
+
+
+def iter_configuration(path, chunk_size=1 << 16):
+    """Streams a saved configuration as ("device", id, data) and ("connection", entry, None) items."""
+    with open(path, "r") as f:
+        reader = _StreamReader(f, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "devices":
+                for device_id, data in reader.items("{", "}", keyed=True):
+                    yield "device", device_id, data
+            elif key == "connections":
+                for entry in reader.items("[", "]", keyed=False):
+                    yield "connection", entry, None
+            else:
+                reader.value()  # Unknown sections are skipped
+            if reader.peek() == ",":
+                reader.pos += 1
+                continue
+            reader.expect("}")
+            return
+
+
+def parse_connection(entry):
+    """Splits a saved connection into (start, end, attrs); older files store bare [start, end] pairs."""
+    if isinstance(entry, dict):
+        attrs = {key: value for key, value in entry.items() if key not in ("from", "to")}
+        return entry.get("from"), entry.get("to"), attrs
+    if isinstance(entry, (list, tuple)) and len(entry) == 2:
+        return entry[0], entry[1], {}
+    return None, None, None
+
+
+def check_connection(entry, devices):
+    """parse_connection plus the reason the entry cannot be loaded into `devices`, or None if it can."""
+    start_device, end_device, attrs = parse_connection(entry)
+    if attrs is None:
+        reason = f"Skipped malformed connection {entry!r}."
+    elif start_device is None or end_device is None:
+        reason = f"Skipped connection with a null endpoint {entry!r}."
+    elif start_device not in devices or end_device not in devices:
+        reason = f"Skipped connection to an unknown device {entry!r}."
+    elif start_device == end_device:
+        reason = f"Skipped connection from '{start_device}' to itself."
+    else:
+        reason = None
+    return start_device, end_device, attrs, reason
+
+
+def read_topology(path, progress=None, strict=False, progress_every=1000):
+    """Streams a saved configuration into a new Topology, validating it on the way.
+
+    Devices and links go straight into the model; nothing is drawn. Bad entries (duplicate or
+    empty ids, malformed device data, null, dangling or self-looping connections) are skipped
+    and described in the returned problem list, or raise ValueError when strict is set.
+    progress(devices, connections) is called every `progress_every` items.
+    """
+    topology = Topology()
+    problems = []
+    devices = connections = processed = 0
+
+    def problem(message):
+        if strict:
+            raise ValueError(message)
+        problems.append(message)
+
+    for item, first, second in iter_configuration(path):
+        if item == "device":
+            device_id, data = first, second
+            if not isinstance(device_id, str) or not device_id.strip():
+                problem("Skipped device with an empty id.")
+                continue
+            if device_id in topology.devices:
+                problem(f"Skipped duplicate device id '{device_id}'.")
+                continue
+            if not isinstance(data, dict):
+                problem(f"Skipped device '{device_id}': expected an object.")
+                continue
+            coords = data.get("icon_coords")
+            if coords is not None and (not isinstance(coords, (list, tuple)) or len(coords) != 2 or
+                                       not all(isinstance(c, (int, float)) for c in coords)):
+                problem(f"Device '{device_id}' has invalid icon_coords {coords!r}; placing it at the origin.")
+                coords = [0.0, 0.0]
+            label = data.get("label") or device_id.replace("_", " ")
+            kind = data.get("kind") or device_id.rpartition("_")[0] or label.split(" ")[0]
+            topology.add_device(
+                device_id, kind=kind, label=label,
+                ip=data.get("ip"), mac=data.get("mac"), subnet=data.get("subnet", "255.255.255.0"),
+                icon_coords=coords, **{key: data[key] for key in OPTIONAL_DEVICE_FIELDS if key in data}
+            )
+            devices += 1
+        else:
+            start_device, end_device, attrs, reason = check_connection(first, topology.devices)
+            if reason is not None:
+                problem(reason)
+            else:
+                topology.add_link(start_device, end_device, **link_attributes(**attrs))
+                connections += 1
+        processed += 1
+        if progress and processed % progress_every == 0:
+            progress(devices, connections)
+
+    if progress:
+        progress(devices, connections)
+    return topology, problems
+
+
+def load_topology(path, progress=None):
+    """Reads a saved JSON configuration (as written by the GUI) into a new Topology."""
+    return read_topology(path, progress)[0]
@@ -0,0 +1,244 @@
+"""Bulk traffic generation on the discrete-event engine."""
+import itertools
+import math
+import random
+from array import array
+
+from engine import SimulationEngine, PacketForwarder
+from queueing import QueueingNetwork, DEFAULT_BUFFER, format_queue_stats
+from topology import Link, link_delay
+
+
+PATTERNS = ("poisson", "cbr", "burst")
+INFRASTRUCTURE = ("Router", "Switch")  # Device kinds that forward traffic but do not source it
+
+
+class Flow:
+    """Per-flow state; kept in __slots__ so tens of thousands of flows stay cheap."""
+
+    __slots__ = ("id", "src", "dst", "path", "links", "hop_delays", "loss", "pattern", "rate",
+                 "size", "remaining", "burst", "sent", "delivered", "dropped")
+
+    def __init__(self, flow_id, src, dst, path, links, hop_delays, loss, pattern, rate, size, packets, burst):
+        self.id = flow_id
+        self.src = src
+        self.dst = dst
+        self.path = path
+        self.links = links            # Link per hop, copied so run() never reads the live topology
+        self.hop_delays = hop_delays  # Seconds per hop for this flow's packet size
+        self.loss = loss              # Drop probability per hop
+        self.pattern = pattern
+        self.rate = rate              # Packets per second
+        self.size = size              # Bytes per packet
+        self.remaining = packets
+        self.burst = burst
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+
+
+class TrafficReport:
+    """Aggregate results of a traffic run."""
+
+    def __init__(self, flows, sent, delivered, dropped, delivered_bytes, duration, latencies, unroutable,
+                 queues=None, timelines=None):
+        self.flows = flows
+        self.sent = sent
+        self.delivered = delivered
+        self.dropped = dropped
+        self.delivered_bytes = delivered_bytes
+        self.duration = duration  # Virtual seconds from first send to last delivery
+        self.unroutable = unroutable
+        self.queues = queues or []        # QueueingNetwork.stats(), busiest first
+        self.timelines = timelines or {}  # Busiest queues' depth, drops and utilization over time
+        ordered = sorted(latencies)
+        self.latency_mean = sum(ordered) / len(ordered) if ordered else None
+        self.latency_p50 = percentile(ordered, 50)
+        self.latency_p95 = percentile(ordered, 95)
+        self.latency_p99 = percentile(ordered, 99)
+
+    @property
+    def throughput(self):
+        """Delivered bits per second of virtual time."""
+        return self.delivered_bytes * 8 / self.duration if self.duration > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "flows": self.flows,
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "unroutable": self.unroutable,
+            "duration": self.duration,
+            "throughput_bps": self.throughput,
+            "latency_mean": self.latency_mean,
+            "latency_p50": self.latency_p50,
+            "latency_p95": self.latency_p95,
+            "latency_p99": self.latency_p99,
+            "queues": self.queues,
+            "queue_timelines": self.timelines,
+        }
+
+    def summary(self):
+        def ms(value):
+            return "n/a" if value is None else f"{value * 1000:.3f}ms"
+
+        summary = (
+            f"Flows: {self.flows} ({self.unroutable} without a route)\n"
+            f"Packets: Sent = {self.sent}, Delivered = {self.delivered}, Dropped = {self.dropped}\n"
+            f"Throughput: {self.throughput / 1e6:.3f} Mbps over {self.duration:.3f}s\n"
+            f"Latency: p50 = {ms(self.latency_p50)}, p95 = {ms(self.latency_p95)}, "
+            f"p99 = {ms(self.latency_p99)}, mean = {ms(self.latency_mean)}"
+        )
+        if self.queues:
+            summary += "\nBusiest links:\n" + format_queue_stats(self.queues)
+        return summary
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return None
+    rank = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1
+    return ordered[rank]
+
+
+def copy_link(topology, link_id, cache):
+    """A private copy of a link, shared through `cache` so each link is copied once per run."""
+    link = cache.get(link_id)
+    if link is None:
+        live = topology.links[link_id]
+        link = cache[link_id] = Link(live.id, live.a, live.b, dict(live.attrs))
+    return link
+
+
+def end_hosts(topology):
+    """Device ids that can source and sink traffic."""
+    return [device_id for device_id, data in topology.devices.items() if data.get("kind") not in INFRASTRUCTURE]
+
+
+class TrafficGenerator:
+    """Runs many flows on one SimulationEngine without a thread per packet.
+
+    Flows are resolved against the route cache when they are added (so this part must run
+    where the topology is owned, e.g. the Tk thread); run() only touches flow state and can
+    be handed to a worker.
+
+    Packets compete for every link in output queues (see queueing.QueueingNetwork) set up with
+    `discipline`, `buffer` and `aqm` unless the link says otherwise. With queueing=False each
+    hop instead takes its fixed delay from the link model.
+    """
+
+    def __init__(self, topology, routes, seed=None, queueing=True, discipline="fifo", buffer=DEFAULT_BUFFER,
+                 aqm="tail"):
+        self.topology = topology
+        self.routes = routes
+        self.rng = random.Random(seed)
+        self.queueing = queueing
+        self.queue_options = {"discipline": discipline, "buffer": buffer, "aqm": aqm}
+        self.flows = []
+        self.unroutable = 0
+        self._ids = itertools.count(1)
+        self._links = {}  # link id -> copy shared by every flow crossing it
+
+    def add_flow(self, src, dst, pattern="poisson", rate=100.0, packets=100, size=1000, burst=10):
+        """Adds one flow; returns it, or None when dst is unreachable from src."""
+        if pattern not in PATTERNS:
+            raise ValueError(f"Unknown traffic pattern '{pattern}', expected one of {PATTERNS}.")
+        if rate <= 0 or packets < 0 or size <= 0:
+            raise ValueError("Rate and size must be positive and packets non-negative.")
+        if burst < 1 or burst != int(burst):
+            raise ValueError("Burst must be a whole number of packets, at least 1.")
+        path = self.routes.shortest_path(src, dst)
+        if not path or len(path) < 2:
+            self.unroutable += 1
+            return None
+        links = [copy_link(self.topology, link_id, self._links) for link_id in self.routes.path_links(src, dst)]
+        hop_delays = [link_delay(link, size) for link in links]
+        loss = [link.attrs.get("loss", 0.0) for link in links]
+        flow = Flow(next(self._ids), src, dst, path, links, hop_delays, loss, pattern, rate, size, packets, int(burst))
+        self.flows.append(flow)
+        return flow
+
+    def add_matrix(self, matrix, pattern="poisson", packets=100, size=1000, burst=10):
+        """Adds one flow per (src, dst) -> rate entry of a host-pair traffic matrix."""
+        for (src, dst), rate in matrix.items():
+            if rate > 0 and src != dst:
+                self.add_flow(src, dst, pattern, rate, packets, size, burst)
+
+    def add_random_flows(self, count, hosts=None, pattern="poisson", rate=100.0, packets=100, size=1000, burst=10):
+        """Adds `count` flows between random distinct pairs of hosts."""
+        hosts = list(hosts) if hosts is not None else end_hosts(self.topology)
+        if len(hosts) < 2:
+            raise ValueError("At least two hosts are needed to generate traffic.")
+        for _ in range(count):
+            src, dst = self.rng.sample(hosts, 2)
+            self.add_flow(src, dst, pattern, rate, packets, size, burst)
+
+    def run(self, until=None, engine=None):
+        """Simulates every flow to completion (or `until`) and returns a TrafficReport."""
+        engine = engine or SimulationEngine()
+        rng = self.rng
+        latencies = array("d")
+        totals = {"delivered_bytes": 0, "last": engine.now}
+        start_time = engine.now
+
+        queues = None
+        if self.queueing:
+            queues = QueueingNetwork(
+                engine, seed=rng.random(), link_for=lambda start, end, packet: packet.data.links[packet.hop],
+                **self.queue_options
+            )
+        forwarder = PacketForwarder(
+            engine,
+            hop_delay=lambda start, end, packet: packet.data.hop_delays[packet.hop],
+            drop=lambda start, end, packet: rng.random() < packet.data.loss[packet.hop],
+            queues=queues
+        )
+
+        def delivered(packet):
+            flow = packet.data
+            flow.delivered += 1
+            latencies.append(engine.now - packet.created)
+            totals["delivered_bytes"] += packet.size
+            totals["last"] = engine.now
+
+        def dropped(packet):
+            packet.data.dropped += 1
+            totals["last"] = max(totals["last"], engine.now)
+
+        def emit(flow):
+            # Send one packet (or a whole burst) and schedule the flow's next departure
+            count = min(flow.burst, flow.remaining) if flow.pattern == "burst" else 1
+            for _ in range(count):
+                forwarder.send(flow.path, flow, flow.size, on_delivered=delivered, on_dropped=dropped)
+            flow.sent += count
+            flow.remaining -= count
+            if flow.remaining > 0:
+                engine.schedule(self._gap(flow), emit, flow)
+
+        for flow in self.flows:
+            if flow.remaining > 0:
+                engine.schedule(self._gap(flow) if flow.pattern != "cbr" else 0.0, emit, flow)
+        engine.run(until=until)
+
+        return TrafficReport(
+            flows=len(self.flows),
+            sent=sum(flow.sent for flow in self.flows),
+            delivered=sum(flow.delivered for flow in self.flows),
+            dropped=sum(flow.dropped for flow in self.flows),
+            delivered_bytes=totals["delivered_bytes"],
+            duration=totals["last"] - start_time,
+            latencies=latencies,
+            unroutable=self.unroutable,
+            queues=queues.stats() if queues else None,
+            timelines=queues.timelines() if queues else None,
+        )
+
+    def _gap(self, flow):
+        if flow.pattern == "cbr":
+            return 1.0 / flow.rate
+        if flow.pattern == "burst":
+            # Bursts arrive as a Poisson process that keeps the flow's average packet rate
+            return self.rng.expovariate(flow.rate / flow.burst)
+        return self.rng.expovariate(flow.rate)